@@ -0,0 +1,5 @@
+"""Offline benchmarks. Run from the repo root, e.g. `python -m benchmarks.load_test`.
+
+`python -m benchmarks.suite` runs the main entry points end to end against the
+stub model server and the Stripe and Supabase fakes, and writes comparable JSON.
+"""
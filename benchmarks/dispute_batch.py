@@ -0,0 +1,83 @@
+"""Run the batch dispute engine against a fake Stripe API and the stub model server.
+
+Measures a sequential baseline, then a concurrent run that is stopped halfway and
+resumed from its JSONL checkpoint, and checks that every open dispute ends up with
+exactly one successful result.
+
+    python -m benchmarks.dispute_batch --disputes 200 --concurrency 16 --latency 0.2
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import tempfile
+from benchmarks.fakes import FakeStripe, make_disputes
+from benchmarks.stub_server import StubServer, StubSettings
+
+
+async def _run(args, config, tmp, output, open_count):
+    # One event loop for every phase: Stripe's pooled async client is bound to it.
+    from dispute_batch import DisputeBatch
+
+    report = {}
+    baseline = DisputeBatch(os.path.join(tmp, "baseline.jsonl"), concurrency=1,
+                            run_config=config, max_disputes=args.baseline)
+    report["sequential"] = await baseline.run()
+    first = DisputeBatch(output, concurrency=args.concurrency, rate=args.rate,
+                         run_config=config, max_disputes=open_count // 2)
+    report["interrupted"] = await first.run()
+    resumed = DisputeBatch(output, concurrency=args.concurrency, rate=args.rate, run_config=config)
+    report["resumed"] = await resumed.run()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--disputes", type=int, default=200)
+    parser.add_argument("--open-ratio", type=float, default=0.8)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency per call")
+    parser.add_argument("--stripe-latency", type=float, default=0.02)
+    parser.add_argument("--baseline", type=int, default=10, help="disputes in the sequential baseline")
+    args = parser.parse_args()
+
+    os.environ.setdefault("STRIPE_SECRET_KEY", "sk_test_stub")
+    import stripe
+    from agents import AsyncOpenAI, OpenAIProvider, RunConfig
+
+    disputes = make_disputes(args.disputes, args.open_ratio)
+    open_ids = {d["id"] for d in disputes if d["status"] == "needs_response"}
+    report = {}
+
+    with StubServer(StubSettings(latency=args.latency)) as model_server, \
+            FakeStripe(disputes, latency=args.stripe_latency) as fake, \
+            tempfile.TemporaryDirectory() as tmp:
+        stripe.api_base = fake.url
+        stripe.api_key = os.environ["STRIPE_SECRET_KEY"]
+        provider = OpenAIProvider(
+            openai_client=AsyncOpenAI(base_url=model_server.base_url, api_key="stub"),
+            use_responses=False,
+        )
+        config = RunConfig(model_provider=provider, tracing_disabled=True)
+
+        output = os.path.join(tmp, "disputes.jsonl")
+        report.update(asyncio.run(_run(args, config, tmp, output, len(open_ids))))
+
+        with open(output) as f:
+            records = [json.loads(line) for line in f]
+        counts = collections.Counter(r["dispute_id"] for r in records if r["ok"])
+        report["open_disputes"] = len(open_ids)
+        report["all_processed_once"] = set(counts) == open_ids and max(counts.values()) == 1
+        report["stripe_requests"] = fake.request_count
+        report["model_requests"] = model_server.request_count
+
+    sequential = report["sequential"]["disputes_per_s"]
+    if sequential:
+        report["speedup"] = report["resumed"]["disputes_per_s"] / sequential
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Lookup latency of the dispute repositories on large synthetic datasets.
+
+Builds `--rows` orders, emails and phone logs, then times random lookups through
+the old approach (a linear scan of a list), the in-memory dict indexes and the
+SQLite backend. Load time is reported separately since it is paid once at startup.
+
+    python -m benchmarks.dispute_repository --rows 1000000 --lookups 10000
+"""
+import argparse
+import json
+import random
+import time
+from benchmarks.stats import summarize
+from dispute_repository import InMemoryRepository, SQLiteRepository
+
+
+def _dataset(rows: int):
+    # Ten emails and phone logs share each customer so lookups return several records.
+    customers = max(rows // 10, 1)
+    orders = ({"order_id": i, "fulfillment_details": "shipped" if i % 2 else "not_shipped"} for i in range(rows))
+    emails = ({"email": f"customer{i % customers}@example.com", "subject": f"Order #{i}"} for i in range(rows))
+    phone_logs = ({"phone_number": f"+1555{i % customers:07d}", "order_id": i} for i in range(rows))
+    return list(orders), list(emails), list(phone_logs), customers
+
+
+def _time_lookups(lookup, keys) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for key in keys:
+        began = time.perf_counter()
+        lookup(key)
+        latencies.append(time.perf_counter() - began)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def _scan(records, field):
+    return lambda key: [r for r in records if r[field] == key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--scan-lookups", type=int, default=20, help="lookups for the slow linear-scan baseline")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    orders, emails, phone_logs, customers = _dataset(args.rows)
+    order_keys = [rng.randrange(args.rows) for _ in range(args.lookups)]
+    email_keys = [f"customer{rng.randrange(customers)}@example.com" for _ in range(args.lookups)]
+    phone_keys = [f"+1555{rng.randrange(customers):07d}" for _ in range(args.lookups)]
+    report = {"rows_per_table": args.rows}
+
+    scan = args.scan_lookups
+    report["linear_scan"] = {
+        "get_order": _time_lookups(_scan(orders, "order_id"), order_keys[:scan]),
+        "get_emails": _time_lookups(_scan(emails, "email"), email_keys[:scan]),
+        "get_phone_logs": _time_lookups(_scan(phone_logs, "phone_number"), phone_keys[:scan]),
+    }
+
+    started = time.perf_counter()
+    memory = InMemoryRepository(orders, emails, phone_logs)
+    report["memory"] = {"load_s": time.perf_counter() - started}
+
+    started = time.perf_counter()
+    sqlite = SQLiteRepository(":memory:")
+    sqlite.load(orders, emails, phone_logs)
+    report["sqlite"] = {"load_s": time.perf_counter() - started}
+
+    for name, repo in (("memory", memory), ("sqlite", sqlite)):
+        report[name].update({
+            "get_order": _time_lookups(repo.get_order, order_keys),
+            "get_emails": _time_lookups(repo.get_emails, email_keys),
+            "get_phone_logs": _time_lookups(repo.get_phone_logs, phone_keys),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Model round-trips per dispute investigation, with and without evidence prefetch.
+
+Escalated disputes go to the investigator either with its lookup tools, which the
+stub model calls one per turn as a real model would, or with the order, payment
+intent, emails and phone logs gathered up front and passed in as one bundle.
+With --llm-triage the disputes reach the investigator through the triage
+agent's handoff instead of rule-based pre-routing.
+
+    python -m benchmarks.evidence_prefetch --disputes 20 --latency 0.2
+    python -m benchmarks.evidence_prefetch --disputes 20 --llm-triage
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from benchmarks.fakes import FakeStripe, make_disputes
+from benchmarks.stats import summarize
+from benchmarks.stub_server import StubServer, StubSettings
+
+
+async def _investigate(disputes, config, prefetch: bool, preroute: bool) -> dict:
+    from dispute import EvidenceStats, triage_agent, triage_dispute
+    import dispute
+
+    dispute.evidence_stats = EvidenceStats()
+    latencies = []
+    started = time.perf_counter()
+    for data in disputes:
+        began = time.perf_counter()
+        await triage_dispute(data, triage_agent, config, preroute=preroute, prefetch=prefetch)
+        latencies.append(time.perf_counter() - began)
+    report = summarize(latencies, time.perf_counter() - started)
+    report.update(dispute.evidence_stats.snapshot())
+    return report
+
+
+async def _run(disputes, config, preroute: bool):
+    return {
+        "tools": await _investigate(disputes, config, prefetch=False, preroute=preroute),
+        "prefetch": await _investigate(disputes, config, prefetch=True, preroute=preroute),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--disputes", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency per call")
+    parser.add_argument("--stripe-latency", type=float, default=0.02)
+    parser.add_argument("--llm-triage", action="store_true", help="escalate through the triage agent's handoff")
+    args = parser.parse_args()
+
+    os.environ.setdefault("STRIPE_SECRET_KEY", "sk_test_stub")
+    import stripe
+    from agents import AsyncOpenAI, OpenAIProvider, RunConfig
+
+    # FakeStripe maps even, non-multiple-of-five payment intents to a delivered order.
+    disputes = [d for i, d in enumerate(make_disputes(args.disputes * 3)) if i % 2 == 0 and i % 5][:args.disputes]
+
+    with StubServer(StubSettings(
+        latency=args.latency,
+        call_tools=True,
+        # The stub triage agent escalates every dispute it sees.
+        handoffs={"dispute_id": "transfer_to_dispute_intake_agent"} if args.llm_triage else None,
+    )) as model_server, \
+            FakeStripe(disputes, latency=args.stripe_latency) as fake:
+        stripe.api_base = fake.url
+        stripe.api_key = os.environ["STRIPE_SECRET_KEY"]
+        provider = OpenAIProvider(
+            openai_client=AsyncOpenAI(base_url=model_server.base_url, api_key="stub"),
+            use_responses=False,
+        )
+        config = RunConfig(model_provider=provider, tracing_disabled=True)
+        report = asyncio.run(_run(disputes, config, preroute=not args.llm_triage))
+
+    tools, prefetch = report["tools"], report["prefetch"]
+    report["round_trips_saved_per_investigation"] = (
+        tools["round_trips_per_tool_driven"] - prefetch["round_trips_per_prefetched"]
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Local stand-ins for external services used by the benchmarks."""
+import asyncio
+import operator
+import uuid
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from benchmarks.stub_server import BackgroundServer
+
+# Any string shaped like a JWT passes supabase-py's key check.
+FAKE_SUPABASE_KEY = "stub.stub.stub"
+
+
+_OPERATORS = {
+    "eq": operator.eq, "neq": operator.ne,
+    "gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le,
+}
+
+
+def _coerce(cell, value: str):
+    if isinstance(cell, (int, float)) and not isinstance(cell, bool):
+        try:
+            return float(cell), float(value)
+        except ValueError:
+            pass
+    return str(cell), value
+
+
+def _matches(row: dict, filters: list[tuple[str, str]]) -> bool:
+    for column, condition in filters:
+        op, _, value = condition.partition(".")
+        if op not in _OPERATORS or row.get(column) is None:
+            return False
+        if not _OPERATORS[op](*_coerce(row[column], value)):
+            return False
+    return True
+
+
+def create_postgrest_app(latency: float = 0.0) -> FastAPI:
+    """An in-memory subset of PostgREST: insert/upsert, filtered select and update."""
+    app = FastAPI()
+    app.state.tables = {}
+    # (table, conflict columns) -> {key values: row}, built on the first upsert.
+    app.state.indexes = {}
+    app.state.requests = 0
+
+    def split_params(request: Request):
+        reserved = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+        params = dict(request.query_params)
+        # A column may be filtered more than once, e.g. seq=gte.0&seq=lt.500.
+        filters = [(k, v) for k, v in request.query_params.multi_items() if k not in reserved]
+        return params, filters
+
+    @app.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request):
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        stored = app.state.tables.setdefault(table, [])
+        params, _ = split_params(request)
+        prefer = request.headers.get("prefer", "")
+        conflict = tuple(c for c in params.get("on_conflict", "").split(",") if c)
+        upsert = "resolution=merge-duplicates" in prefer and conflict
+        if upsert and (table, conflict) not in app.state.indexes:
+            app.state.indexes[table, conflict] = {tuple(r.get(c) for c in conflict): r for r in stored}
+        for row in rows:
+            if upsert:
+                existing = app.state.indexes[table, conflict].get(tuple(row.get(c) for c in conflict))
+                if existing is not None:
+                    existing.update(row)
+                    continue
+            stored.append(dict(row))
+            for (indexed, columns), index in app.state.indexes.items():
+                if indexed == table:
+                    index.setdefault(tuple(row.get(c) for c in columns), stored[-1])
+        if "return=minimal" in prefer:
+            return Response(status_code=201)
+        return JSONResponse(rows, status_code=201)
+
+    @app.get("/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        params, filters = split_params(request)
+        rows = [r for r in app.state.tables.get(table, []) if _matches(r, filters)]
+        if order := params.get("order"):
+            column, _, direction = order.partition(".")
+            rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=direction.startswith("desc"))
+        offset = int(params.get("offset", 0))
+        if "limit" in params:
+            rows = rows[offset:offset + int(params["limit"])]
+        else:
+            rows = rows[offset:]
+        columns = params.get("select", "*")
+        if columns != "*":
+            keep = columns.split(",")
+            rows = [{c: r.get(c) for c in keep} for r in rows]
+        return JSONResponse(rows)
+
+    @app.patch("/rest/v1/{table}")
+    async def update(table: str, request: Request):
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        _, filters = split_params(request)
+        changes = await request.json()
+        rows = [r for r in app.state.tables.get(table, []) if _matches(r, filters)]
+        for row in rows:
+            row.update(changes)
+        return JSONResponse(rows)
+
+    return app
+
+
+class FakeSpan:
+    """Minimal object with the parts of an SDK span that trace processors read."""
+
+    def __init__(self, trace_id: str):
+        self.span_id = f"span_{uuid.uuid4().hex}"
+        self.trace_id = trace_id
+
+    def export(self):
+        return {
+            "object": "trace.span",
+            "id": self.span_id,
+            "trace_id": self.trace_id,
+            "parent_id": None,
+            "started_at": "2025-01-01T00:00:00+00:00",
+            "ended_at": "2025-01-01T00:00:01+00:00",
+            "span_data": {"type": "function", "name": "get_order", "input": "{}", "output": "{}"},
+            "error": None,
+        }
+
+
+class NullSupabase:
+    """A Supabase client whose inserts succeed without doing any I/O."""
+
+    def table(self, name):
+        return self
+
+    def insert(self, rows, **kwargs):
+        return self
+
+    def execute(self):
+        return None
+
+
+class FakeSupabase(BackgroundServer):
+    """`with FakeSupabase() as fake: create_client(fake.url, FAKE_SUPABASE_KEY)`."""
+
+    def __init__(self, latency: float = 0.0, port: int = 0):
+        super().__init__(create_postgrest_app(latency), port)
+
+    @property
+    def tables(self) -> dict:
+        return self.app.state.tables
+
+    @property
+    def request_count(self) -> int:
+        return self.app.state.requests
+
+
+def make_disputes(count: int, open_ratio: float = 1.0) -> list[dict]:
+    """Stripe-shaped dispute objects, newest first, as `Dispute.list` returns them."""
+    created = 1_700_000_000
+    disputes = []
+    for i in range(count):
+        disputes.append({
+            "id": f"dp_{i:06d}",
+            "object": "dispute",
+            "amount": 2000 + i,
+            "currency": "usd",
+            "created": created - i,
+            "payment_intent": f"pi_{i:06d}",
+            "reason": "product_not_received",
+            "status": "needs_response" if i < count * open_ratio else "won",
+            "evidence_details": {"due_by": created + 7 * 86400},
+            "payment_method_details": {"card": {"brand": "visa"}},
+        })
+    return disputes
+
+
+def create_stripe_app(disputes: list[dict], latency: float = 0.0) -> FastAPI:
+    """The Stripe endpoints the dispute workflow uses, backed by `disputes`."""
+    app = FastAPI()
+    app.state.disputes = {d["id"]: d for d in disputes}
+    app.state.requests = 0
+
+    @app.get("/v1/disputes")
+    async def list_disputes(request: Request):
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        params = request.query_params
+        rows = list(app.state.disputes.values())
+        if payment_intent := params.get("payment_intent"):
+            rows = [d for d in rows if d["payment_intent"] == payment_intent]
+        if starting_after := params.get("starting_after"):
+            ids = [d["id"] for d in rows]
+            rows = rows[ids.index(starting_after) + 1:] if starting_after in ids else []
+        limit = int(params.get("limit", 10))
+        return JSONResponse({
+            "object": "list",
+            "url": "/v1/disputes",
+            "data": rows[:limit],
+            "has_more": len(rows) > limit,
+        })
+
+    @app.get("/v1/payment_intents/{payment_intent_id}")
+    async def retrieve_payment_intent(payment_intent_id: str):
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        index = int(payment_intent_id.rsplit("_", 1)[-1])
+        return JSONResponse({
+            "id": payment_intent_id,
+            "object": "payment_intent",
+            "amount": 2000 + index,
+            # Unshipped, delivered, and (every fifth) unknown orders, to exercise every route.
+            "metadata": {"order_id": "9999" if index % 5 == 0 else str(1234 if index % 2 else 1121)},
+        })
+
+    @app.post("/v1/disputes/{dispute_id}/close")
+    async def close_dispute(dispute_id: str):
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        dispute = app.state.disputes.get(dispute_id)
+        if dispute is None:
+            return JSONResponse(
+                {"error": {"type": "invalid_request_error", "message": f"No such dispute: '{dispute_id}'"}},
+                status_code=404,
+            )
+        dispute["status"] = "lost"
+        return JSONResponse(dispute)
+
+    return app
+
+
+class FakeStripe(BackgroundServer):
+    """`with FakeStripe(make_disputes(100)) as fake: stripe.api_base = fake.url`."""
+
+    def __init__(self, disputes: list[dict], latency: float = 0.0, port: int = 0):
+        super().__init__(create_stripe_app(disputes, latency), port)
+
+    @property
+    def disputes(self) -> dict:
+        return self.app.state.disputes
+
+    @property
+    def request_count(self) -> int:
+        return self.app.state.requests
@@ -0,0 +1,77 @@
+"""Guardrail classifier latency and token usage across model tiers.
+
+Runs the input guardrail's classifier agent three ways against stub models:
+on the main model, on a smaller/faster "classifier" tier with capped max_tokens,
+and on that tier with the reasoning-free verdict schema.
+
+    python -m benchmarks.guardrail_model_tiers --runs 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from agents import Agent, AsyncOpenAI, ModelSettings, OpenAIChatCompletionsModel, Runner
+from agents.run import RunConfig
+from benchmarks.stats import summarize
+from benchmarks.stub_server import StubServer, StubSettings
+
+
+def _config(server: StubServer, max_tokens: int | None = None) -> RunConfig:
+    client = AsyncOpenAI(base_url=server.base_url, api_key="stub")
+    return RunConfig(
+        model=OpenAIChatCompletionsModel(model="stub", openai_client=client),
+        model_settings=ModelSettings(max_tokens=max_tokens),
+        tracing_disabled=True,
+    )
+
+
+async def _measure(agent: Agent, config: RunConfig, runs: int) -> dict:
+    latencies, completion_tokens, total_tokens = [], 0, 0
+    started = time.perf_counter()
+    for _ in range(runs):
+        began = time.perf_counter()
+        result = await Runner.run(agent, "Can you solve 2x + 3 = 7 for me?", run_config=config)
+        latencies.append(time.perf_counter() - began)
+        for response in result.raw_responses:
+            completion_tokens += response.usage.output_tokens
+            total_tokens += response.usage.total_tokens
+    report = summarize(latencies, time.perf_counter() - started)
+    report["mean_completion_tokens"] = completion_tokens / runs
+    report["mean_total_tokens"] = total_tokens / runs
+    return report
+
+
+async def _run(args, main_server, small_server) -> dict:
+    from input import MathHomeworkOutput, MathHomeworkVerdict, guardrail_agent
+
+    with_reasoning = guardrail_agent.clone(output_type=MathHomeworkOutput)
+    verdict_only = guardrail_agent.clone(output_type=MathHomeworkVerdict)
+    return {
+        "main_model": await _measure(with_reasoning, _config(main_server), args.runs),
+        "classifier_tier": await _measure(with_reasoning, _config(small_server, args.max_tokens), args.runs),
+        "classifier_tier_verdict_only": await _measure(verdict_only, _config(small_server, args.max_tokens), args.runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--main-latency", type=float, default=0.3)
+    parser.add_argument("--main-tokens-per-second", type=float, default=80)
+    parser.add_argument("--small-latency", type=float, default=0.1)
+    parser.add_argument("--small-tokens-per-second", type=float, default=250)
+    parser.add_argument("--reasoning-words", type=int, default=40, help="length of the stub's reasoning text")
+    parser.add_argument("--max-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    main_settings = StubSettings(args.main_latency, args.main_tokens_per_second, args.reasoning_words)
+    small_settings = StubSettings(args.small_latency, args.small_tokens_per_second, args.reasoning_words)
+    with StubServer(main_settings) as main_server, StubServer(small_settings) as small_server:
+        report = asyncio.run(_run(args, main_server, small_server))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
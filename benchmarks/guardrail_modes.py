@@ -0,0 +1,104 @@
+"""Compare input guardrail scheduling modes in streaming.stream_agent_response.
+
+Runs a support agent guarded by an LLM classifier against the stub model server and
+reports end-to-end latency and time-to-first-token for the serial, parallel and SDK
+modes, plus time-to-rejection when the tripwire fires.
+
+    python -m benchmarks.guardrail_modes --runs 20 --latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import time
+from pydantic import BaseModel
+from agents import (
+    Agent, AsyncOpenAI, GuardrailFunctionOutput, InputGuardrailTripwireTriggered,
+    OpenAIChatCompletionsModel, Runner, input_guardrail,
+)
+from agents.run import RunConfig
+from benchmarks.stats import summarize
+from benchmarks.stub_server import StubServer, StubSettings
+from streaming import GUARDRAIL_MODES, stream_agent_response
+
+
+class Verdict(BaseModel):
+    is_math_homework: bool
+    reasoning: str
+
+
+class _NullMessage:
+    """Stands in for cl.Message; the benchmark only needs the streaming calls."""
+
+    content = ""
+
+    async def stream_token(self, token, is_sequence=False):
+        self.content = token if is_sequence else self.content + token
+
+    async def update(self):
+        pass
+
+
+def _build_agent(model, config, trip: bool):
+    classifier = Agent(name="Guardrail check", instructions="Check for math homework.", output_type=Verdict, model=model)
+
+    @input_guardrail
+    async def classifier_guardrail(ctx, agent, input):
+        result = await Runner.run(classifier, input, run_config=config)
+        return GuardrailFunctionOutput(output_info=result.final_output, tripwire_triggered=trip)
+
+    return Agent(
+        name="support agent",
+        instructions="You are a customer support agent.",
+        model=model,
+        input_guardrails=[classifier_guardrail],
+    )
+
+
+async def _measure(mode, agent, config, runs):
+    latencies, first_tokens = [], []
+    started_all = time.perf_counter()
+    for _ in range(runs):
+        started = time.perf_counter()
+        try:
+            _, first_token = await stream_agent_response(
+                agent, "How do I reset my password?", config, _NullMessage(), guardrail_mode=mode
+            )
+            if first_token is not None:
+                first_tokens.append(first_token)
+        except InputGuardrailTripwireTriggered:
+            pass
+        latencies.append(time.perf_counter() - started)
+    report = summarize(latencies, time.perf_counter() - started_all)
+    if first_tokens:
+        report["ttft_p50_ms"] = summarize(first_tokens, 1)["p50_ms"]
+    return report
+
+
+async def run_benchmark(base_url, runs):
+    client = AsyncOpenAI(base_url=base_url, api_key="stub")
+    model = OpenAIChatCompletionsModel(model="stub-model", openai_client=client)
+    config = RunConfig(model=model, tracing_disabled=True)
+    report = {}
+    for trip in (False, True):
+        agent = _build_agent(model, config, trip)
+        scenario = "tripped" if trip else "clean"
+        report[scenario] = {mode: await _measure(mode, agent, config, runs) for mode in GUARDRAIL_MODES}
+    clean = report["clean"]
+    report["parallel_saved_p50_ms"] = round(clean["serial"]["p50_ms"] - clean["parallel"]["p50_ms"], 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub model latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    args = parser.parse_args()
+
+    with StubServer(StubSettings(latency=args.latency, tokens_per_second=args.tokens_per_second)) as server:
+        report = asyncio.run(run_benchmark(server.base_url, args.runs))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Cold-start import cost of each entry point, measured with `python -X importtime`.
+
+Every sample imports one module in a fresh interpreter, so nothing is shared
+between samples. Reports the median cumulative import time per module and the
+heaviest modules it imports directly. Each module is also imported once with
+the API keys and Supabase settings removed from the environment, which should
+succeed now that clients are only created on first use.
+
+    python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --modules setup tracing --top 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+ENTRY_POINTS = ["setup", "tracing", "history", "dispute", "dispute_batch", "guardrails", "chatbot", "main"]
+SECRETS = ("GEMINI_API_KEY", "SUPABASE_URL", "SUPABASE_KEY", "STRIPE_SECRET_KEY")
+
+
+def _import(module: str, env: dict) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO, env=env, capture_output=True, text=True,
+    )
+
+
+def _parse(stderr: str) -> list[tuple[str, int, int]]:
+    """(name with nesting indent, self us, cumulative us) for each importtime line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(own), int(cumulative)))
+    return rows
+
+
+def _depth(name: str) -> int:
+    return (len(name) - len(name.lstrip()) - 1) // 2
+
+
+def measure(module: str, runs: int, top: int) -> dict:
+    env = {**os.environ, "PYTHONPATH": str(REPO)}
+    totals, packages = [], {}
+    for _ in range(runs):
+        completed = _import(module, env)
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1]}
+        rows = _parse(completed.stderr)
+        end = next(i for i, (name, _, _) in enumerate(rows) if name == f" {module}")
+        totals.append(rows[end][2])
+        # Lines are printed children first, one extra two-space indent per level,
+        # so the module's direct imports are the level-one lines just above it.
+        start = end
+        while start > 0 and _depth(rows[start - 1][0]) > 0:
+            start -= 1
+        for name, _, cumulative in rows[start:end]:
+            if _depth(name) == 1:
+                packages.setdefault(name.strip(), []).append(cumulative)
+    heaviest = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))[:top]
+
+    bare_env = {k: v for k, v in env.items() if k not in SECRETS}
+    bare = _import(module, bare_env)
+    return {
+        "cumulative_ms": round(statistics.median(totals) / 1000, 1),
+        "heaviest_imports_ms": {name: round(statistics.median(times) / 1000, 1) for name, times in heaviest},
+        "imports_without_env": bare.returncode == 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=ENTRY_POINTS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="heaviest direct imports to list per module")
+    args = parser.parse_args()
+
+    report = {module: measure(module, args.runs, args.top) for module in args.modules}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Concurrent-session load test for the chat handlers' run path.
+
+Simulates N chat sessions, each sending several turns through the process-wide run
+limiter the Chainlit handlers use, against the local stub model server. With
+`--stream` the turns are streamed like the handlers do and time-to-first-token is
+reported as well.
+
+    python -m benchmarks.load_test --sessions 128 --turns 3 --max-concurrent 32 --stream
+"""
+import argparse
+import asyncio
+import json
+import time
+from agents import Agent, AsyncOpenAI, OpenAIChatCompletionsModel, Runner
+from agents.run import RunConfig
+import concurrency
+from benchmarks.stats import summarize
+from benchmarks.stub_server import StubServer, StubSettings
+
+
+async def _streamed_turn(agent, history, config, first_token_latencies):
+    started = time.perf_counter()
+    first_token = None
+    async with concurrency.run_limiter:
+        result = Runner.run_streamed(agent, history, run_config=config)
+        async for event in result.stream_events():
+            if (first_token is None and event.type == "raw_response_event"
+                    and event.data.type == "response.output_text.delta"):
+                first_token = time.perf_counter() - started
+    if first_token is not None:
+        first_token_latencies.append(first_token)
+    return result
+
+
+async def _session(agent, config, turns, stream, latencies, first_token_latencies):
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"Question {turn}"})
+        started = time.perf_counter()
+        if stream:
+            result = await _streamed_turn(agent, history, config, first_token_latencies)
+        else:
+            result = await concurrency.run_agent(agent, history, run_config=config)
+        latencies.append(time.perf_counter() - started)
+        history = result.to_input_list()
+
+
+async def _watch_loop_lag(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    """Records how late the event loop wakes up; large values mean something is blocking it."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run_load_test(base_url, sessions, turns, max_concurrent, stream=False):
+    concurrency.set_run_limit(max_concurrent)
+    client = AsyncOpenAI(base_url=base_url, api_key="stub")
+    model = OpenAIChatCompletionsModel(model="stub-model", openai_client=client)
+    config = RunConfig(model=model, tracing_disabled=True)
+    agent = Agent(name="Load Test Agent", instructions="You are a helpful assistant.", model=model)
+
+    latencies, first_token_latencies, lags = [], [], []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(_watch_loop_lag(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _session(agent, config, turns, stream, latencies, first_token_latencies)
+        for _ in range(sessions)
+    ))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+
+    report = summarize(latencies, elapsed)
+    report.update({
+        "sessions": sessions,
+        "turns_per_session": turns,
+        "max_concurrent": max_concurrent,
+        "elapsed_s": round(elapsed, 3),
+        "max_loop_lag_ms": round(max(lags, default=0.0) * 1000, 2),
+    })
+    if stream:
+        ttft = summarize(first_token_latencies, elapsed)
+        report["ttft_p50_ms"] = ttft["p50_ms"]
+        report["ttft_p99_ms"] = ttft["p99_ms"]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=128)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-concurrent", type=int, default=concurrency.MAX_CONCURRENT_RUNS)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true", help="stream turns like the chat handlers")
+    args = parser.parse_args()
+
+    settings = StubSettings(latency=args.latency, tokens_per_second=args.tokens_per_second)
+    with StubServer(settings) as server:
+        report = asyncio.run(run_load_test(
+            server.base_url, args.sessions, args.turns, args.max_concurrent, args.stream
+        ))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Overhead of the in-process metrics, and what they report for a traced turn.
+
+Measures the cost of one Histogram.observe and the extra cost per SDK span of
+feeding MetricsProcessor. It then runs an agent that calls a tool against the
+stub model server, reports that turn's breakdown, and scrapes the Prometheus
+endpoint once.
+
+    python -m benchmarks.metrics_overhead --observations 1000000 --spans 100000
+"""
+import argparse
+import asyncio
+import json
+import time
+import urllib.request
+from agents import Agent, AsyncOpenAI, OpenAIChatCompletionsModel, Runner, function_span, function_tool, trace
+from agents.run import RunConfig
+from agents.tracing import set_trace_processors
+from benchmarks.stub_server import StubServer, StubSettings
+from metrics import Histogram, metrics_processor, registry, serve
+
+
+def _observe_ns(observations: int) -> float:
+    histogram = Histogram("bench_seconds", "Benchmark.", ("name",))
+    started = time.perf_counter()
+    for i in range(observations):
+        histogram.observe((i % 1000) / 1000, "tool")
+    return (time.perf_counter() - started) / observations * 1e9
+
+
+def _span_ns(spans: int, processors: list) -> float:
+    set_trace_processors(processors)
+    with trace("Metrics overhead"):
+        started = time.perf_counter()
+        for _ in range(spans):
+            with function_span("get_order"):
+                pass
+        elapsed = time.perf_counter() - started
+    return elapsed / spans * 1e9
+
+
+@function_tool
+def get_order(order_id: int) -> str:
+    """Look up an order."""
+    return "shipped"
+
+
+async def _turn(server: StubServer) -> dict:
+    client = AsyncOpenAI(base_url=server.base_url, api_key="stub")
+    model = OpenAIChatCompletionsModel(model="stub-model", openai_client=client)
+    triage = Agent(name="Triage Agent", instructions="You are a triage agent", model=model, tools=[get_order])
+    config = RunConfig(trace_include_sensitive_data=False)
+    with trace("Chat turn") as turn:
+        await Runner.run(triage, "Where is order 1234?", run_config=config)
+    return metrics_processor.turn(turn.trace_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--observations", type=int, default=1_000_000)
+    parser.add_argument("--spans", type=int, default=100_000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=9465)
+    args = parser.parse_args()
+
+    report = {"observe_ns": round(_observe_ns(args.observations), 1)}
+    baseline = _span_ns(args.spans, [])
+    instrumented = _span_ns(args.spans, [metrics_processor])
+    report["span_ns_without_metrics"] = round(baseline, 1)
+    report["span_ns_with_metrics"] = round(instrumented, 1)
+    report["metrics_ns_per_span"] = round(instrumented - baseline, 1)
+
+    # The stub calls get_order once, then answers: two model calls and one tool call.
+    with StubServer(StubSettings(latency=args.latency, call_tools=True)) as server:
+        report["turn"] = asyncio.run(_turn(server))
+
+    serve(args.port)
+    started = time.perf_counter()
+    with urllib.request.urlopen(f"http://127.0.0.1:{args.port}/metrics") as response:
+        body = response.read().decode()
+    report["scrape_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    report["scrape_lines"] = len(body.splitlines())
+    report["scrape_sample"] = [line for line in body.splitlines() if line.startswith("agent_tool_seconds_count")]
+    report["model_call_seconds"] = registry.snapshot()["agent_model_call_seconds"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
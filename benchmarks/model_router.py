@@ -0,0 +1,85 @@
+"""Latency and failure handling of the routing Model against local mock providers.
+
+Starts three stub providers: "fast" with a slow tail, "steady" with higher but
+stable latency, and "broken", which fails every request. Compares the fast
+provider on its own with the router over all three. The router should hedge
+past the tail, fail over from the broken provider and then rank it last.
+
+    python -m benchmarks.model_router --requests 200 --slow-rate 0.1
+"""
+import argparse
+import asyncio
+import json
+import time
+from agents import Agent, AsyncOpenAI, OpenAIChatCompletionsModel, Runner
+from agents.run import RunConfig
+from benchmarks.stats import summarize
+from benchmarks.stub_server import StubServer, StubSettings
+from model_router import Backend, RoutingModel
+
+
+def _model(server: StubServer) -> OpenAIChatCompletionsModel:
+    # No client-side retries, so failures reach the router immediately.
+    client = AsyncOpenAI(base_url=server.base_url, api_key="stub", max_retries=0)
+    return OpenAIChatCompletionsModel(model="stub", openai_client=client)
+
+
+async def _measure(model, requests: int, stream: bool) -> dict:
+    agent = Agent(name="Assistant", instructions="Answer briefly.", model=model)
+    config = RunConfig(tracing_disabled=True)
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        began = time.perf_counter()
+        try:
+            if stream:
+                result = Runner.run_streamed(agent, "Hello", run_config=config)
+                async for _event in result.stream_events():
+                    pass
+            else:
+                await Runner.run(agent, "Hello", run_config=config)
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - began)
+    report = summarize(latencies, time.perf_counter() - started)
+    report["errors"] = errors
+    return report
+
+
+async def _run(args, fast, steady, broken) -> dict:
+    # One event loop for both phases: pooled connections are bound to it.
+    report = {"fast_only": await _measure(_model(fast), args.requests, args.stream)}
+    router = RoutingModel(
+        [
+            Backend("broken", _model(broken), failure_threshold=3, cooldown=60),
+            Backend("fast", _model(fast)),
+            Backend("steady", _model(steady)),
+        ],
+        hedge_after=args.slow_latency / 2,
+    )
+    report["router"] = await _measure(router, args.requests, args.stream)
+    report["router"].update(router.stats())
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--fast-latency", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="share of fast-provider requests in the tail")
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--steady-latency", type=float, default=0.12)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    fast_settings = StubSettings(latency=args.fast_latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    with StubServer(fast_settings) as fast, \
+            StubServer(StubSettings(latency=args.steady_latency)) as steady, \
+            StubServer(StubSettings(latency=0.01, error_rate=1.0)) as broken:
+        report = asyncio.run(_run(args, fast, steady, broken))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import math
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (pct in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, elapsed):
+    """p50/p99/mean latency in milliseconds plus throughput for a run."""
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
@@ -0,0 +1,96 @@
+"""Time to rejection and tokens generated for final vs incremental output guardrails.
+
+Streams a support agent's answer from the stub model server. In the "tripped"
+scenario the answer works a math problem in its first sentence and then keeps
+going; in the "clean" scenario it does not. The "final" mode leaves the math
+output guardrail to the SDK, which checks the finished response. The
+"incremental" mode feeds each chunk to output.IncrementalMathOutputCheck and
+stops generation as soon as it trips.
+
+    python -m benchmarks.streaming_output_guardrail --runs 10 --tokens-per-second 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from agents import Agent, AsyncOpenAI, OpenAIChatCompletionsModel, OutputGuardrailTripwireTriggered
+from agents.run import RunConfig
+from benchmarks.guardrail_modes import _NullMessage
+from benchmarks.stats import summarize
+from benchmarks.stub_server import StubServer, StubSettings
+
+TRIPPED_TEXT = (
+    "Sure, subtract 3 from both sides and divide by 2, so x = 2 is the answer. "
+    + "Let me know if there is anything else I can help you with today. " * 8
+)
+CLEAN_TEXT = "You can reset your password from the account settings page. " * 9
+
+
+async def _measure(server: StubServer, incremental: bool, runs: int) -> dict:
+    from output import IncrementalMathOutputCheck, math_output_guardrail
+    from streaming import stream_agent_response
+
+    client = AsyncOpenAI(base_url=server.base_url, api_key="stub")
+    model = OpenAIChatCompletionsModel(model="stub", openai_client=client)
+    agent = Agent(
+        name="support agent",
+        instructions="You are a customer support agent.",
+        model=model,
+        output_guardrails=[math_output_guardrail],
+    )
+    config = RunConfig(model=model, tracing_disabled=True)
+    latencies, rejections, shown = [], 0, 0
+    tokens_before = server.streamed_tokens
+    started = time.perf_counter()
+    for _ in range(runs):
+        msg = _NullMessage()
+        check = IncrementalMathOutputCheck(agent) if incremental else None
+        began = time.perf_counter()
+        try:
+            await stream_agent_response(agent, "How do I solve 2x + 3 = 7?", config, msg, output_check=check)
+        except OutputGuardrailTripwireTriggered:
+            rejections += 1
+        latencies.append(time.perf_counter() - began)
+        shown += len(msg.content)
+    report = summarize(latencies, time.perf_counter() - started)
+    report["rejections"] = rejections
+    # A cancelled stream may still flush a token or two after the client hangs up.
+    await asyncio.sleep(0.1)
+    report["mean_tokens_generated"] = (server.streamed_tokens - tokens_before) / runs
+    report["mean_chars_shown"] = shown / runs
+    return report
+
+
+async def _run(args, tripped: StubServer, clean: StubServer) -> dict:
+    report = {}
+    for scenario, server in (("tripped", tripped), ("clean", clean)):
+        report[scenario] = {
+            "final": await _measure(server, False, args.runs),
+            "incremental": await _measure(server, True, args.runs),
+        }
+    tripped_report = report["tripped"]
+    report["rejection_saved_p50_ms"] = round(
+        tripped_report["final"]["p50_ms"] - tripped_report["incremental"]["p50_ms"], 2
+    )
+    from output import math_output_stream_stats
+    report["stream_checks"] = math_output_stream_stats.snapshot()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    with StubServer(StubSettings(args.latency, args.tokens_per_second, text=TRIPPED_TEXT)) as tripped, \
+            StubServer(StubSettings(args.latency, args.tokens_per_second, text=CLEAN_TEXT)) as clean:
+        report = asyncio.run(_run(args, tripped, clean))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Throughput of the dispute agents' Stripe tools as concurrency grows.
+
+Invokes `retrieve_payment_intent` and `close_dispute` against a fake Stripe API,
+next to a copy of the old tools that called the synchronous Stripe methods from
+`async def`. Blocking calls serialize on the event loop, so their throughput stays
+flat; the async tools should scale until the fake's latency is saturated.
+
+    python -m benchmarks.stripe_tools --calls 200 --latency 0.05 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from benchmarks.fakes import FakeStripe, make_disputes
+from benchmarks.stats import summarize
+
+
+async def _blocking_tools(stripe, index: int):
+    stripe.PaymentIntent.retrieve(f"pi_{index:06d}")
+    stripe.Dispute.close(f"dp_{index:06d}")
+
+
+async def _async_tools(ctx, index: int):
+    from dispute import close_dispute, retrieve_payment_intent
+
+    await retrieve_payment_intent.on_invoke_tool(ctx, json.dumps({"payment_intent_id": f"pi_{index:06d}"}))
+    await close_dispute.on_invoke_tool(ctx, json.dumps({"dispute_id": f"dp_{index:06d}"}))
+
+
+async def _measure(call, calls: int, concurrency: int) -> dict:
+    limiter = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index):
+        async with limiter:
+            started = time.perf_counter()
+            await call(index)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def _run(args, stripe):
+    from agents import RunContextWrapper
+
+    ctx = RunContextWrapper(context=None)
+    report = {}
+    for concurrency in args.concurrency:
+        report[str(concurrency)] = {
+            "blocking": await _measure(lambda i: _blocking_tools(stripe, i), args.calls, concurrency),
+            "async": await _measure(lambda i: _async_tools(ctx, i), args.calls, concurrency),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="tool pairs per measurement")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Stripe latency per request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    os.environ.setdefault("STRIPE_SECRET_KEY", "sk_test_stub")
+    from dispute import stripe_api
+
+    # Configured here, as the tools would on their first call, so both modes share it.
+    stripe = stripe_api()
+
+    with FakeStripe(make_disputes(args.calls), latency=args.latency) as fake:
+        stripe.api_base = fake.url
+        report = asyncio.run(_run(args, stripe))
+        report["stripe_requests"] = fake.request_count
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
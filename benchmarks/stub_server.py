@@ -0,0 +1,284 @@
+"""A local OpenAI-compatible chat completions server with deterministic latency.
+
+    python -m benchmarks.stub_server --port 8001 --latency 0.2 --tokens-per-second 200
+
+Point an `AsyncOpenAI(base_url=server.base_url, api_key="stub")` client at it.
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubSettings:
+    latency: float = 0.2
+    """Seconds before the first token is produced."""
+    tokens_per_second: float = 0.0
+    """Token generation rate after the first token; 0 means instant."""
+    completion_tokens: int = 32
+    """Number of tokens in each plain-text completion."""
+    error_rate: float = 0.0
+    """Fraction of requests answered with HTTP 500."""
+    slow_rate: float = 0.0
+    """Fraction of requests that wait `slow_latency` instead of `latency` (a latency tail)."""
+    slow_latency: float = 2.0
+    call_tools: bool = False
+    """Call each offered tool once, one per turn, before answering.
+    Handoff tools (transfer_to_*) are only called through `handoffs`."""
+    handoffs: dict[str, str] | None = None
+    """Keyword -> handoff tool, e.g. {"refund": "transfer_to_refund_agent"}. The tool is
+    called if it is offered and the keyword is in the latest user message."""
+    text: str | None = None
+    """Fixed plain-text completion, used instead of `completion_tokens` generated tokens."""
+    replies: dict[str, str] | None = None
+    """Keyword -> plain-text completion for latest user messages containing the keyword;
+    other messages get `text`."""
+
+
+def _sample_from_schema(schema: dict, words: int = 1):
+    """Build a small value that satisfies a (strict) JSON schema; strings get `words` words."""
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if "anyOf" in schema:
+        return _sample_from_schema(schema["anyOf"][0], words)
+    if kind == "object":
+        return {name: _sample_from_schema(prop, words) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return []
+    if kind == "boolean":
+        return False
+    if kind in ("integer", "number"):
+        return 0
+    if kind == "string":
+        return " ".join(["stub"] * max(words, 1))
+    return None
+
+
+def _latest_user_text(body: dict) -> str:
+    for message in reversed(body.get("messages", [])):
+        if message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, list):
+                content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return (content or "").lower()
+    return ""
+
+
+def _completion_text(body: dict, settings: StubSettings) -> str:
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format.get("json_schema", {}).get("schema", {})
+        # String fields stand in for free text such as a classifier's reasoning.
+        return json.dumps(_sample_from_schema(schema, settings.completion_tokens))
+    user_text = _latest_user_text(body)
+    for keyword, reply in (settings.replies or {}).items():
+        if keyword in user_text:
+            return reply
+    if settings.text is not None:
+        return settings.text
+    return " ".join(f"token{i}" for i in range(settings.completion_tokens))
+
+
+def _next_tool_call(body: dict, settings: StubSettings) -> dict | None:
+    messages = body.get("messages", [])
+    called = {call["function"]["name"] for message in messages for call in message.get("tool_calls") or []}
+    offered = {tool.get("function", {}).get("name", ""): tool.get("function", {}) for tool in body.get("tools") or []}
+
+    def call(name: str) -> dict:
+        arguments = _sample_from_schema(offered[name].get("parameters", {}))
+        return {"id": f"call_{len(called)}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+    user_text = _latest_user_text(body)
+    for keyword, name in (settings.handoffs or {}).items():
+        if name in offered and name not in called and keyword in user_text:
+            return call(name)
+    if settings.call_tools:
+        for name in offered:
+            if name and not name.startswith("transfer_to_") and name not in called:
+                return call(name)
+    return None
+
+
+def _split_tokens(text: str) -> list[str]:
+    words = text.split(" ")
+    return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+
+def _usage(body: dict, completion: str) -> dict:
+    prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+    completion_tokens = len(_split_tokens(completion))
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def create_app(settings: StubSettings) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+    # Tokens actually sent on streams; lower than the completion's if the client hangs up.
+    app.state.streamed_tokens = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        model = body.get("model", "stub-model")
+        text = _completion_text(body, settings)
+        tokens = _split_tokens(text)
+        delay = 1 / settings.tokens_per_second if settings.tokens_per_second else 0.0
+
+        if random.random() < settings.error_rate:
+            await asyncio.sleep(settings.latency)
+            return JSONResponse({"error": {"message": "stub failure", "type": "server_error"}}, status_code=500)
+        await asyncio.sleep(settings.slow_latency if random.random() < settings.slow_rate else settings.latency)
+
+        tool_call = _next_tool_call(body, settings)
+        if not body.get("stream"):
+            if tool_call is not None:
+                return JSONResponse({
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": None, "tool_calls": [tool_call]},
+                        "finish_reason": "tool_calls",
+                    }],
+                    "usage": _usage(body, tool_call["function"]["arguments"]),
+                })
+            await asyncio.sleep(delay * (len(tokens) - 1))
+            return JSONResponse({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": _usage(body, text),
+            })
+
+        async def events():
+            if tool_call is not None:
+                delta = {"tool_calls": [{"index": 0, **tool_call}]}
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": "tool_calls"}],
+                    "usage": _usage(body, tool_call["function"]["arguments"]),
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+                return
+            for i, token in enumerate(tokens):
+                if i and delay:
+                    await asyncio.sleep(delay)
+                app.state.streamed_tokens += 1
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": _usage(body, text),
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BackgroundServer:
+    """Runs an ASGI app on a background thread for the duration of a `with` block."""
+
+    def __init__(self, app, port: int = 0):
+        self.app = app
+        self.port = port or _free_port()
+        self._server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
+
+
+class StubServer(BackgroundServer):
+    """The stub model server, for use as `with StubServer(settings) as server: ...`."""
+
+    def __init__(self, settings: StubSettings | None = None, port: int = 0):
+        self.settings = settings or StubSettings()
+        super().__init__(create_app(self.settings), port)
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1/"
+
+    @property
+    def request_count(self) -> int:
+        return self.app.state.requests
+
+    @property
+    def streamed_tokens(self) -> int:
+        return self.app.state.streamed_tokens
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=32)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--call-tools", action="store_true")
+    args = parser.parse_args()
+    settings = StubSettings(
+        args.latency, args.tokens_per_second, args.completion_tokens,
+        args.error_rate, args.slow_rate, args.slow_latency, args.call_tools,
+    )
+    uvicorn.run(create_app(settings), host="127.0.0.1", port=args.port)
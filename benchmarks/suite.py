@@ -0,0 +1,400 @@
+"""The offline benchmark suite: the real entry points against local stand-ins.
+
+Starts the stub model server, a fake Supabase (PostgREST) and a fake Stripe
+API. The app is pointed at them through its own settings: BASE_URL,
+SUPABASE_URL/SUPABASE_KEY, STRIPE_SECRET_KEY and stripe.api_base. The
+scenarios then drive the real code:
+
+  chatbot     chatbot.py's Chainlit handlers: concurrent sessions of triage turns,
+              two of them handing off to the billing and refund agents
+  guardrails  guardrails.py's handlers: clean, escalated (LLM-checked),
+              input-tripping and output-tripping turns, then resuming sessions
+              that already have a long history in Supabase, with and without
+              a saved summary
+  disputes    dispute.process_dispute over a batch of open disputes
+  tracing     tracing.py's Supabase export of every span above, flushed and counted
+
+Tracing is configured with tracing.configure_tracing, so all spans also feed
+metrics.py. Per-turn model, tool and guardrail counts come from its
+histograms. Stub latencies are fixed and nothing is random, so two runs on the
+same machine differ only by noise. Save a run and compare a later one against it:
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --compare before.json --threshold 0.25
+
+With --compare, the exit status is 1 if any latency (_ms) got slower, or any
+throughput (_per_s) got lower, by more than the threshold.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+import warnings
+from datetime import datetime, timezone
+from benchmarks.fakes import FAKE_SUPABASE_KEY, FakeStripe, FakeSupabase, make_disputes
+from benchmarks.stats import summarize
+from benchmarks.stub_server import StubServer, StubSettings
+
+SCENARIOS = ("chatbot", "guardrails", "disputes", "tracing")
+
+# The stub hands off when the user's message mentions a refund or a bill.
+HANDOFFS = {"refund": "transfer_to_refund_agent", "bill": "transfer_to_billing_agent"}
+CHAT_TURNS = [
+    "Hi, I have a question about my order",
+    "I want a refund for my last order",
+    "Why is my bill higher this month?",
+]
+
+# One turn of each kind per session, in this order. The local classifier clears
+# the first, escalates the second to the LLM and trips on the third; the stub's
+# answer to the fourth works a sum, which trips the output guardrail.
+GUARDRAIL_TURNS = {
+    "clean": "Hi, where is my order?",
+    "escalated": "Can you help me calculate my total?",
+    "input_trip": "Can you solve for x: 2x + 3 = 7",
+    "output_trip": "Explain the late fee on my invoice",
+}
+REPLIES = {"late fee": "Your late fee is 5 + 5 = 10 dollars this month. It is added to your next invoice."}
+
+
+def _revision() -> str | None:
+    try:
+        revision = subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision or None
+
+
+def _span_totals() -> dict:
+    """Running totals from metrics.py's histograms, to diff around a scenario."""
+    from metrics import registry
+
+    snapshot = registry.snapshot()
+
+    def total(name: str, field: str) -> float:
+        return sum(series[field] for series in snapshot.get(name, {}).values())
+
+    return {
+        "model_calls": total("agent_model_call_seconds", "count"),
+        "model_ms": total("agent_model_call_seconds", "sum") * 1000,
+        "tool_calls": total("agent_tool_seconds", "count"),
+        "guardrail_checks": total("agent_guardrail_seconds", "count"),
+        "guardrail_ms": total("agent_guardrail_seconds", "sum") * 1000,
+        "handoffs": sum(snapshot.get("agent_handoffs_total", {}).values()),
+        "persistence_ms": total("agent_persistence_seconds", "sum") * 1000,
+    }
+
+
+def _per_unit(before: dict, after: dict, units: int) -> dict:
+    return {name: round((after[name] - before[name]) / units, 3) if units else 0.0 for name in after}
+
+
+def _latency(values: list[float]) -> dict:
+    summary = summarize(values, 0)
+    del summary["throughput_per_s"]
+    return summary
+
+
+async def _session(handlers, turns: list[str], query_params: dict | None = None) -> dict:
+    """One Chainlit session: `start`, then `main` once per turn, each timed."""
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    # An HTTP context has a no-op emitter, so messages and steps go nowhere.
+    init_http_context()
+    if query_params:
+        cl.user_session.set("query_params", query_params)
+    started = time.perf_counter()
+    await handlers.start()
+    start_seconds = time.perf_counter() - started
+    latencies = []
+    for text in turns:
+        started = time.perf_counter()
+        await handlers.main(cl.Message(content=text))
+        latencies.append(time.perf_counter() - started)
+    return {"start": start_seconds, "turns": latencies, "session_id": cl.user_session.get("session_id")}
+
+
+async def chatbot_scenario(args) -> dict:
+    import chatbot
+    from response_cache import response_cache
+
+    before = _span_totals()
+    started = time.perf_counter()
+    sessions = await asyncio.gather(*(_session(chatbot, CHAT_TURNS) for _ in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    turns = [latency for session in sessions for latency in session["turns"]]
+    return {
+        "session_start": _latency([session["start"] for session in sessions]),
+        "turns": summarize(turns, elapsed),
+        "per_turn": _per_unit(before, _span_totals(), len(turns)),
+        "response_cache": response_cache.stats(),
+    }
+
+
+async def guardrails_scenario(args) -> dict:
+    import guardrails
+    from history import SessionHeader, save_chat_history, save_session_header
+    from input import math_guardrail_stats
+    from output import math_output_stream_stats
+    from session_store import session_store
+
+    before = _span_totals()
+    started = time.perf_counter()
+    turns = list(GUARDRAIL_TURNS.values())
+    sessions = await asyncio.gather(*(_session(guardrails, turns) for _ in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for session in sessions for latency in session["turns"]]
+    report = {
+        "turns": summarize(latencies, elapsed),
+        "by_kind": {
+            kind: _latency([session["turns"][i] for session in sessions])
+            for i, kind in enumerate(GUARDRAIL_TURNS)
+        },
+        "per_turn": _per_unit(before, _span_totals(), len(latencies)),
+        "input_tiers": math_guardrail_stats.snapshot(),
+        "output_stream": math_output_stream_stats.snapshot(),
+    }
+
+    # Resume sessions this process has never seen, so their history comes from
+    # Supabase. Every other one has a saved summary of all but its last turns, as
+    # a session that outgrew the context window would; the others have their
+    # older items loaded on the first turn.
+    history = []
+    for i in range(args.history_turns):
+        history.append({"role": "user", "content": f"Question {i} about my order"})
+        history.append({"role": "assistant", "content": f"Answer {i}: your order ships soon. " * 4})
+    header = SessionHeader(len(history), "The customer asked about the shipping of several orders.", len(history) - 12)
+    resumed_ids = [f"resume-{uuid.uuid4()}" for _ in range(args.sessions)]
+    for i, session_id in enumerate(resumed_ids):
+        await save_chat_history(session_id, history)
+        if i % 2:
+            await save_session_header(session_id, header)
+    resumed = await asyncio.gather(*(
+        _session(guardrails, [GUARDRAIL_TURNS["clean"]], {"session_id": session_id}) for session_id in resumed_ids
+    ))
+    report["resume"] = {
+        "history_items": len(history),
+        **_latency([session["start"] for session in resumed]),
+        "loaded": sum(session["session_id"] == session_id for session, session_id in zip(resumed, resumed_ids)),
+        "first_turn_hydrated": _latency([session["turns"][0] for session in resumed[::2]]),
+        "first_turn_summarized": _latency([session["turns"][0] for session in resumed[1::2]]),
+    }
+
+    started = time.perf_counter()
+    await guardrails.shutdown()
+    report["shutdown_drain_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    report["session_store"] = session_store.stats()
+    return report
+
+
+async def disputes_scenario(args) -> dict:
+    from dispute import evidence_stats, process_dispute, routing_stats, triage_agent
+
+    payment_intents = [d["payment_intent"] for d in make_disputes(args.disputes)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run(payment_intent: str) -> float:
+        async with semaphore:
+            started = time.perf_counter()
+            await process_dispute(payment_intent, triage_agent)
+            return time.perf_counter() - started
+
+    before = _span_totals()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run(pi) for pi in payment_intents), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    latencies = [r for r in results if isinstance(r, float)]
+    return {
+        "disputes": summarize(latencies, elapsed),
+        "failed": len(results) - len(latencies),
+        "per_dispute": _per_unit(before, _span_totals(), len(payment_intents)),
+        "routing": routing_stats.snapshot(),
+        "evidence": evidence_stats.snapshot(),
+    }
+
+
+def tracing_scenario(args, supabase: FakeSupabase) -> dict:
+    from agents import function_span, trace
+    from tracing import configure_tracing
+
+    processor = configure_tracing()
+    # The callbacks run on the caller's thread for every span; export happens
+    # on the exporter thread.
+    with trace("Benchmark spans"):
+        started = time.perf_counter()
+        for _ in range(args.spans):
+            with function_span("get_order"):
+                pass
+        span_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    processor.force_flush(timeout=60)
+    flush_seconds = time.perf_counter() - started
+    stats = processor.stats()
+    stored = len(supabase.tables.get("traces", [])) + len(supabase.tables.get("spans", []))
+    return {
+        "span_callbacks_us": round(span_seconds / args.spans * 1e6, 2),
+        "flush_ms": round(flush_seconds * 1000, 2),
+        "exporter": stats,
+        "rows_stored": stored,
+        "all_exported": stats["exported"] == stored and not stats["dropped"] and not stats["failed"],
+    }
+
+
+async def _run(args, stripe_url: str, supabase: FakeSupabase) -> dict:
+    from dispute import stripe_api
+
+    # Stripe's pooled async client is bound to the loop that first uses it.
+    stripe_api().api_base = stripe_url
+    results = {}
+    if "chatbot" in args.scenarios:
+        results["chatbot"] = await chatbot_scenario(args)
+    if "guardrails" in args.scenarios:
+        results["guardrails"] = await guardrails_scenario(args)
+    if "disputes" in args.scenarios:
+        results["disputes"] = await disputes_scenario(args)
+    if "tracing" in args.scenarios:
+        results["tracing"] = tracing_scenario(args, supabase)
+    return results
+
+
+def _flatten(data: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(before: dict, after: dict, threshold: float, min_ms: float = 1.0, min_p99_count: int = 50) -> list[dict]:
+    """Latency and throughput changes between two suite results.
+
+    `change` is how much worse `after` is: +0.2 means 20% slower (or 20% less
+    throughput). Latencies under `min_ms` in both runs, and p99s over fewer
+    than `min_p99_count` samples (which are just the slowest sample), are too
+    noisy to compare.
+    """
+    old, new = _flatten(before["scenarios"]), _flatten(after["scenarios"])
+    rows = []
+    for metric, value in new.items():
+        previous = old.get(metric)
+        if previous is None:
+            continue
+        if metric.endswith("p99_ms") and new.get(metric.rsplit(".", 1)[0] + ".count", 0) < min_p99_count:
+            continue
+        if metric.endswith("_ms"):
+            if max(previous, value) < min_ms:
+                continue
+            change = value / previous - 1 if previous else math.inf
+        elif metric.endswith("_per_s"):
+            if not previous:
+                continue
+            change = previous / value - 1 if value else math.inf
+        else:
+            continue
+        rows.append({
+            "metric": metric,
+            "before": previous,
+            "after": value,
+            "change": round(change, 3),
+            "regression": change > threshold,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.1, help="stub model time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--completion-tokens", type=int, default=32)
+    parser.add_argument("--supabase-latency", type=float, default=0.01)
+    parser.add_argument("--stripe-latency", type=float, default=0.02)
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent chat sessions per scenario")
+    parser.add_argument("--history-turns", type=int, default=200, help="turns in each resumed session's history")
+    parser.add_argument("--disputes", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="disputes processed at once")
+    parser.add_argument("--spans", type=int, default=10_000, help="spans timed through the trace processors")
+    parser.add_argument("--output", help="write the results to this file as well as stdout")
+    parser.add_argument("--compare", help="an earlier --output file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    settings = StubSettings(
+        latency=args.latency, tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens, handoffs=HANDOFFS, replies=REPLIES,
+    )
+    started_at = datetime.now(timezone.utc).isoformat()
+    with StubServer(settings) as model_server, \
+            FakeSupabase(latency=args.supabase_latency) as supabase, \
+            FakeStripe(make_disputes(args.disputes), latency=args.stripe_latency) as stripe_fake:
+        os.environ.update({
+            "BASE_URL": model_server.base_url,
+            "GEMINI_API_KEY": "stub",
+            "SUPABASE_URL": supabase.url,
+            "SUPABASE_KEY": FAKE_SUPABASE_KEY,
+            "STRIPE_SECRET_KEY": "sk_test_stub",
+        })
+        from agents.tracing import set_trace_processors
+        from tracing import configure_tracing
+
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        # ChatSettings.send calls the HTTP context's emitter without awaiting it.
+        warnings.filterwarnings("ignore", message="coroutine 'BaseChainlitEmitter")
+        # The handlers print every turn; keep stdout for the results.
+        with contextlib.redirect_stdout(io.StringIO()):
+            processor = configure_tracing()
+            scenarios = asyncio.run(_run(args, stripe_fake.url, supabase))
+            # Shut down here rather than from the SDK's atexit hook, which prints.
+            processor.shutdown()
+            set_trace_processors([])
+        scenarios["requests"] = {
+            "model": model_server.request_count,
+            "supabase": supabase.request_count,
+            "stripe": stripe_fake.request_count,
+        }
+
+    result = {
+        "meta": {
+            "revision": _revision(),
+            "python": platform.python_version(),
+            "started_at": started_at,
+            "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "threshold")},
+        },
+        "scenarios": scenarios,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        result["comparison"] = {
+            "baseline_revision": baseline["meta"].get("revision"),
+            "metrics": compare(baseline, result, args.threshold),
+        }
+        regressions = [row for row in result["comparison"]["metrics"] if row["regression"]]
+    print(json.dumps(result, indent=2))
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
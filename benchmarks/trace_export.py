@@ -0,0 +1,80 @@
+"""Per-span overhead of SupabaseTraceProcessor against a local PostgREST stand-in.
+
+Compares the old inline export (one INSERT per span on the caller's thread) with
+the batched background exporter.
+
+    python -m benchmarks.trace_export --spans 2000 --latency 0.005
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from benchmarks.fakes import FAKE_SUPABASE_KEY, FakeSpan, FakeSupabase
+from benchmarks.stats import summarize
+
+
+def _inline(client, spans):
+    latencies = []
+    for span in spans:
+        started = time.perf_counter()
+        data = span.export()
+        client.table("spans").insert({
+            "span_id": data["id"],
+            "trace_id": data["trace_id"],
+            "name": data["span_data"]["name"],
+            "start_time": data["started_at"],
+            "end_time": data["ended_at"],
+            "metadata": json.dumps(data["span_data"]),
+            "parent_span_id": data["parent_id"],
+        }).execute()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def _batched(processor, spans):
+    latencies = []
+    for span in spans:
+        started = time.perf_counter()
+        processor.on_span_end(span)
+        latencies.append(time.perf_counter() - started)
+    processor.force_flush()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spans", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.005, help="fake PostgREST latency per request")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    with FakeSupabase(latency=args.latency) as fake:
+        os.environ.update({"SUPABASE_URL": fake.url, "SUPABASE_KEY": FAKE_SUPABASE_KEY})
+        os.environ.setdefault("GEMINI_API_KEY", "stub")
+        from supabase import create_client
+        from tracing import SupabaseTraceProcessor
+
+        client = create_client(fake.url, FAKE_SUPABASE_KEY)
+        trace_id = f"trace_{uuid.uuid4().hex}"
+        report = {}
+
+        started = time.perf_counter()
+        inline = _inline(client, [FakeSpan(trace_id) for _ in range(args.spans)])
+        report["inline"] = summarize(inline, time.perf_counter() - started)
+
+        processor = SupabaseTraceProcessor(client, max_batch_size=args.batch_size, schedule_delay=0.5)
+        requests_before = fake.request_count
+        started = time.perf_counter()
+        batched = _batched(processor, [FakeSpan(trace_id) for _ in range(args.spans)])
+        report["batched"] = summarize(batched, time.perf_counter() - started)
+        report["batched"]["insert_requests"] = fake.request_count - requests_before
+        report["batched"].update(processor.stats())
+        processor.shutdown()
+
+    report["stored_spans"] = len(fake.tables.get("spans", []))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
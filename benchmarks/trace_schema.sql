@@ -0,0 +1,86 @@
+-- Query plans and timings for the tracing schema in supabase.sql, on a local Postgres.
+--
+--     createdb trace_bench
+--     psql -d trace_bench -f supabase.sql -f benchmarks/trace_schema.sql
+--
+-- Seeds :spans spans (default 1,000,000) over the last three days, 20 per
+-- trace, then shows that each dashboard query is answered from an index or a
+-- single day's partition, and compares a percentile query over raw spans with
+-- the same question answered from the hourly rollups.
+-- Override the volume with: psql -v spans=200000 ...
+
+\set ON_ERROR_STOP on
+\if :{?spans}
+\else
+  \set spans 1000000
+\endif
+\timing on
+
+SELECT create_trace_partitions(current_date - 3, 5);
+
+TRUNCATE traces, spans, span_latency_rollups;
+
+INSERT INTO spans (span_id, trace_id, parent_span_id, span_type, name, start_time, end_time, error)
+SELECT
+  'span_' || n,
+  'trace_' || n / 20,
+  CASE WHEN n % 20 = 0 THEN NULL ELSE 'span_' || (n / 20) * 20 END,
+  kind.span_type,
+  kind.name,
+  started,
+  started + (kind.base_ms * (0.5 + random()) * interval '1 millisecond'),
+  CASE WHEN random() < 0.01 THEN '{"message": "failed"}'::jsonb END
+FROM generate_series(1, :spans) AS n
+CROSS JOIN LATERAL (SELECT now() - (n::double precision / :spans) * interval '3 days' AS started) t
+CROSS JOIN LATERAL (
+  SELECT * FROM (VALUES
+    (0, 'agent', 'Triage Agent', 2500),
+    (1, 'agent', 'Billing Agent', 1800),
+    (2, 'function', 'get_order', 40),
+    (3, 'function', 'retrieve_payment_intent', 300),
+    (4, 'generation', 'gemini-2.0-flash', 900),
+    (5, 'generation', 'gemini-2.0-flash-lite', 250)
+  ) AS k(i, span_type, name, base_ms)
+  WHERE k.i = n % 6
+) kind;
+
+INSERT INTO traces (trace_id, name, start_time, end_time)
+SELECT trace_id, 'Customer service', min(start_time), max(end_time)
+FROM spans
+GROUP BY trace_id;
+
+ANALYZE traces;
+ANALYZE spans;
+
+-- One trace's spans: an index scan per partition on idx_spans_trace_id.
+EXPLAIN (ANALYZE, COSTS OFF, SUMMARY ON)
+SELECT * FROM spans WHERE trace_id = 'trace_12345' ORDER BY start_time;
+
+-- A span's children.
+EXPLAIN (ANALYZE, COSTS OFF, SUMMARY ON)
+SELECT * FROM spans WHERE parent_span_id = 'span_246900';
+
+-- The last hour of spans: only today's partition is read.
+EXPLAIN (ANALYZE, COSTS OFF, SUMMARY ON)
+SELECT count(*) FROM spans WHERE start_time >= now() - interval '1 hour';
+
+-- Build the rollups for the whole seeded range, then the hourly refresh a
+-- scheduled job would run.
+SELECT rollup_span_latency(now() - interval '3 days');
+SELECT rollup_span_latency(now() - interval '2 hours');
+
+-- Slowest agents, tools and models over the last day, from raw spans...
+SELECT span_type, name, count(*) AS calls,
+  percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms) AS p95_ms
+FROM spans
+WHERE start_time >= now() - interval '24 hours'
+GROUP BY span_type, name
+ORDER BY p95_ms DESC;
+
+-- ...and from the rollups.
+SELECT span_type, name, calls, worst_hour_p95_ms
+FROM span_latency_last_day
+ORDER BY worst_hour_p95_ms DESC;
+
+EXPLAIN (ANALYZE, COSTS OFF, SUMMARY ON)
+SELECT * FROM span_latency_last_day ORDER BY worst_hour_p95_ms DESC;
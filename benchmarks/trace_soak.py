@@ -0,0 +1,63 @@
+"""Soak test: resident memory of SupabaseTraceProcessor over many spans.
+
+Pushes spans through on_span_start/on_span_end with a no-op Supabase client and
+samples RSS as it goes. A bounded store shows a flat line after warm-up.
+
+    python -m benchmarks.trace_soak --spans 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import uuid
+from benchmarks.fakes import FakeSpan, NullSupabase
+
+
+def rss_mb() -> float:
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spans", type=int, default=1_000_000)
+    parser.add_argument("--spans-per-trace", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("SUPABASE_KEY", "stub.stub.stub")
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    from tracing import SupabaseTraceProcessor
+
+    processor = SupabaseTraceProcessor(NullSupabase(), block_on_full=True, schedule_delay=0.1)
+    every = max(args.spans // args.samples, 1)
+    samples = [{"spans": 0, "rss_mb": round(rss_mb(), 1)}]
+    trace_id = None
+    for i in range(1, args.spans + 1):
+        if i % args.spans_per_trace == 1:
+            trace_id = f"trace_{uuid.uuid4().hex}"
+        span = FakeSpan(trace_id)
+        processor.on_span_start(span)
+        processor.on_span_end(span)
+        if i % every == 0:
+            samples.append({"spans": i, "rss_mb": round(rss_mb(), 1)})
+    processor.force_flush()
+
+    warm = samples[1]["rss_mb"] if len(samples) > 1 else samples[0]["rss_mb"]
+    report = {
+        "spans": args.spans,
+        "samples": samples,
+        "growth_after_warmup_mb": round(samples[-1]["rss_mb"] - warm, 1),
+        "processor": processor.stats(),
+    }
+    processor.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
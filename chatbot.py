@@ -1,62 +1,29 @@
-import os
-from dotenv import load_dotenv
+import time
 from typing import cast
 import chainlit as cl
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, handoff
+from chainlit.input_widget import Switch
+from agents import Agent, handoff, trace
 from agents.run import RunConfig, RunContextWrapper
+from setup import provider_registry
+from streaming import send_handoff_notice, stream_agent_response
+from context_window import context_window
+from response_cache import RESPONSE_CACHE_ENABLED, response_cache
+import metrics
 
 
-load_dotenv()
+def on_handoff(agent: Agent, ctx: RunContextWrapper[None]):
+    agent_name = agent.name
+    print("--------------------------------")
+    print(f"Handing off to {agent_name}...")
+    print("--------------------------------")
+    # The chat notice is drawn inline by the streaming renderer.
 
-gemini_api_key = os.getenv("GEMINI_API_KEY")
 
-
-if not gemini_api_key:
-    raise ValueError("GEMINI_API_KEY is not set. Please ensure it is defined in your .env file.")
-
-
-
-
-
-
-
-@cl.on_chat_start
-async def start():
-    external_client = AsyncOpenAI(
-        api_key=os.getenv("GEMINI_API_KEY"),
-        base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-    )
-
-    model = OpenAIChatCompletionsModel(
-        model="gemini-2.0-flash",
-        openai_client=external_client
-    )
-
-    config = RunConfig(
-        model=model,
-        model_provider=external_client,
-        tracing_disabled=True
-    )
-
-
-    def on_handoff(agent: Agent, ctx: RunContextWrapper[None]):
-        agent_name = agent.name
-        print("--------------------------------")
-        print(f"Handing off to {agent_name}...")
-        print("--------------------------------")
-        # Send a more visible message in the chat
-        cl.Message(
-            content=f"🔄 **Handing off to {agent_name}...**\n\nI'm transferring your request to our {agent_name.lower()} who will be able to better assist you.",
-            author="System"
-        ).send()
-
-    
+def build_agent_graph(model):
+    """Build the Triage/Billing/Refund agents. The graph holds no per-session state."""
     billing_agent = Agent(name="Billing Agent", instructions="You are a billing agent", model=model)
     refund_agent = Agent(name="Refund Agent", instructions="You are a refund agent", model=model)
 
-    # Correct on_handoff function definition
-    
-
     agent = Agent(
         name="Triage Agent",
         instructions="You are a triage agent",
@@ -67,17 +34,49 @@ async def start():
             handoff(refund_agent, on_handoff=lambda ctx: on_handoff(refund_agent, ctx))
         ]
     )
+    return agent, billing_agent, refund_agent
+
+
+# Built once per process and shared by every session.
+config = provider_registry.run_config()
+triage_agent, billing_agent, refund_agent = build_agent_graph(config.model)
+
+
+@cl.on_app_startup
+async def startup():
+    # Span hooks feed the histograms served on METRICS_PORT.
+    metrics.install()
+
+
+@cl.on_chat_start
+async def start():
+    started = time.perf_counter()
 
     # Set session variables
-    cl.user_session.set("agent", agent)
+    cl.user_session.set("agent", triage_agent)
     cl.user_session.set("config", config)
     cl.user_session.set("billing_agent", billing_agent)
     cl.user_session.set("refund_agent", refund_agent)
     cl.user_session.set("chat_history", [])
+    cl.user_session.set("response_cache", RESPONSE_CACHE_ENABLED)
+
+    provider_registry.record_session_start(time.perf_counter() - started)
+    print(f"Provider metrics: {provider_registry.metrics.snapshot()}")
+
+    if RESPONSE_CACHE_ENABLED:
+        # Lets a user opt this session out of cached answers.
+        await cl.ChatSettings([
+            Switch(id="response_cache", label="Reuse answers to common questions", initial=True)
+        ]).send()
 
     await cl.Message(content="Welcome to the Emmanuel Assistant! How can I help you today?").send()
 
 
+@cl.on_settings_update
+async def update_settings(settings: dict):
+    cl.user_session.set("response_cache", RESPONSE_CACHE_ENABLED and settings.get("response_cache", True))
+
+
 @cl.on_message
 async def main(message: cl.Message):
     """Process incoming messages and generate responses."""
@@ -94,23 +93,44 @@ async def main(message: cl.Message):
    
     history.append({"role": "user", "content": message.content})
 
-    try:
-        result = Runner.run_sync(agent, history, run_config=config)
-
-        response_content = result.final_output
-
-    
-        msg.content = response_content
-        await msg.update()
+    # One trace per turn: handoffs, model calls and the summarizer share its breakdown.
+    with trace("Chat turn", group_id=cl.user_session.get("id")) as turn:
+        try:
+            # Opening questions repeat a lot; answer them from the cache when we can.
+            use_cache = len(history) == 1 and cl.user_session.get("response_cache")
+            started = time.perf_counter()
+            cached = response_cache.lookup(agent.name, message.content) if use_cache else None
+            if cached is not None:
+                if cached.handoff_target:
+                    await send_handoff_notice(cached.handoff_target)
+                await msg.stream_token(cached.text, is_sequence=True)
+                await msg.update()
+                response_content = cached.text
+                response_cache.record_hit(cached, time.perf_counter() - started)
+            else:
+                # Older turns are summarized once the history outgrows the token budget.
+                input_items = await context_window.compact(cl.user_session.get("id"), history)
+                result, _ = await stream_agent_response(agent, input_items, config, msg)
+
+                response_content = result.final_output
+                if use_cache:
+                    handoff_target = result.last_agent.name if result.last_agent is not agent else None
+                    response_cache.store(
+                        agent.name, message.content, str(response_content), handoff_target,
+                        time.perf_counter() - started,
+                    )
 
       
-        history.append({"role": "developer", "content": response_content})
+            history.append({"role": "developer", "content": response_content})
 
        
-        cl.user_session.set("chat_history", history)
-        print(f"History: {history}")
-
-    except Exception as e:
-        msg.content = f"Error: {str(e)}"
-        await msg.update()
-        print(f"Error: {str(e)}")
\ No newline at end of file
+            cl.user_session.set("chat_history", history)
+            print(f"History: {history}")
+            print(f"Context window: {context_window.stats.snapshot()}")
+            print(f"Response cache: {response_cache.stats()}")
+
+        except Exception as e:
+            msg.content = f"Error: {str(e)}"
+            await msg.update()
+            print(f"Error: {str(e)}")
+    print(f"Turn breakdown: {metrics.metrics_processor.turn(turn.trace_id)}")
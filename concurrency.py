@@ -0,0 +1,21 @@
+import asyncio
+import os
+from agents import Runner
+
+# Upper bound on agent runs in flight in this process. Extra sessions wait for a
+# free slot instead of piling more requests onto the model endpoint.
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", "32"))
+
+run_limiter = asyncio.Semaphore(MAX_CONCURRENT_RUNS)
+
+
+def set_run_limit(limit: int):
+    """Replace the process-wide run limiter (used by the load test harness)."""
+    global run_limiter
+    run_limiter = asyncio.Semaphore(limit)
+
+
+async def run_agent(starting_agent, input, run_config=None, **kwargs):
+    """Run an agent on the event loop once a slot in the run limiter is free."""
+    async with run_limiter:
+        return await Runner.run(starting_agent, input, run_config=run_config, **kwargs)
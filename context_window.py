@@ -0,0 +1,177 @@
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import List, Dict, Any
+from agents import Agent
+from concurrency import run_agent
+from setup import provider_registry
+
+# Estimated tokens of history sent per turn before older turns are summarized.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+# Most recent user turns always sent verbatim.
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "6"))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-2.0-flash-lite")
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+def estimate_tokens(items: List[Dict[str, Any]]) -> int:
+    """Rough token count (about four characters per token), cheap enough to run every turn."""
+    return sum(len(json.dumps(item, default=str)) for item in items) // 4
+
+
+def _item_text(item: Dict[str, Any]) -> str:
+    content = item.get("content")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    if content is None:
+        # Tool calls, tool outputs and other non-message items.
+        content = json.dumps({k: v for k, v in item.items() if k != "type"}, default=str)
+    return f"{item.get('role', item.get('type', 'item'))}: {content}"
+
+
+def _turn_starts(history: List[Dict[str, Any]]) -> List[int]:
+    return [i for i, item in enumerate(history) if item.get("role") == "user"]
+
+
+@dataclass
+class Summary:
+    text: str
+    covered: int
+    """Number of leading history items folded into `text`."""
+
+
+class ContextStats:
+    """Token counts before and after compaction."""
+
+    def __init__(self, samples: int = 1000):
+        self.turns = 0
+        self.summaries = 0
+        self.summary_failures = 0
+        self.summary_seconds = 0.0
+        self.tokens_in = 0
+        self.tokens_sent = 0
+        self.saved_per_turn = deque(maxlen=samples)
+
+    def record(self, tokens_in: int, tokens_sent: int):
+        self.turns += 1
+        self.tokens_in += tokens_in
+        self.tokens_sent += tokens_sent
+        self.saved_per_turn.append(tokens_in - tokens_sent)
+
+    def snapshot(self) -> dict:
+        saved = self.tokens_in - self.tokens_sent
+        return {
+            "turns": self.turns,
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures,
+            "summary_ms_total": self.summary_seconds * 1000,
+            "tokens_in": self.tokens_in,
+            "tokens_sent": self.tokens_sent,
+            "tokens_saved": saved,
+            "tokens_saved_last_turn": self.saved_per_turn[-1] if self.saved_per_turn else 0,
+            "tokens_saved_per_turn": saved / self.turns if self.turns else 0.0,
+        }
+
+
+class ContextWindow:
+    """Fits a session's history into a token budget before it is sent to the model.
+
+    The stored history is never modified. When it no longer fits, everything
+    before the last `keep_turns` user turns is replaced by a summary written by
+    a cheap model. Summaries are cached per session and extended incrementally:
+    only items not yet covered are sent to the summarizer, and only once the
+    summary plus the verbatim tail has outgrown the budget again.
+    """
+
+    def __init__(self, summarizer: Agent, run_config=None, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 keep_turns: int = CONTEXT_KEEP_TURNS, cache_size: int = 1024):
+        self.summarizer = summarizer
+        self.run_config = run_config
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.cache_size = cache_size
+        self._summaries: OrderedDict[str, Summary] = OrderedDict()
+        self.stats = ContextStats()
+
+    def _cached(self, session_id: str, history: List[Dict[str, Any]]) -> Summary | None:
+        summary = self._summaries.get(session_id)
+        if summary is None or summary.covered > len(history):
+            return None
+        self._summaries.move_to_end(session_id)
+        return summary
+
+    def _store(self, session_id: str, summary: Summary):
+        self._summaries[session_id] = summary
+        self._summaries.move_to_end(session_id)
+        while len(self._summaries) > self.cache_size:
+            self._summaries.popitem(last=False)
+
+    @staticmethod
+    def _with_summary(summary: Summary | None, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if summary is None:
+            return list(history)
+        return [{"role": "system", "content": SUMMARY_PREFIX + summary.text}] + history[summary.covered:]
+
+    async def _summarize(self, previous: Summary | None, history: List[Dict[str, Any]], cut: int) -> Summary:
+        start = previous.covered if previous else 0
+        lines = [_item_text(item) for item in history[start:cut]]
+        prompt = "Conversation:\n" + "\n".join(lines)
+        if previous:
+            prompt = f"Existing summary:\n{previous.text}\n\nNew messages to fold in:\n" + "\n".join(lines)
+        started = time.perf_counter()
+        result = await run_agent(self.summarizer, prompt, run_config=self.run_config)
+        self.stats.summary_seconds += time.perf_counter() - started
+        self.stats.summaries += 1
+        return Summary(text=str(result.final_output).strip(), covered=cut)
+
+    async def compact(self, session_id: str, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the input to send for this turn."""
+        tokens_in = estimate_tokens(history)
+        summary = self._cached(session_id, history)
+        items = self._with_summary(summary, history)
+
+        if estimate_tokens(items) > self.token_budget:
+            starts = _turn_starts(history)
+            cut = starts[-self.keep_turns] if len(starts) >= self.keep_turns else 0
+            if cut > (summary.covered if summary else 0):
+                try:
+                    summary = await self._summarize(summary, history, cut)
+                    self._store(session_id, summary)
+                    items = self._with_summary(summary, history)
+                except Exception as e:
+                    # Sending more than the budget beats failing the turn.
+                    self.stats.summary_failures += 1
+                    print(f"Error summarizing history: {str(e)}")
+
+        self.stats.record(tokens_in, estimate_tokens(items))
+        return items
+
+    def summary(self, session_id: str) -> Summary | None:
+        return self._summaries.get(session_id)
+
+    def restore(self, session_id: str, summary: Summary):
+        """Reuse a summary saved by an earlier process, unless this one has its own."""
+        if session_id not in self._summaries:
+            self._store(session_id, summary)
+
+    def forget(self, session_id: str):
+        self._summaries.pop(session_id, None)
+
+
+summarizer_agent = Agent(
+    name="History summarizer",
+    instructions=(
+        "Summarize the conversation for an assistant that will continue it. Keep names, "
+        "order and account identifiers, amounts, decisions, open questions and anything the "
+        "user asked to remember. Write short plain sentences. Reply with the summary only."
+    ),
+    model=provider_registry.lazy_model(SUMMARY_MODEL),
+)
+
+context_window = ContextWindow(
+    summarizer_agent,
+    run_config=provider_registry.run_config(SUMMARY_MODEL),
+)
@@ -1,20 +1,36 @@
 import os
+import functools
 import logging
 import json
 from dotenv import load_dotenv
-from agents import Agent, Runner, function_tool  # Only import what you need
-import stripe
+from agents import Agent, Runner, function_tool, handoff  # Only import what you need
 from typing_extensions import TypedDict, Any
 import asyncio
+import time
+from collections import Counter
+from dispute_repository import repository
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Set Stripe API key from environment variables
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+
+@functools.cache
+def stripe_api():
+    """The stripe module, imported and configured on first use.
+
+    Importing this module therefore neither pays for the stripe import nor
+    installs a Stripe HTTP client.
+    """
+    import stripe
+
+    # Set Stripe API key from environment variables
+    stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+
+    # One pooled httpx client for every Stripe call, sync or async. The tools below
+    # use the *_async methods so a slow Stripe request never blocks the event loop.
+    stripe.default_http_client = stripe.HTTPXClient(allow_sync_methods=True)
+    return stripe
 
 @function_tool
 def get_phone_logs(phone_number: str) -> list:
@@ -23,32 +39,7 @@ def get_phone_logs(phone_number: str) -> list:
     Each record might include call timestamps, durations, notes, 
     and an associated order_id if applicable.
     """
-    phone_logs = [
-        {
-            "phone_number": "+15551234567",
-            "timestamp": "2023-03-14 15:24:00",
-            "duration_minutes": 5,
-            "notes": "Asked about status of order #1121",
-            "order_id": 1121
-        },
-        {
-            "phone_number": "+15551234567",
-            "timestamp": "2023-02-28 10:10:00",
-            "duration_minutes": 7,
-            "notes": "Requested refund for order #1121, I told him we were unable to refund the order because it was final sale",
-            "order_id": 1121
-        },
-        {
-            "phone_number": "+15559876543",
-            "timestamp": "2023-01-05 09:00:00",
-            "duration_minutes": 2,
-            "notes": "General inquiry; no specific order mentioned",
-            "order_id": None
-        },
-    ]
-    return [
-        log for log in phone_logs if log["phone_number"] == phone_number
-    ]
+    return repository.get_phone_logs(phone_number)
 
 
 @function_tool
@@ -57,45 +48,7 @@ def get_order(order_id: int) -> str:
     Retrieve an order by ID from a predefined list of orders.
     Returns the corresponding order object or 'No order found'.
     """
-    orders = [
-        {
-            "order_id": 1234,
-            "fulfillment_details": "not_shipped"
-        },
-        {
-            "order_id": 9101,
-            "fulfillment_details": "shipped",
-            "tracking_info": {
-                "carrier": "FedEx",
-                "tracking_number": "123456789012"
-            },
-            "delivery_status": "out for delivery"
-        },
-        {
-            "order_id": 1121,
-            "fulfillment_details": "delivered",
-            "customer_id": "cus_PZ1234567890",
-            "customer_phone": "+15551234567",
-            "order_date": "2023-01-01",
-            "customer_email": "customer1@example.com",
-            "tracking_info": {
-                "carrier": "UPS",
-                "tracking_number": "1Z999AA10123456784",
-                "delivery_status": "delivered"
-            },
-            "shipping_address": {
-                "zip": "10001"
-            },
-            "tos_acceptance": {
-                "date": "2023-01-01",
-                "ip": "192.168.1.1"
-            }
-        }
-    ]
-    for order in orders:
-        if order["order_id"] == order_id:
-            return order
-    return "No order found"
+    return repository.get_order(order_id) or "No order found"
 
 
 @function_tool
@@ -103,24 +56,7 @@ def get_emails(email: str) -> list:
     """
     Return a list of email records for the given email address.
     """
-    emails = [
-        {
-            "email": "customer1@example.com",
-            "subject": "Order #1121",
-            "body": "Hey, I know you don't accept refunds but the sneakers don't fit and I'd like a refund"
-        },
-        {
-            "email": "customer2@example.com",
-            "subject": "Inquiry about product availability",
-            "body": "Hello, I wanted to check if the new model of the smartphone is available in stock."
-        },
-        {
-            "email": "customer3@example.com",
-            "subject": "Feedback on recent purchase",
-            "body": "Hi, I recently purchased a laptop from your store and I am very satisfied with the product. Keep up the good work!"
-        }
-    ]
-    return [email_data for email_data in emails if email_data["email"] == email]
+    return repository.get_emails(email)
 
 
 @function_tool
@@ -129,8 +65,9 @@ async def retrieve_payment_intent(payment_intent_id: str) -> dict:
     Retrieve a Stripe payment intent by ID.
     Returns the payment intent object on success or an empty dictionary on failure.
     """
+    stripe = stripe_api()
     try:
-        return stripe.PaymentIntent.retrieve(payment_intent_id)
+        return await stripe.PaymentIntent.retrieve_async(payment_intent_id)
     except stripe.error.StripeError as e:
         logger.error(f"Stripe error occurred while retrieving payment intent: {e}")
         return {}
@@ -141,8 +78,9 @@ async def close_dispute(dispute_id: str) -> dict:
     Close a Stripe dispute by ID. 
     Returns the dispute object on success or an empty dictionary on failure.
     """
+    stripe = stripe_api()
     try:
-        return stripe.Dispute.close(dispute_id)
+        return await stripe.Dispute.close_async(dispute_id)
     except stripe.error.StripeError as e:
         logger.error(f"Stripe error occurred while closing dispute: {e}")
         return {}
@@ -204,16 +142,12 @@ triage_agent = Agent(
     tools=[retrieve_payment_intent, get_order],
     handoffs=[accept_dispute_agent, investigator_agent],
 )
-async def process_dispute(payment_intent_id, triage_agent):
-    """Retrieve and process dispute data for a given PaymentIntent."""
-    disputes_list = stripe.Dispute.list(payment_intent=payment_intent_id)
-    if not disputes_list.data:
-        logger.warning("No dispute data found for PaymentIntent: %s", payment_intent_id)
-        return None
-    
-    dispute_data = disputes_list.data[0]
-    
-    relevant_data = {
+def dispute_details(dispute_data) -> dict:
+    """The fields of a Stripe dispute that the triage agent works from."""
+    if isinstance(dispute_data, stripe_api().StripeObject):
+        # StripeObject is no longer a dict subclass, so it has no .get().
+        dispute_data = dispute_data.to_dict()
+    return {
         "dispute_id": dispute_data.get("id"),
         "amount": dispute_data.get("amount"),
         "due_by": dispute_data.get("evidence_details", {}).get("due_by"),
@@ -222,19 +156,252 @@ async def process_dispute(payment_intent_id, triage_agent):
         "status": dispute_data.get("status"),
         "card_brand": dispute_data.get("payment_method_details", {}).get("card", {}).get("brand")
     }
-    
-    event_str = json.dumps(relevant_data)
-    # Pass the dispute data to the triage agent
-    result = await Runner.run(triage_agent, input=event_str)
+
+
+# Route disputes by rule before the triage agent; "0" sends every dispute to the LLM.
+DISPUTE_PREROUTING = os.getenv("DISPUTE_PREROUTING", "1") != "0"
+
+# Fulfillment status -> agent that handles the dispute. Anything else goes to the LLM triage.
+NOT_SHIPPED_STATUSES = ("not_shipped",)
+SHIPPED_STATUSES = ("shipped", "delivered")
+
+
+class RoutingStats:
+    """How disputes were routed, and how many triage agent runs that saved."""
+
+    def __init__(self):
+        self.accepted = 0
+        self.investigated = 0
+        self.llm_triage = 0
+        self.fallback_reasons = Counter()
+
+    def snapshot(self) -> dict:
+        routed = self.accepted + self.investigated
+        total = routed + self.llm_triage
+        return {
+            "routed_to_accept": self.accepted,
+            "routed_to_investigator": self.investigated,
+            "llm_triage": self.llm_triage,
+            # Each one is a whole triage run: a model turn per tool call plus the handoff turn.
+            "llm_triage_avoided": routed,
+            "routed_ratio": routed / total if total else 0.0,
+            "fallback_reasons": dict(self.fallback_reasons),
+        }
+
+    def since(self, start: "RoutingStats") -> "RoutingStats":
+        """The routing recorded after `start`, a copy of these stats taken earlier."""
+        delta = RoutingStats()
+        delta.accepted = self.accepted - start.accepted
+        delta.investigated = self.investigated - start.investigated
+        delta.llm_triage = self.llm_triage - start.llm_triage
+        delta.fallback_reasons = self.fallback_reasons - start.fallback_reasons
+        return delta
+
+
+routing_stats = RoutingStats()
+
+
+async def preroute_dispute(relevant_data: dict):
+    """Apply the triage rule without a model call.
+
+    Reads the order ID from the payment intent's metadata and looks up its
+    fulfillment status. Returns `(agent, {"order", "payment_intent"})` for a
+    clear-cut case, or `(None, reason)` when the LLM triage should decide.
+    """
+    payment_intent_id = relevant_data.get("payment_intent")
+    if not payment_intent_id:
+        return None, "no_payment_intent"
+    stripe = stripe_api()
+    try:
+        payment_intent = (await stripe.PaymentIntent.retrieve_async(payment_intent_id)).to_dict()
+    except stripe.error.StripeError as e:
+        logger.error(f"Stripe error occurred while retrieving payment intent: {e}")
+        return None, "payment_intent_error"
+    order_id = (payment_intent.get("metadata") or {}).get("order_id")
+    try:
+        order = repository.get_order(int(order_id))
+    except (TypeError, ValueError):
+        return None, "no_order_id"
+    if order is None:
+        return None, "order_not_found"
+    found = {"order": order, "payment_intent": payment_intent}
+    status = order.get("fulfillment_details")
+    if status in NOT_SHIPPED_STATUSES:
+        return accept_dispute_agent, found
+    if status in SHIPPED_STATUSES:
+        return investigator_agent, found
+    return None, "unknown_fulfillment_status"
+
+
+# Gather the investigator's evidence up front instead of through its tools; "0" disables.
+DISPUTE_EVIDENCE_PREFETCH = os.getenv("DISPUTE_EVIDENCE_PREFETCH", "1") != "0"
+
+# The investigator for prefetched disputes: everything its tools return is already in the input.
+prefetched_investigator_agent = investigator_agent.clone(
+    instructions=investigator_agent.instructions
+    + "\nThe order, payment intent, email threads and phone logs are provided in the input under \"evidence\".\n",
+    tools=[],
+)
+
+
+def _handoff_evidence_instructions(ctx, agent) -> str:
+    return (
+        investigator_agent.instructions
+        + "\nThe order, payment intent, email threads and phone logs are already gathered:\n"
+        + json.dumps(ctx.context["evidence"])
+    )
+
+
+# The investigator the triage agent hands off to when prefetching. It keeps the
+# investigator's name, so the triage agent sees the same handoff tool.
+handoff_investigator_agent = investigator_agent.clone(instructions=_handoff_evidence_instructions, tools=[])
+
+
+async def _on_investigator_handoff(ctx):
+    # Remembered so the investigation's round trips exclude the triage turns.
+    ctx.context["requests_before_handoff"] = ctx.usage.requests
+    if ctx.context["prefetch"]:
+        ctx.context["evidence"] = await gather_evidence(ctx.context["dispute"])
+
+
+def with_investigator_handoff(agent: Agent, prefetch: bool) -> Agent:
+    """A copy of `agent` whose handoff to the investigator is tracked, and with
+    `prefetch` loads the evidence and hands off to an investigator without tools.
+
+    The run context must be a dict with the dispute details under "dispute" and
+    the `prefetch` flag under "prefetch".
+    """
+    target = handoff_investigator_agent if prefetch else investigator_agent
+    handoffs = [
+        handoff(target, on_handoff=_on_investigator_handoff) if h is investigator_agent else h
+        for h in agent.handoffs
+    ]
+    return agent.clone(handoffs=handoffs)
+
+
+class EvidenceStats:
+    """Model round-trips per investigation, with and without prefetched evidence."""
+
+    def __init__(self):
+        self.prefetched = 0
+        self.prefetched_round_trips = 0
+        self.prefetch_seconds = 0.0
+        self.tool_driven = 0
+        self.tool_driven_round_trips = 0
+
+    def record(self, round_trips: int, prefetched: bool):
+        if prefetched:
+            self.prefetched += 1
+            self.prefetched_round_trips += round_trips
+        else:
+            self.tool_driven += 1
+            self.tool_driven_round_trips += round_trips
+
+    def snapshot(self) -> dict:
+        return {
+            "prefetched_investigations": self.prefetched,
+            "round_trips_per_prefetched": self.prefetched_round_trips / self.prefetched if self.prefetched else 0.0,
+            "prefetch_ms_mean": self.prefetch_seconds * 1000 / self.prefetched if self.prefetched else 0.0,
+            "tool_driven_investigations": self.tool_driven,
+            "round_trips_per_tool_driven": self.tool_driven_round_trips / self.tool_driven if self.tool_driven else 0.0,
+        }
+
+    def since(self, start: "EvidenceStats") -> "EvidenceStats":
+        """The investigations recorded after `start`, a copy of these stats taken earlier."""
+        delta = EvidenceStats()
+        for name, value in vars(self).items():
+            setattr(delta, name, value - getattr(start, name))
+        return delta
+
+
+evidence_stats = EvidenceStats()
+
+
+async def gather_evidence(relevant_data: dict, order: dict | None = None, payment_intent: dict | None = None) -> dict:
+    """Collect the investigator's evidence concurrently as one bundle.
+
+    The order and payment intent can be passed in when routing already fetched
+    them. The order is only reachable through the payment intent's metadata, and
+    the email and phone lookups need the order's contact details, so those two
+    run together once the order is known.
+    """
+    started = time.perf_counter()
+    if payment_intent is None and relevant_data.get("payment_intent"):
+        payment_intent = (await stripe_api().PaymentIntent.retrieve_async(relevant_data["payment_intent"])).to_dict()
+    if order is None and payment_intent:
+        order_id = (payment_intent.get("metadata") or {}).get("order_id")
+        if order_id is not None:
+            order = await asyncio.to_thread(repository.get_order, int(order_id))
+    order = order or {}
+
+    async def lookup(fetch, key):
+        return await asyncio.to_thread(fetch, key) if key else []
+
+    emails, phone_logs = await asyncio.gather(
+        lookup(repository.get_emails, order.get("customer_email")),
+        lookup(repository.get_phone_logs, order.get("customer_phone")),
+    )
+    evidence_stats.prefetch_seconds += time.perf_counter() - started
+    return {"order": order, "payment_intent": payment_intent, "emails": emails, "phone_logs": phone_logs}
+
+
+async def triage_dispute(dispute_data, triage_agent, run_config=None, preroute: bool = DISPUTE_PREROUTING,
+                         prefetch: bool = DISPUTE_EVIDENCE_PREFETCH):
+    """Run the agent workflow on one dispute object.
+
+    With `prefetch`, the investigator gets its evidence as one bundle whether
+    pre-routing sends the dispute there or the triage agent hands it off.
+    """
+    relevant_data = dispute_details(dispute_data)
+    agent, event_str = triage_agent, json.dumps(relevant_data)
+    if preroute:
+        routed_agent, found = await preroute_dispute(relevant_data)
+        if routed_agent is accept_dispute_agent:
+            # Hand the specialist what triage would have gathered for it.
+            agent, event_str = routed_agent, json.dumps({**relevant_data, "order": found["order"]})
+            routing_stats.accepted += 1
+        elif routed_agent is investigator_agent:
+            if prefetch:
+                evidence = await gather_evidence(relevant_data, **found)
+                agent, event_str = prefetched_investigator_agent, json.dumps({**relevant_data, "evidence": evidence})
+            else:
+                agent, event_str = routed_agent, json.dumps({**relevant_data, "order": found["order"]})
+            routing_stats.investigated += 1
+        else:
+            routing_stats.fallback_reasons[found] += 1
+        if agent is not triage_agent:
+            logger.info("Routed dispute %s to %s", relevant_data["dispute_id"], agent.name)
+    context = None
+    if agent is triage_agent:
+        routing_stats.llm_triage += 1
+        agent = with_investigator_handoff(agent, prefetch)
+        context = {"dispute": relevant_data, "prefetch": prefetch}
+    # Pass the dispute data to the selected agent
+    result = await Runner.run(agent, input=event_str, context=context, run_config=run_config)
     logger.info("WORKFLOW RESULT: %s", result.final_output)
-    
+    if agent in (investigator_agent, prefetched_investigator_agent):
+        evidence_stats.record(len(result.raw_responses), prefetched=agent is prefetched_investigator_agent)
+    elif context is not None and "requests_before_handoff" in context:
+        evidence_stats.record(len(result.raw_responses) - context["requests_before_handoff"], prefetched=prefetch)
+
     return relevant_data, result.final_output
 
 
-if __name__ == "__main__":
- 
+async def process_dispute(payment_intent_id, triage_agent):
+    """Retrieve and process dispute data for a given PaymentIntent."""
+    disputes_list = await stripe_api().Dispute.list_async(payment_intent=payment_intent_id)
+    if not disputes_list.data:
+        logger.warning("No dispute data found for PaymentIntent: %s", payment_intent_id)
+        return None
     
-    payment = stripe.PaymentIntent.create(
+    return await triage_dispute(disputes_list.data[0], triage_agent)
+
+
+if __name__ == "__main__":
+    # Configure logging
+    logging.basicConfig(level=logging.INFO)
+
+    payment = stripe_api().PaymentIntent.create(
         amount=2000,
         currency="usd",
         payment_method="pm_card_createDisputeProductNotReceived",
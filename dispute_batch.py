@@ -0,0 +1,193 @@
+"""Triage every open Stripe dispute, a configurable number at a time.
+
+    python dispute_batch.py --output disputes.jsonl --concurrency 8 --rate 2
+
+Each finished dispute is appended to the JSONL output as soon as it completes.
+The output doubles as the checkpoint: re-running with the same file skips
+disputes that already have a successful line, so a crashed run resumes where
+it stopped. Disputes that failed are retried on the next run.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import time
+from dispute import EvidenceStats, RoutingStats, evidence_stats, routing_stats, stripe_api, triage_agent, triage_dispute
+
+logger = logging.getLogger(__name__)
+
+# Dispute statuses that still need a decision from us.
+OPEN_STATUSES = ("needs_response", "warning_needs_response")
+PAGE_SIZE = 100
+
+
+class RateLimiter:
+    """Token bucket: on average `rate` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def load_checkpoint(path: str) -> set[str]:
+    """Dispute IDs with a successful result in an existing output file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; that dispute runs again.
+                continue
+            if record.get("ok"):
+                done.add(record["dispute_id"])
+    return done
+
+
+async def list_disputes(statuses=OPEN_STATUSES, page_size: int = PAGE_SIZE):
+    """Yield disputes page by page, fetching the next page only when needed."""
+    starting_after = None
+    while True:
+        params = {"limit": page_size}
+        if starting_after:
+            params["starting_after"] = starting_after
+        page = await stripe_api().Dispute.list_async(**params)
+        for dispute in page.data:
+            if not statuses or dispute["status"] in statuses:
+                yield dispute
+        if not page.has_more or not page.data:
+            return
+        starting_after = page.data[-1].id
+
+
+class DisputeBatch:
+    """Fans disputes out to `triage_dispute` and streams results to JSONL."""
+
+    def __init__(self, output: str, concurrency: int = 8, rate: float = 0.0, burst: int = 1,
+                 statuses=OPEN_STATUSES, agent=triage_agent, run_config=None, max_disputes: int | None = None):
+        self.output = output
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate, burst)
+        self.statuses = statuses
+        self.agent = agent
+        self.run_config = run_config
+        self.max_disputes = max_disputes
+        self.listed = 0
+        self.skipped = 0
+        self.succeeded = 0
+        self.failed = 0
+        # The routing and evidence counters are process-wide; these copies, taken
+        # when the batch starts, let `stats` report this batch only.
+        self._routing_start = RoutingStats()
+        self._evidence_start = EvidenceStats()
+
+    async def _produce(self, queue: asyncio.Queue, done: set[str]):
+        queued = 0
+        async for dispute in list_disputes(self.statuses):
+            self.listed += 1
+            if dispute.id in done:
+                self.skipped += 1
+                continue
+            if self.max_disputes is not None and queued >= self.max_disputes:
+                break
+            await queue.put(dispute)
+            queued += 1
+
+    async def _work(self, queue: asyncio.Queue, out):
+        while True:
+            dispute = await queue.get()
+            try:
+                await self.limiter.acquire()
+                started = time.perf_counter()
+                record = {"dispute_id": dispute.id}
+                try:
+                    details, final_output = await triage_dispute(dispute, self.agent, self.run_config)
+                    record.update(ok=True, details=details, result=str(final_output))
+                    self.succeeded += 1
+                except Exception as e:
+                    logger.error("Dispute %s failed: %s", dispute.id, e)
+                    record.update(ok=False, error=str(e))
+                    self.failed += 1
+                record["seconds"] = round(time.perf_counter() - started, 3)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+            finally:
+                queue.task_done()
+
+    async def run(self) -> dict:
+        done = load_checkpoint(self.output)
+        self._routing_start = copy.deepcopy(routing_stats)
+        self._evidence_start = copy.deepcopy(evidence_stats)
+        started = time.perf_counter()
+        # A small buffer keeps listing ahead of the workers without holding every page.
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        with open(self.output, "a") as out:
+            workers = [asyncio.create_task(self._work(queue, out)) for _ in range(self.concurrency)]
+            try:
+                await self._produce(queue, done)
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+        return self.stats(time.perf_counter() - started)
+
+    def stats(self, elapsed: float = 0.0) -> dict:
+        processed = self.succeeded + self.failed
+        return {
+            "listed": self.listed,
+            "skipped": self.skipped,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "elapsed_s": elapsed,
+            "disputes_per_s": processed / elapsed if elapsed else 0.0,
+            "routing": routing_stats.since(self._routing_start).snapshot(),
+            "evidence": evidence_stats.since(self._evidence_start).snapshot(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="disputes.jsonl", help="JSONL results file, also used to resume")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("DISPUTE_CONCURRENCY", "8")))
+    parser.add_argument("--rate", type=float, default=float(os.getenv("DISPUTE_RATE", "0")),
+                        help="disputes started per second; 0 disables the limit")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--all-statuses", action="store_true", help="also process disputes that are not open")
+    parser.add_argument("--max-disputes", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    batch = DisputeBatch(
+        args.output,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        burst=args.burst,
+        statuses=None if args.all_statuses else OPEN_STATUSES,
+        max_disputes=args.max_disputes,
+    )
+    print(json.dumps(asyncio.run(batch.run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
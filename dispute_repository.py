@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Iterable
+
+# Backend behind the dispute lookup tools: "memory" or "sqlite".
+DISPUTE_REPOSITORY = os.getenv("DISPUTE_REPOSITORY", "memory")
+# SQLite file for the "sqlite" backend; ":memory:" keeps it in process.
+DISPUTE_DB = os.getenv("DISPUTE_DB", ":memory:")
+
+
+ORDERS = [
+    {
+        "order_id": 1234,
+        "fulfillment_details": "not_shipped"
+    },
+    {
+        "order_id": 9101,
+        "fulfillment_details": "shipped",
+        "tracking_info": {
+            "carrier": "FedEx",
+            "tracking_number": "123456789012"
+        },
+        "delivery_status": "out for delivery"
+    },
+    {
+        "order_id": 1121,
+        "fulfillment_details": "delivered",
+        "customer_id": "cus_PZ1234567890",
+        "customer_phone": "+15551234567",
+        "order_date": "2023-01-01",
+        "customer_email": "customer1@example.com",
+        "tracking_info": {
+            "carrier": "UPS",
+            "tracking_number": "1Z999AA10123456784",
+            "delivery_status": "delivered"
+        },
+        "shipping_address": {
+            "zip": "10001"
+        },
+        "tos_acceptance": {
+            "date": "2023-01-01",
+            "ip": "192.168.1.1"
+        }
+    }
+]
+
+EMAILS = [
+    {
+        "email": "customer1@example.com",
+        "subject": "Order #1121",
+        "body": "Hey, I know you don't accept refunds but the sneakers don't fit and I'd like a refund"
+    },
+    {
+        "email": "customer2@example.com",
+        "subject": "Inquiry about product availability",
+        "body": "Hello, I wanted to check if the new model of the smartphone is available in stock."
+    },
+    {
+        "email": "customer3@example.com",
+        "subject": "Feedback on recent purchase",
+        "body": "Hi, I recently purchased a laptop from your store and I am very satisfied with the product. Keep up the good work!"
+    }
+]
+
+PHONE_LOGS = [
+    {
+        "phone_number": "+15551234567",
+        "timestamp": "2023-03-14 15:24:00",
+        "duration_minutes": 5,
+        "notes": "Asked about status of order #1121",
+        "order_id": 1121
+    },
+    {
+        "phone_number": "+15551234567",
+        "timestamp": "2023-02-28 10:10:00",
+        "duration_minutes": 7,
+        "notes": "Requested refund for order #1121, I told him we were unable to refund the order because it was final sale",
+        "order_id": 1121
+    },
+    {
+        "phone_number": "+15559876543",
+        "timestamp": "2023-01-05 09:00:00",
+        "duration_minutes": 2,
+        "notes": "General inquiry; no specific order mentioned",
+        "order_id": None
+    },
+]
+
+
+class DisputeRepository(ABC):
+    """Order, email and phone-log lookups used by the dispute agents' tools."""
+
+    @abstractmethod
+    def get_order(self, order_id: int) -> dict | None: ...
+
+    @abstractmethod
+    def get_emails(self, email: str) -> list: ...
+
+    @abstractmethod
+    def get_phone_logs(self, phone_number: str) -> list: ...
+
+
+class InMemoryRepository(DisputeRepository):
+    """Dict indexes built once; every lookup is a single hash probe."""
+
+    def __init__(self, orders: Iterable[dict] = (), emails: Iterable[dict] = (), phone_logs: Iterable[dict] = ()):
+        self._orders = {order["order_id"]: order for order in orders}
+        self._emails = defaultdict(list)
+        for record in emails:
+            self._emails[record["email"]].append(record)
+        self._phone_logs = defaultdict(list)
+        for record in phone_logs:
+            self._phone_logs[record["phone_number"]].append(record)
+
+    def get_order(self, order_id: int) -> dict | None:
+        return self._orders.get(order_id)
+
+    def get_emails(self, email: str) -> list:
+        return list(self._emails.get(email, ()))
+
+    def get_phone_logs(self, phone_number: str) -> list:
+        return list(self._phone_logs.get(phone_number, ()))
+
+
+class SQLiteRepository(DisputeRepository):
+    """Records stored as JSON in SQLite, looked up through indexed key columns."""
+
+    def __init__(self, path: str = ":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS orders (order_id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS emails (email TEXT NOT NULL, data TEXT NOT NULL);
+                CREATE INDEX IF NOT EXISTS emails_email ON emails (email);
+                CREATE TABLE IF NOT EXISTS phone_logs (phone_number TEXT NOT NULL, data TEXT NOT NULL);
+                CREATE INDEX IF NOT EXISTS phone_logs_phone_number ON phone_logs (phone_number);
+            """)
+
+    def is_empty(self) -> bool:
+        return self._conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone() is None
+
+    def load(self, orders: Iterable[dict] = (), emails: Iterable[dict] = (), phone_logs: Iterable[dict] = ()):
+        """Bulk insert records in one transaction; existing orders are replaced."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO orders (order_id, data) VALUES (?, ?)",
+                ((o["order_id"], json.dumps(o)) for o in orders),
+            )
+            self._conn.executemany(
+                "INSERT INTO emails (email, data) VALUES (?, ?)",
+                ((e["email"], json.dumps(e)) for e in emails),
+            )
+            self._conn.executemany(
+                "INSERT INTO phone_logs (phone_number, data) VALUES (?, ?)",
+                ((p["phone_number"], json.dumps(p)) for p in phone_logs),
+            )
+
+    def _rows(self, sql: str, key) -> list:
+        with self._lock:
+            rows = self._conn.execute(sql, (key,)).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def get_order(self, order_id: int) -> dict | None:
+        rows = self._rows("SELECT data FROM orders WHERE order_id = ?", order_id)
+        return rows[0] if rows else None
+
+    def get_emails(self, email: str) -> list:
+        return self._rows("SELECT data FROM emails WHERE email = ?", email)
+
+    def get_phone_logs(self, phone_number: str) -> list:
+        return self._rows("SELECT data FROM phone_logs WHERE phone_number = ?", phone_number)
+
+
+def create_repository(kind: str = DISPUTE_REPOSITORY, path: str = DISPUTE_DB) -> DisputeRepository:
+    """Build the configured backend and load the seed data into it once."""
+    if kind == "sqlite":
+        repo = SQLiteRepository(path)
+        if repo.is_empty():
+            repo.load(ORDERS, EMAILS, PHONE_LOGS)
+        return repo
+    if kind == "memory":
+        return InMemoryRepository(ORDERS, EMAILS, PHONE_LOGS)
+    raise ValueError(f"Unknown DISPUTE_REPOSITORY {kind!r}; expected 'memory' or 'sqlite'")
+
+
+repository = create_repository()
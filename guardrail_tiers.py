@@ -0,0 +1,179 @@
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from agents import Agent, ModelBehaviorError, Runner
+
+TRIP = "trip"
+CLEAR = "clear"
+ESCALATE = "escalate"
+
+_TOKEN = re.compile(r"[a-z]+|\d+(?:\.\d+)?|[=+\-*/^×÷√∫²³]")
+
+
+@dataclass
+class Decision:
+    verdict: str
+    reason: str
+    score: float = 0.0
+
+
+class LocalClassifier:
+    """Cheap first-tier classifier that runs before the LLM guardrail.
+
+    Stage one is a pair of compiled regex alternations that settle the obvious
+    cases outright. Stage two is a linear scorer over a token weight table; scores
+    at or above `trip_at` trip, scores at or below `clear_at` clear, and anything
+    in between is escalated to the LLM. `clear_at` must be negative: text with no
+    weighted tokens is not evidence of anything, so it goes to the LLM.
+    """
+
+    def __init__(self, trip_patterns, clear_patterns, weights, trip_at, clear_at):
+        if clear_at >= 0:
+            raise ValueError("clear_at must be negative, so only negative evidence clears")
+        self.trip_pattern = self._compile(trip_patterns)
+        self.clear_pattern = self._compile(clear_patterns)
+        self.weights = weights
+        self.trip_at = trip_at
+        self.clear_at = clear_at
+
+    @staticmethod
+    def _compile(patterns):
+        if not patterns:
+            return None
+        return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+
+    def score(self, text: str) -> float:
+        weights = self.weights
+        return sum(weights.get(token, 0.0) for token in _TOKEN.findall(text.lower()))
+
+    def classify(self, text: str) -> Decision:
+        if self.trip_pattern and (match := self.trip_pattern.search(text)):
+            return Decision(TRIP, f"Matched local rule: {match.group(0)!r}")
+        if self.clear_pattern and self.clear_pattern.search(text):
+            return Decision(CLEAR, "Matched local allow rule")
+        score = self.score(text)
+        if score >= self.trip_at:
+            return Decision(TRIP, f"Local score {score:.1f} >= {self.trip_at}", score)
+        if score <= self.clear_at:
+            return Decision(CLEAR, f"Local score {score:.1f} <= {self.clear_at}", score)
+        return Decision(ESCALATE, f"Local score {score:.1f} is ambiguous", score)
+
+
+class TierStats:
+    """Hit counts and latency per guardrail tier ("local" or "llm")."""
+
+    def __init__(self):
+        self.hits = Counter()
+        self.seconds = Counter()
+        self.tokens = Counter()
+
+    def record(self, tier: str, seconds: float, tokens: int = 0):
+        self.hits[tier] += 1
+        self.seconds[tier] += seconds
+        self.tokens[tier] += tokens
+
+    def snapshot(self) -> dict:
+        total = sum(self.hits.values())
+        tiers = {
+            tier: {
+                "hits": hits,
+                "hit_rate": hits / total,
+                "mean_us": self.seconds[tier] / hits * 1e6,
+                "mean_tokens": self.tokens[tier] / hits,
+            }
+            for tier, hits in self.hits.items()
+        }
+        return {"checks": total, "llm_calls_avoided": self.hits["local"], "tiers": tiers}
+
+
+def run_tokens(result) -> int:
+    """Total tokens billed across a run's model calls."""
+    return sum(response.usage.total_tokens for response in result.raw_responses)
+
+
+async def run_classifier(agent: Agent, verdict_agent: Agent, input, **kwargs):
+    """Run a guardrail's LLM classifier.
+
+    A reasoning field cut off by the classifier tier's max_tokens leaves invalid
+    JSON; the check is then run again with `verdict_agent`, whose bare verdict
+    always fits, rather than failing the turn.
+    """
+    try:
+        return await Runner.run(agent, input, **kwargs)
+    except ModelBehaviorError as e:
+        if agent is verdict_agent:
+            raise
+        print(f"Guardrail reasoning was cut off ({e}); retrying for a bare verdict")
+        return await Runner.run(verdict_agent, input, **kwargs)
+
+
+def latest_user_text(input) -> str:
+    """Text of the most recent user message in a guardrail input."""
+    if isinstance(input, str):
+        return input
+    for item in reversed(input):
+        if isinstance(item, dict) and item.get("role") == "user":
+            content = item.get("content", "")
+            if isinstance(content, str):
+                return content
+            return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+# Flags requests to do someone's math homework (input guardrail).
+homework_classifier = LocalClassifier(
+    trip_patterns=[
+        r"\b(my|this|the)\s+(math|maths|algebra|calculus|geometry|trigonometry)\s+(homework|assignment|worksheet)\b",
+        r"\bsolve\s+(for\s+[a-z]\b|the\s+equation|this\s+equation)",
+        r"\b(derivative|integral|antiderivative)\s+of\b",
+        r"\d+\s*[a-z]?\s*[+\-*/^×÷]\s*\d+\s*[a-z]?\s*=",
+    ],
+    clear_patterns=[
+        r"^\s*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening))[\s!.,]*$",
+    ],
+    weights={
+        "homework": 2.5, "solve": 2.0, "equation": 2.0, "equations": 2.0, "calculate": 1.5,
+        "simplify": 1.5, "factor": 1.0, "integral": 3.0, "derivative": 3.0, "algebra": 2.0,
+        "calculus": 3.0, "geometry": 2.0, "quadratic": 3.0, "polynomial": 3.0, "fraction": 1.0,
+        "math": 1.5, "maths": 1.5, "=": 1.5, "+": 0.5, "*": 0.5, "^": 1.0,
+        "×": 1.0, "÷": 1.0, "√": 2.0, "∫": 3.0, "²": 1.0, "³": 1.0,
+        "times": 1.0, "plus": 1.0, "minus": 1.0, "divided": 1.0, "multiplied": 1.0, "square": 1.0,
+        "root": 1.0, "sqrt": 2.0, "percent": 1.0, "hypotenuse": 3.0, "triangle": 2.0, "worksheet": 2.0,
+        "order": -1.0, "refund": -2.0, "account": -1.5, "password": -2.0, "shipping": -1.5,
+        "delivery": -1.5, "invoice": -1.5, "billing": -1.5, "subscription": -1.5, "thanks": -1.0,
+    },
+    trip_at=4.0,
+    clear_at=-1.0,
+)
+
+# Flags agent replies that contain math (output guardrail).
+math_output_classifier = LocalClassifier(
+    trip_patterns=[
+        r"\d+\s*[+\-*/^×÷]\s*\d+\s*=\s*\d+",
+        r"\b(derivative|integral|antiderivative)\s+of\b",
+        # Case-sensitive, so "Plan A = 5 dollars" is left alone.
+        r"(?-i:\b[a-z]\s*=\s*-?\d+(\.\d+)?\b)",
+    ],
+    clear_patterns=[],
+    weights={
+        "equation": 2.0, "solve": 1.5, "integral": 3.0, "derivative": 3.0, "calculus": 3.0,
+        "algebra": 2.0, "quadratic": 3.0, "polynomial": 3.0, "=": 1.5, "+": 0.5, "*": 0.5,
+        "^": 1.0, "×": 1.0, "÷": 1.0, "√": 2.0, "∫": 3.0, "²": 1.0, "³": 1.0,
+        "times": 1.0, "plus": 1.0, "minus": 1.0, "divided": 1.0, "multiplied": 1.0, "square": 1.0,
+        "root": 1.0, "hypotenuse": 3.0, "triangle": 2.0,
+        "order": -1.0, "refund": -2.0, "account": -1.5, "password": -2.0, "shipping": -1.5,
+        "delivery": -1.5, "invoice": -1.5, "billing": -1.5, "subscription": -1.5,
+    },
+    trip_at=4.0,
+    clear_at=-1.0,
+)
+
+
+def timed_classify(classifier: LocalClassifier, stats: TierStats, text: str) -> Decision:
+    """Classify `text` locally, counting the check as a local hit when it is decided."""
+    started = time.perf_counter()
+    decision = classifier.classify(text)
+    if decision.verdict != ESCALATE:
+        stats.record("local", time.perf_counter() - started)
+    return decision
@@ -1,18 +1,22 @@
 import chainlit as cl
 import os
-from typing import cast, List, Dict, Any
-from datetime import datetime
+from typing import cast
 import uuid
-from supabase import create_client, Client
-import json
-from agents import Agent, Runner, RunConfig, InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered
-from input import math_guardrail
-from output import math_output_guardrail
+from agents import Agent, RunConfig, InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered, trace
+from input import math_guardrail, math_guardrail_stats
+from output import IncrementalMathOutputCheck, math_output_guardrail, math_output_guardrail_stats, math_output_stream_stats
 from setup import google_gemini_config
-
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+from verdict_cache import verdict_cache
+from streaming import stream_agent_response
+from session_store import session_store
+from context_window import context_window
+import metrics
+
+# See streaming.GUARDRAIL_MODES.
+INPUT_GUARDRAIL_MODE = os.environ.get("INPUT_GUARDRAIL_MODE", "parallel")
+# "incremental" checks the output while it streams and stops generation on a trip;
+# "final" leaves the output guardrail to run on the finished response.
+OUTPUT_GUARDRAIL_MODE = os.environ.get("OUTPUT_GUARDRAIL_MODE", "incremental")
 
 @cl.on_chat_start
 async def start():
@@ -36,9 +40,10 @@ async def start():
     prev_session_id = query_params.get("session_id")
     
     if prev_session_id:
-        # Load chat history from Supabase
+        # Only the recent items are loaded here, so the greeting does not wait on a
+        # long conversation; the rest is loaded on the first turn if it is needed.
         try:
-            history = await load_chat_history(prev_session_id)
+            history = await session_store.resume(prev_session_id)
             if history:
                 cl.user_session.set("chat_history", history)
                 cl.user_session.set("session_id", prev_session_id)
@@ -49,47 +54,15 @@ async def start():
     
     await cl.Message(content=f"Welcome to the My AI Assistant! How can I help you today? (Your session ID: {session_id})").send()
 
-async def save_chat_history(session_id: str, history: List[Dict[str, Any]]):
-    """Save chat history to Supabase"""
-    try:
-        # Convert the history to a string for storage
-        history_json = json.dumps(history)
-        
-        # Check if this session already exists
-        response = supabase.table("chat_histories").select("id").eq("session_id", session_id).execute()
-        
-        if response.data and len(response.data) > 0:
-            # Update existing record
-            supabase.table("chat_histories").update({
-                "history": history_json,
-                "updated_at": datetime.now().isoformat()
-            }).eq("session_id", session_id).execute()
-        else:
-            # Insert new record
-            supabase.table("chat_histories").insert({
-                "session_id": session_id,
-                "history": history_json,
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat()
-            }).execute()
-        
-        return True
-    except Exception as e:
-        print(f"Error saving chat history: {str(e)}")
-        return False
-
-async def load_chat_history(session_id: str) -> List[Dict[str, Any]]:
-    """Load chat history from Supabase"""
-    try:
-        response = supabase.table("chat_histories").select("history").eq("session_id", session_id).execute()
-        
-        if response.data and len(response.data) > 0:
-            history_json = response.data[0]["history"]
-            return json.loads(history_json)
-        return []
-    except Exception as e:
-        print(f"Error loading chat history: {str(e)}")
-        return []
+@cl.on_app_startup
+async def startup():
+    # Span hooks feed the histograms served on METRICS_PORT.
+    metrics.install()
+
+@cl.on_app_shutdown
+async def shutdown():
+    await session_store.drain()
+    print(f"Session store: {session_store.stats()}")
 
 @cl.on_message
 async def main(message: cl.Message):
@@ -105,42 +78,62 @@ async def main(message: cl.Message):
     # Retrieve the chat history from the session.
     history = cl.user_session.get("chat_history") or []
 
-    # Append the user's message to the history.
-    history.append({"role": "user", "content": message.content})
-
-    try:
-        print("\n[CALLING_AGENT_WITH_CONTEXT]\n", history, "\n")
-        result = Runner.run_sync(starting_agent=agent,
-                                input=history,
-                                run_config=config)
-
-        print(f"RAW Result: {result}")
-        response_content = result.final_output
-
-        # Update the thinking message with the actual response
-        msg.content = response_content
-        await msg.update()
-
-        # Update the session with the new history.
-        updated_history = result.to_input_list()
-        cl.user_session.set("chat_history", updated_history)
+    # One trace per turn, so the guardrail checks, the summarizer and the agent run
+    # all count towards the same breakdown.
+    with trace("Chat turn", group_id=session_id) as turn:
+        try:
+            # A resumed session holds only its recent items. The older ones are
+            # loaded unless the summary saved with the session stands in for them.
+            if session_store.needs_older(session_id):
+                history = await session_store.hydrate(session_id)
+                cl.user_session.set("chat_history", history)
+            elif summary := session_store.saved_summary(session_id):
+                context_window.restore(session_id, summary)
+
+            # Add the user's message to a new list: the store may still be writing
+            # the previous one.
+            history = history + [{"role": "user", "content": message.content}]
+
+            # Older turns are summarized once the history outgrows the token budget.
+            input_items = await context_window.compact(session_id, history)
+            print("\n[CALLING_AGENT_WITH_CONTEXT]\n", input_items, "\n")
+            output_check = IncrementalMathOutputCheck(agent) if OUTPUT_GUARDRAIL_MODE == "incremental" else None
+            result, _ = await stream_agent_response(
+                agent, input_items, config, msg, guardrail_mode=INPUT_GUARDRAIL_MODE, output_check=output_check
+            )
+
+            print(f"RAW Result: {result}")
+            response_content = result.final_output
+
+            # Update the session with the new history. The full history is kept;
+            # only the model input was compacted.
+            updated_history = history + [item.to_input_item() for item in result.new_items]
+            cl.user_session.set("chat_history", updated_history)
         
-        # Save chat history to Supabase
-        await save_chat_history(session_id, updated_history)
-
-        # Optional: Log the interaction
-        print(f"User: {message.content}")
-        print(f"Assistant: {response_content}")
-
-    except InputGuardrailTripwireTriggered:
-        msg.content = "I can't help you with that. Please ask me something else."
-        await msg.update()
-        print("Math homework guardrail tripped")
-    except OutputGuardrailTripwireTriggered:
-        msg.content = "I can't help you with that. Please ask me something else."
-        await msg.update()
-        print("Math output guardrail tripped")
-    except Exception as e:
-        msg.content = f"Error: {str(e)}"
-        await msg.update()
-        print(f"Error: {str(e)}")
\ No newline at end of file
+            # Queue the new items for Supabase; the store writes them in the background.
+            # The summary goes into the session header for the next resume.
+            session_store.put(session_id, updated_history, context_window.summary(session_id))
+
+            # Optional: Log the interaction
+            print(f"User: {message.content}")
+            print(f"Assistant: {response_content}")
+            print(f"Input guardrail tiers: {math_guardrail_stats.snapshot()}")
+            print(f"Output guardrail tiers: {math_output_guardrail_stats.snapshot()}")
+            print(f"Streamed output checks: {math_output_stream_stats.snapshot()}")
+            print(f"Guardrail verdict cache: {verdict_cache.stats()}")
+            print(f"Context window: {context_window.stats.snapshot()}")
+
+        except InputGuardrailTripwireTriggered:
+            msg.content = "I can't help you with that. Please ask me something else."
+            await msg.update()
+            print("Math homework guardrail tripped")
+        except OutputGuardrailTripwireTriggered:
+            msg.content = "I can't help you with that. Please ask me something else."
+            await msg.update()
+            print("Math output guardrail tripped")
+            print(f"Streamed output checks: {math_output_stream_stats.snapshot()}")
+        except Exception as e:
+            msg.content = f"Error: {str(e)}"
+            await msg.update()
+            print(f"Error: {str(e)}")
+    print(f"Turn breakdown: {metrics.metrics_processor.turn(turn.trace_id)}")
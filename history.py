@@ -0,0 +1,152 @@
+import asyncio
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Dict, Any
+from supabase_client import supabase_client
+
+# supabase-py is synchronous, so every request below runs on a worker thread
+# to keep the Chainlit event loop free.
+
+# Rows fetched per request when reading a full history.
+PAGE_SIZE = 500
+
+
+@dataclass
+class SessionHeader:
+    """A session's chat_sessions row: its length and the running summary of older items."""
+
+    item_count: int
+    summary: str | None = None
+    summary_covered: int = 0
+    """Number of leading items folded into `summary`."""
+
+
+async def save_chat_history(session_id: str, history: List[Dict[str, Any]], start_seq: int = 0, offset: int = 0):
+    """Append the items from seq `start_seq` on to chat_messages in one upsert.
+
+    `start_seq` is the number of items already stored for the session, so each
+    turn writes only its new items. Re-sending an item is harmless: rows are keyed
+    by (session_id, seq). `offset` is the seq of history[0], for a history whose
+    older items were never loaded.
+    """
+    new_items = history[start_seq - offset:]
+    if not new_items:
+        return True
+    from postgrest.types import ReturnMethod
+
+    try:
+        created_at = datetime.now(timezone.utc).isoformat()
+        rows = [
+            {"session_id": session_id, "seq": start_seq + i, "item": item, "created_at": created_at}
+            for i, item in enumerate(new_items)
+        ]
+        query = supabase_client().table("chat_messages").upsert(
+            rows, on_conflict="session_id,seq", returning=ReturnMethod.minimal
+        )
+        await asyncio.to_thread(query.execute)
+        return True
+    except Exception as e:
+        print(f"Error saving chat history: {str(e)}")
+        return False
+
+
+async def load_chat_history(session_id: str, limit: int | None = None, before_seq: int | None = None) -> List[Dict[str, Any]]:
+    """Load chat history from Supabase, oldest item first.
+
+    With no arguments the whole history is returned. `limit` returns only the most
+    recent `limit` items; combine it with `before_seq` to page further back.
+    `before_seq` alone returns every item before it.
+    """
+    try:
+        if limit is not None:
+            query = supabase_client().table("chat_messages").select("item").eq("session_id", session_id)
+            if before_seq is not None:
+                query = query.lt("seq", before_seq)
+            response = await asyncio.to_thread(query.order("seq", desc=True).limit(limit).execute)
+            return [row["item"] for row in reversed(response.data)]
+
+        items = []
+        while True:
+            query = (
+                supabase_client().table("chat_messages").select("item")
+                .eq("session_id", session_id).gte("seq", len(items))
+            )
+            if before_seq is not None:
+                query = query.lt("seq", before_seq)
+            response = await asyncio.to_thread(query.order("seq").limit(PAGE_SIZE).execute)
+            items.extend(row["item"] for row in response.data)
+            if len(response.data) < PAGE_SIZE:
+                break
+        if items or before_seq is not None:
+            return items
+        return await _migrate_legacy_history(session_id)
+    except Exception as e:
+        print(f"Error loading chat history: {str(e)}")
+        return []
+
+
+async def load_recent_history(session_id: str, limit: int) -> tuple[List[Dict[str, Any]], int]:
+    """The session's last `limit` items, oldest first, and the seq of the first of them.
+
+    One indexed query however long the conversation is; the seq of the newest
+    row gives the session's length.
+    """
+    try:
+        query = (
+            supabase_client().table("chat_messages").select("seq,item")
+            .eq("session_id", session_id).order("seq", desc=True).limit(limit)
+        )
+        response = await asyncio.to_thread(query.execute)
+        if response.data:
+            rows = list(reversed(response.data))
+            return [row["item"] for row in rows], rows[0]["seq"]
+        history = await _migrate_legacy_history(session_id)
+        return history[-limit:] if limit else [], max(len(history) - limit, 0)
+    except Exception as e:
+        print(f"Error loading recent chat history: {str(e)}")
+        return [], 0
+
+
+async def load_session_header(session_id: str) -> SessionHeader | None:
+    try:
+        query = supabase_client().table("chat_sessions").select("item_count,summary,summary_covered").eq("session_id", session_id)
+        response = await asyncio.to_thread(query.execute)
+    except Exception as e:
+        print(f"Error loading session header: {str(e)}")
+        return None
+    if not response.data:
+        return None
+    row = response.data[0]
+    return SessionHeader(row["item_count"], row.get("summary"), row.get("summary_covered") or 0)
+
+
+async def save_session_header(session_id: str, header: SessionHeader) -> bool:
+    """Upsert the session's chat_sessions row. A header without a summary keeps the stored one."""
+    from postgrest.types import ReturnMethod
+
+    row = {"session_id": session_id, "item_count": header.item_count, "updated_at": datetime.now(timezone.utc).isoformat()}
+    if header.summary is not None:
+        row.update(summary=header.summary, summary_covered=header.summary_covered)
+    try:
+        query = supabase_client().table("chat_sessions").upsert(
+            row, on_conflict="session_id", returning=ReturnMethod.minimal
+        )
+        await asyncio.to_thread(query.execute)
+        return True
+    except Exception as e:
+        print(f"Error saving session header: {str(e)}")
+        return False
+
+
+async def _migrate_legacy_history(session_id: str) -> List[Dict[str, Any]]:
+    """Move a session stored as a chat_histories blob into chat_messages."""
+    query = supabase_client().table("chat_histories").select("history").eq("session_id", session_id)
+    response = await asyncio.to_thread(query.execute)
+    if not response.data:
+        return []
+    history = response.data[0]["history"]
+    if isinstance(history, str):
+        history = json.loads(history)
+    await save_chat_history(session_id, history)
+    return history
@@ -1,24 +1,49 @@
+import time
 from pydantic import BaseModel
-from agents import Agent, GuardrailFunctionOutput, RunContextWrapper, Runner, TResponseInputItem, input_guardrail, RunConfig
-from setup import google_gemini_config
+from agents import Agent, GuardrailFunctionOutput, RunContextWrapper, TResponseInputItem, input_guardrail, RunConfig
+from setup import GUARDRAIL_REASONING, provider_registry
+from verdict_cache import cached_verdict, verdict_cache
+from guardrail_tiers import (
+    ESCALATE, TRIP, TierStats, homework_classifier, latest_user_text, run_classifier, run_tokens, timed_classify,
+)
 
 class MathHomeworkOutput(BaseModel):
     is_math_homework: bool
     reasoning: str
 
-guardrail_agent = Agent(
+class MathHomeworkVerdict(BaseModel):
+    is_math_homework: bool
+
+verdict_agent = Agent(
     name="Guardrail check",
     instructions="Check if the user is asking you to do their math homework.",
-    output_type=MathHomeworkOutput,
+    output_type=MathHomeworkVerdict,
 )
+guardrail_agent = verdict_agent.clone(output_type=MathHomeworkOutput) if GUARDRAIL_REASONING else verdict_agent
+
+classifier_config = provider_registry.tier_config("classifier")
+
+math_guardrail_stats = TierStats()
 
 @input_guardrail
+@cached_verdict(verdict_cache, MathHomeworkOutput)
 async def math_guardrail(
     ctx: RunContextWrapper[None], agent: Agent, input: str | list[TResponseInputItem]
 ) -> GuardrailFunctionOutput:
-    result = await Runner.run(guardrail_agent, input, context=ctx.context, run_config = google_gemini_config)
+    # Obvious cases are settled locally; only ambiguous input reaches the LLM.
+    decision = timed_classify(homework_classifier, math_guardrail_stats, latest_user_text(input))
+    if decision.verdict != ESCALATE:
+        return GuardrailFunctionOutput(
+            output_info=MathHomeworkOutput(is_math_homework=decision.verdict == TRIP, reasoning=decision.reason),
+            tripwire_triggered=decision.verdict == TRIP,
+        )
+
+    started = time.perf_counter()
+    result = await run_classifier(guardrail_agent, verdict_agent, input, context=ctx.context, run_config=classifier_config)
+    math_guardrail_stats.record("llm", time.perf_counter() - started, run_tokens(result))
 
+    verdict = result.final_output
     return GuardrailFunctionOutput(
-        output_info=result.final_output,
-        tripwire_triggered=result.final_output.is_math_homework,
-    )
\ No newline at end of file
+        output_info=MathHomeworkOutput(is_math_homework=verdict.is_math_homework, reasoning=getattr(verdict, "reasoning", "")),
+        tripwire_triggered=verdict.is_math_homework,
+    )
@@ -1,36 +1,8 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel
-from agents import Agent, ItemHelpers, Runner, function_tool
-from agents.run import RunConfig
 import asyncio
-from agents.tool import function_tool
-
-
-load_dotenv()
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-
-
-
-if not gemini_api_key:
-    raise ValueError("GEMINI_API_KEY is not set. Please ensure it is defined in your .env file.")
-
-
-external_client = AsyncOpenAI(
-    api_key=gemini_api_key,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-)
-
-model = OpenAIChatCompletionsModel(
-    model="gemini-2.0-flash",
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
-)
+from agents import Agent, ItemHelpers, Runner, function_tool
+# The model comes from setup.py, which routes across the configured providers
+# instead of pinning one Gemini endpoint.
+from setup import model
 
 
 @function_tool("get_weather")
@@ -0,0 +1,325 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from agents import get_current_trace, set_trace_processors
+from agents.tracing.processor_interface import TracingProcessor
+
+# Port of the Prometheus endpoint started by `install`; 0 disables it.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """A Prometheus histogram with fixed buckets and one series per label set.
+
+    `observe` is a bisect and three increments. There is no lock: samples are
+    recorded from the event loop, and a scrape from the endpoint thread may at
+    worst see one sample partly applied.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, _Series] = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = _Series(len(self.buckets))
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def quantile(self, q: float, *label_values) -> float | None:
+        """Estimate a quantile by interpolating within its bucket, as Prometheus does."""
+        series = self._series.get(label_values)
+        if series is None or not series.count:
+            return None
+        rank = q * series.count
+        seen = 0
+        for i, count in enumerate(series.counts):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def render(self) -> list[str]:
+        lines = []
+        for values, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series.counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, values)} {series.sum}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, values)} {series.count}")
+        return lines
+
+    def snapshot(self) -> dict:
+        return {
+            ",".join(map(str, values)) or "all": {
+                "count": series.count,
+                "sum": series.sum,
+                "p50": self.quantile(0.5, *values),
+                "p95": self.quantile(0.95, *values),
+                "p99": self.quantile(0.99, *values),
+            }
+            for values, series in list(self._series.items())
+        }
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        return [f"{self.name}{_label_text(self.labels, values)} {value}" for values, value in list(self._values.items())]
+
+    def snapshot(self) -> dict:
+        return {",".join(map(str, values)) or "all": value for values, value in list(self._values.items())}
+
+
+class MetricsRegistry:
+    """Holds the process's metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: dict[str, Histogram | Counter] = {}
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+registry = MetricsRegistry()
+
+model_call_seconds = registry.histogram("agent_model_call_seconds", "Model call latency.", ("model",))
+model_tokens = registry.histogram(
+    "agent_model_tokens", "Tokens per model call.", ("model", "direction"), TOKEN_BUCKETS
+)
+tool_seconds = registry.histogram("agent_tool_seconds", "Tool execution time.", ("tool",))
+guardrail_seconds = registry.histogram("agent_guardrail_seconds", "Guardrail check time.", ("guardrail", "triggered"))
+agent_seconds = registry.histogram(
+    "agent_run_seconds", "Time in each agent, including its model and tool calls.", ("agent",)
+)
+handoffs = registry.counter("agent_handoffs_total", "Handoffs between agents.", ("from_agent", "to_agent"))
+persistence_seconds = registry.histogram("agent_persistence_seconds", "Chat history reads and writes.", ("operation",))
+turn_seconds = registry.histogram("agent_turn_seconds", "End-to-end time of a traced turn.", ("workflow",))
+span_errors = registry.counter("agent_span_errors_total", "Spans that ended with an error.", ("span_type",))
+
+
+@dataclass
+class TurnBreakdown:
+    """Where one trace's time went. A chat turn is one trace."""
+
+    trace_id: str
+    workflow: str
+    started: float = field(repr=False)
+    total_ms: float = 0.0
+    model_calls: int = 0
+    model_ms: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    tool_calls: int = 0
+    tool_ms: float = 0.0
+    guardrails: int = 0
+    guardrail_ms: float = 0.0
+    handoffs: int = 0
+    persistence_ms: float = 0.0
+    errors: int = 0
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        del data["started"]
+        return data
+
+
+class MetricsProcessor(TracingProcessor):
+    """Turns the SDK's span hooks into histograms and per-turn breakdowns.
+
+    Receives the same callbacks as SupabaseTraceProcessor. Durations are taken
+    with perf_counter between the start and end hooks, so no timestamps are
+    parsed. Breakdowns of the last `recent_size` finished turns are kept.
+    """
+
+    def __init__(self, recent_size: int = 256):
+        self.live_turns: dict[str, TurnBreakdown] = {}
+        self.recent_turns: deque[TurnBreakdown] = deque(maxlen=recent_size)
+        self._span_starts: dict[str, float] = {}
+
+    def on_trace_start(self, trace):
+        self.live_turns[trace.trace_id] = TurnBreakdown(trace.trace_id, trace.name, time.perf_counter())
+
+    def on_trace_end(self, trace):
+        turn = self.live_turns.pop(trace.trace_id, None)
+        if turn is None:
+            return
+        turn.total_ms = (time.perf_counter() - turn.started) * 1000
+        turn_seconds.observe(turn.total_ms / 1000, turn.workflow)
+        self.recent_turns.append(turn)
+
+    def on_span_start(self, span):
+        self._span_starts[span.span_id] = time.perf_counter()
+
+    def on_span_end(self, span):
+        started = self._span_starts.pop(span.span_id, None)
+        seconds = time.perf_counter() - started if started is not None else 0.0
+        data = span.span_data
+        kind = data.type
+        turn = self.live_turns.get(span.trace_id)
+
+        if kind in ("generation", "response"):
+            if kind == "generation":
+                model = data.model or "unknown"
+                usage = data.usage or {}
+                input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+            else:
+                response = data.response
+                model = getattr(response, "model", None) or "unknown"
+                usage = getattr(response, "usage", None)
+                input_tokens = usage.input_tokens if usage else 0
+                output_tokens = usage.output_tokens if usage else 0
+            model_call_seconds.observe(seconds, model)
+            model_tokens.observe(input_tokens, model, "input")
+            model_tokens.observe(output_tokens, model, "output")
+            if turn:
+                turn.model_calls += 1
+                turn.model_ms += seconds * 1000
+                turn.input_tokens += input_tokens
+                turn.output_tokens += output_tokens
+        elif kind == "function":
+            tool_seconds.observe(seconds, data.name)
+            if turn:
+                turn.tool_calls += 1
+                turn.tool_ms += seconds * 1000
+        elif kind == "guardrail":
+            guardrail_seconds.observe(seconds, data.name, "true" if data.triggered else "false")
+            if turn:
+                turn.guardrails += 1
+                turn.guardrail_ms += seconds * 1000
+        elif kind == "handoff":
+            handoffs.inc(data.from_agent or "unknown", data.to_agent or "unknown")
+            if turn:
+                turn.handoffs += 1
+        elif kind == "agent":
+            agent_seconds.observe(seconds, data.name)
+
+        if span.error is not None:
+            span_errors.inc(kind)
+            if turn:
+                turn.errors += 1
+
+    def record_persistence(self, operation: str, seconds: float):
+        """Record a chat history read or write, against the current turn if one is live."""
+        persistence_seconds.observe(seconds, operation)
+        trace = get_current_trace()
+        turn = self.live_turns.get(trace.trace_id) if trace else None
+        if turn:
+            turn.persistence_ms += seconds * 1000
+
+    def turn(self, trace_id: str) -> dict | None:
+        """Breakdown of a finished (or still running) turn."""
+        turn = self.live_turns.get(trace_id)
+        if turn is None:
+            turn = next((t for t in reversed(self.recent_turns) if t.trace_id == trace_id), None)
+        return turn.as_dict() if turn else None
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self):
+        pass
+
+
+metrics_processor = MetricsProcessor()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@functools.cache
+def serve(port: int = METRICS_PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics on a background thread. Later calls return the running server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
+    return server
+
+
+@functools.cache
+def install(port: int = METRICS_PORT) -> MetricsProcessor:
+    """Route the SDK's spans to the metrics and start the endpoint (unless `port` is 0).
+
+    Replaces the SDK's default processor, which would export traces to OpenAI.
+    Use tracing.configure_tracing instead to export to Supabase as well.
+    """
+    set_trace_processors([metrics_processor])
+    if port:
+        serve(port)
+    return metrics_processor
@@ -0,0 +1,335 @@
+import asyncio
+import math
+import time
+from collections import deque
+from statistics import median_low
+from typing import AsyncIterator
+from agents import Model
+from agents.models.interface import ModelTracing
+
+
+def _percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class Backend:
+    """One OpenAI-compatible endpoint behind the router, with its rolling health."""
+
+    def __init__(self, name: str, model: Model, window: int = 100, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.name = name
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        # Full-response latency and time to first streamed event are tracked apart.
+        self.latencies = deque(maxlen=window)
+        self.first_event_latencies = deque(maxlen=window)
+        # What ranking sees, per streaming mode: (seconds, finished) for completed
+        # calls and for hedge losers, whose elapsed time is only a lower bound.
+        self.observed = {False: deque(maxlen=window), True: deque(maxlen=window)}
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self.requests = 0
+        self.failures = 0
+        self.breaker_trips = 0
+
+    def record_success(self, latency: float | None = None, first_event: float | None = None):
+        self.outcomes.append(True)
+        if latency is not None:
+            self.latencies.append(latency)
+            self.observed[False].append((latency, True))
+        if first_event is not None:
+            self.first_event_latencies.append(first_event)
+            self.observed[True].append((first_event, True))
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_cancelled(self, elapsed: float, streaming: bool):
+        """A hedge loser cancelled after `elapsed` seconds, so that call was at least that slow.
+
+        Not a failure. See `score` for how these lower bounds are used.
+        """
+        self.observed[streaming].append((elapsed, False))
+
+    def record_failure(self):
+        self.outcomes.append(False)
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.breaker_trips += 1
+            # Re-opening after a failed half-open probe restarts the cooldown.
+            self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def samples(self, streaming: bool):
+        return self.first_event_latencies if streaming else self.latencies
+
+    def score(self, streaming: bool) -> float:
+        """Expected latency, inflated by the error rate.
+
+        The median of recent calls, the lower one on a tie so a single slow call
+        does not demote a backend. A hedge loss only says the call took longer
+        than its elapsed time, so it counts when that is slower than the
+        completed calls' median and is ignored otherwise. Untried backends score 0 so they get
+        explored; ones that have only failed score infinity.
+        """
+        observed = self.observed[streaming]
+        if not observed:
+            return math.inf if self.outcomes and not any(self.outcomes) else 0.0
+        finished = [seconds for seconds, done in observed if done]
+        typical = median_low(finished) if finished else 0.0
+        slower = [seconds for seconds, done in observed if not done and seconds > typical]
+        return median_low(finished + slower) * (1 + 4 * self.error_rate())
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "error_rate": self.error_rate(),
+            "breaker_trips": self.breaker_trips,
+            "p50_ms": _percentile(self.latencies, 0.5) * 1000 if self.latencies else None,
+            "p95_ms": _percentile(self.latencies, 0.95) * 1000 if self.latencies else None,
+            "first_event_p95_ms": (
+                _percentile(self.first_event_latencies, 0.95) * 1000 if self.first_event_latencies else None
+            ),
+        }
+
+
+_END = object()
+
+
+class RoutingModel(Model):
+    """A Model that sends each request to the fastest healthy backend.
+
+    Backends are ranked by rolling p50 latency weighted by error rate; ones
+    whose circuit breaker is open are skipped until their cooldown passes.
+    If the chosen backend has not answered by its p95 latency (or `hedge_after`
+    before enough samples exist), the request is also sent to the next backend
+    and the first answer wins; the loser is cancelled and its elapsed time kept
+    as a lower bound on its latency. A backend that fails is replaced by the
+    next one. Streams are hedged and failed over up to their first event.
+
+    Every `probe_every`th request is also sent, in the background and untraced,
+    to one of the other healthy backends that has not only failed, in turn. The probe runs to completion,
+    so a backend that was demoted after a slow spell gets fresh samples and
+    can win back the primary slot. 0 disables probing.
+    """
+
+    def __init__(self, backends: list[Backend], hedge: bool = True, hedge_after: float = 2.0,
+                 min_hedge_delay: float = 0.05, min_samples: int = 20, probe_every: int = 20):
+        if not backends:
+            raise ValueError("RoutingModel needs at least one backend")
+        self.backends = backends
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self.probes = 0
+        self._probe_tasks: set[asyncio.Task] = set()
+
+    def _ranked(self, streaming: bool) -> list[Backend]:
+        healthy = [b for b in self.backends if b.state != "open"]
+        if not healthy:
+            # Every breaker is open: try the one that has been resting longest.
+            return sorted(self.backends, key=lambda b: b.opened_at)
+        return sorted(healthy, key=lambda b: b.score(streaming))
+
+    def _probe(self, candidates: list[Backend], streaming: bool, args, kwargs):
+        """Every `probe_every`th request, send a copy to a healthy backend other than the primary."""
+        # Backends that have only failed are left to failover and their breaker.
+        others = [b for b in candidates[1:] if b.state != "open" and b.score(streaming) < math.inf]
+        if not self.probe_every or self.requests % self.probe_every or not others:
+            return
+        backend = others[(self.requests // self.probe_every) % len(others)]
+        # The probe may outlive the request's trace, so it is not traced.
+        if len(args) > 6:
+            args = args[:6] + (ModelTracing.DISABLED,) + args[7:]
+        else:
+            kwargs = {**kwargs, "tracing": ModelTracing.DISABLED}
+        if streaming:
+            probe = self._pump(backend, asyncio.Queue(), args, kwargs)
+        else:
+            probe = self._call(backend, args, kwargs)
+        task = asyncio.create_task(probe)
+        self._probe_tasks.add(task)
+        task.add_done_callback(self._probe_done)
+        self.probes += 1
+
+    def _probe_done(self, task: asyncio.Task):
+        self._probe_tasks.discard(task)
+        # A probe only feeds its backend's health; its error is retrieved so it is not logged.
+        if not task.cancelled():
+            task.exception()
+
+    def _deadline(self, backend: Backend, streaming: bool) -> float:
+        samples = backend.samples(streaming)
+        if len(samples) < self.min_samples:
+            return self.hedge_after
+        return max(_percentile(samples, 0.95), self.min_hedge_delay)
+
+    async def _call(self, backend: Backend, args, kwargs):
+        backend.requests += 1
+        started = time.perf_counter()
+        try:
+            response = await backend.model.get_response(*args, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            backend.record_failure()
+            raise
+        backend.record_success(latency=time.perf_counter() - started)
+        return response
+
+    async def get_response(self, *args, **kwargs):
+        self.requests += 1
+        candidates = self._ranked(streaming=False)
+        self._probe(candidates, False, args, kwargs)
+        primary = candidates[0]
+        pending: dict[asyncio.Task, Backend] = {}
+        started: dict[asyncio.Task, float] = {}
+        error: Exception | None = None
+        hedged = False
+        answered = False
+
+        def launch(backend):
+            task = asyncio.create_task(self._call(backend, args, kwargs))
+            pending[task] = backend
+            started[task] = time.perf_counter()
+
+        launch(candidates.pop(0))
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and not hedged and candidates:
+                    timeout = self._deadline(primary, streaming=False)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.hedges += 1
+                    launch(candidates.pop(0))
+                    continue
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.exception() is None:
+                        if hedged and backend is not primary:
+                            self.hedge_wins += 1
+                        answered = True
+                        return task.result()
+                    error = task.exception()
+                if not pending and candidates:
+                    self.failovers += 1
+                    launch(candidates.pop(0))
+            raise error
+        finally:
+            for task, backend in pending.items():
+                task.cancel()
+                if answered:
+                    backend.record_cancelled(time.perf_counter() - started[task], streaming=False)
+
+    async def _pump(self, backend: Backend, queue: asyncio.Queue, args, kwargs):
+        # Each backend's stream is consumed in its own task, so the SDK's span
+        # context is entered and exited in the same task.
+        backend.requests += 1
+        started = time.perf_counter()
+        first_event = None
+        try:
+            async for event in backend.model.stream_response(*args, **kwargs):
+                if first_event is None:
+                    first_event = time.perf_counter() - started
+                queue.put_nowait(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            backend.record_failure()
+            queue.put_nowait(e)
+            return
+        backend.record_success(first_event=first_event if first_event is not None else time.perf_counter() - started)
+        queue.put_nowait(_END)
+
+    async def stream_response(self, *args, **kwargs) -> AsyncIterator:
+        self.requests += 1
+        candidates = self._ranked(streaming=True)
+        self._probe(candidates, True, args, kwargs)
+        primary = candidates[0]
+        streams: dict[asyncio.Task, tuple[Backend, asyncio.Queue, asyncio.Task, float]] = {}
+        winner = None
+        error: Exception | None = None
+        hedged = False
+
+        def launch(backend):
+            queue = asyncio.Queue()
+            pump = asyncio.create_task(self._pump(backend, queue, args, kwargs))
+            streams[asyncio.create_task(queue.get())] = (backend, queue, pump, time.perf_counter())
+
+        launch(candidates.pop(0))
+        try:
+            while streams and winner is None:
+                timeout = None
+                if self.hedge and not hedged and candidates:
+                    timeout = self._deadline(primary, streaming=True)
+                done, _ = await asyncio.wait(streams, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.hedges += 1
+                    launch(candidates.pop(0))
+                    continue
+                for waiter in done:
+                    backend, queue, pump, started = streams.pop(waiter)
+                    first = waiter.result()
+                    if isinstance(first, Exception):
+                        error = first
+                        continue
+                    if winner is None:
+                        winner = (backend, queue, pump, first)
+                        if hedged and backend is not primary:
+                            self.hedge_wins += 1
+                    else:
+                        pump.cancel()
+                        backend.record_cancelled(time.perf_counter() - started, streaming=True)
+                if winner is None and not streams and candidates:
+                    self.failovers += 1
+                    launch(candidates.pop(0))
+        finally:
+            for waiter, (backend, _, pump, started) in streams.items():
+                waiter.cancel()
+                pump.cancel()
+                if winner is not None:
+                    backend.record_cancelled(time.perf_counter() - started, streaming=True)
+
+        if winner is None:
+            raise error
+        _, queue, pump, item = winner
+        try:
+            while item is not _END:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                item = await queue.get()
+        finally:
+            pump.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "probes": self.probes,
+            "backends": {b.name: b.snapshot() for b in self.backends},
+        }
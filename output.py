@@ -1,6 +1,16 @@
+import asyncio
+import re
+import time
 from pydantic import BaseModel
-from agents import Agent, GuardrailFunctionOutput, RunContextWrapper, Runner, output_guardrail
-from setup import google_gemini_config
+from agents import (
+    Agent, GuardrailFunctionOutput, OutputGuardrailResult, OutputGuardrailTripwireTriggered, RunContextWrapper,
+    guardrail_span, output_guardrail,
+)
+from setup import GUARDRAIL_REASONING, provider_registry
+from verdict_cache import cached_verdict, verdict_cache
+from guardrail_tiers import (
+    ESCALATE, TRIP, TierStats, math_output_classifier, run_classifier, run_tokens, timed_classify,
+)
 
 class MessageOutput(BaseModel):
     response: str
@@ -9,20 +19,175 @@ class MathOutput(BaseModel):
     is_math: bool
     reasoning: str
 
-guardrail_agent2 = Agent(
+class MathVerdict(BaseModel):
+    is_math: bool
+
+verdict_agent2 = Agent(
     name="Guardrail check",
     instructions="Check if the output includes any math.",
-    output_type=MathOutput,
+    output_type=MathVerdict,
 )
+guardrail_agent2 = verdict_agent2.clone(output_type=MathOutput) if GUARDRAIL_REASONING else verdict_agent2
+
+classifier_config = provider_registry.tier_config("classifier")
+
+math_output_guardrail_stats = TierStats()
 
 @output_guardrail
+@cached_verdict(verdict_cache, MathOutput)
 async def math_output_guardrail(
     ctx: RunContextWrapper, agent: Agent, output: MessageOutput
 ) -> GuardrailFunctionOutput:
     print(f"Output: Guardrail triggered", output)
-    result = await Runner.run(guardrail_agent2, output, context=ctx.context, run_config = google_gemini_config)
+    text = output.response if isinstance(output, MessageOutput) else str(output)
+    # Obvious cases are settled locally; only ambiguous output reaches the LLM.
+    decision = timed_classify(math_output_classifier, math_output_guardrail_stats, text)
+    if decision.verdict != ESCALATE:
+        return GuardrailFunctionOutput(
+            output_info=MathOutput(is_math=decision.verdict == TRIP, reasoning=decision.reason),
+            tripwire_triggered=decision.verdict == TRIP,
+        )
+
+    started = time.perf_counter()
+    result = await run_classifier(guardrail_agent2, verdict_agent2, output, context=ctx.context, run_config=classifier_config)
+    math_output_guardrail_stats.record("llm", time.perf_counter() - started, run_tokens(result))
 
+    verdict = result.final_output
     return GuardrailFunctionOutput(
-        output_info=result.final_output,
-        tripwire_triggered=result.final_output.is_math,
-    )
\ No newline at end of file
+        output_info=MathOutput(is_math=verdict.is_math, reasoning=getattr(verdict, "reasoning", "")),
+        tripwire_triggered=verdict.is_math,
+    )
+
+
+# Sentence end: terminal punctuation followed by whitespace, or a line break.
+_SENTENCE_END = re.compile(r"[.!?](?=\s)|\n")
+
+
+class StreamCheckStats:
+    """Outcomes of incremental output checks across streamed responses."""
+
+    def __init__(self):
+        self.streams = 0
+        self.local_trips = 0
+        self.llm_trips = 0
+        self.llm_checks = 0
+        self.chars_before_trip = 0
+        self.chunk_checks = 0
+        self.chunk_check_seconds = 0.0
+
+    def snapshot(self) -> dict:
+        trips = self.local_trips + self.llm_trips
+        return {
+            "streams": self.streams,
+            "trips": trips,
+            "local_trips": self.local_trips,
+            "llm_trips": self.llm_trips,
+            "llm_checks": self.llm_checks,
+            "mean_chars_before_trip": self.chars_before_trip / trips if trips else 0.0,
+            "chunk_checks": self.chunk_checks,
+            "mean_chunk_check_us": self.chunk_check_seconds / self.chunk_checks * 1e6 if self.chunk_checks else 0.0,
+        }
+
+
+math_output_stream_stats = StreamCheckStats()
+
+
+class IncrementalMathOutputCheck:
+    """The math output guardrail applied to a response while it streams.
+
+    Every chunk is checked with the local classifier over a trailing window of
+    `window` characters. Each completed sentence the local classifier cannot
+    settle is sent to the LLM classifier in the background, so generation is
+    not held up. `feed` raises OutputGuardrailTripwireTriggered as soon as
+    either check trips, which lets the caller stop generation early. Use one
+    instance per response.
+
+    The per-chunk checks are counted in `math_output_stream_stats`. The tier
+    stats get one local check per response settled without the LLM, like the
+    non-streaming guardrail, plus one LLM check per escalation.
+    """
+
+    def __init__(self, agent: Agent, window: int = 240):
+        self.agent = agent
+        self.window = window
+        self.text = ""
+        self._checked_to = 0
+        self._pending: set[asyncio.Task] = set()
+        self._tripped: GuardrailFunctionOutput | None = None
+        self._local_seconds = 0.0
+        self._escalated = False
+        math_output_stream_stats.streams += 1
+
+    def _trip(self, output: GuardrailFunctionOutput, local: bool):
+        if local:
+            math_output_stream_stats.local_trips += 1
+            if not self._escalated:
+                math_output_guardrail_stats.record("local", self._local_seconds)
+        else:
+            math_output_stream_stats.llm_trips += 1
+        math_output_stream_stats.chars_before_trip += len(self.text)
+        self.close()
+        raise OutputGuardrailTripwireTriggered(
+            OutputGuardrailResult(guardrail=math_output_guardrail, agent_output=self.text, agent=self.agent, output=output)
+        )
+
+    async def _llm_check(self, sentences: str):
+        math_output_stream_stats.llm_checks += 1
+        started = time.perf_counter()
+        with guardrail_span(math_output_guardrail.get_name()) as span:
+            result = await run_classifier(guardrail_agent2, verdict_agent2, sentences, run_config=classifier_config)
+            span.span_data.triggered = result.final_output.is_math
+        math_output_guardrail_stats.record("llm", time.perf_counter() - started, run_tokens(result))
+        verdict = result.final_output
+        if verdict.is_math and self._tripped is None:
+            self._tripped = GuardrailFunctionOutput(
+                output_info=MathOutput(is_math=True, reasoning=getattr(verdict, "reasoning", "")),
+                tripwire_triggered=True,
+            )
+
+    def _escalate(self, sentences: str):
+        self._escalated = True
+        task = asyncio.create_task(self._llm_check(sentences))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def feed(self, delta: str):
+        """Check the response so far with `delta` appended, before `delta` is shown."""
+        if self._tripped is not None:
+            self._trip(self._tripped, local=False)
+        self.text += delta
+        started = time.perf_counter()
+        decision = math_output_classifier.classify(self.text[-self.window:])
+        elapsed = time.perf_counter() - started
+        self._local_seconds += elapsed
+        math_output_stream_stats.chunk_checks += 1
+        math_output_stream_stats.chunk_check_seconds += elapsed
+        if decision.verdict == TRIP:
+            self._trip(GuardrailFunctionOutput(
+                output_info=MathOutput(is_math=True, reasoning=decision.reason), tripwire_triggered=True,
+            ), local=True)
+
+        boundary = None
+        for match in _SENTENCE_END.finditer(self.text, self._checked_to):
+            boundary = match.end()
+        if boundary is not None:
+            sentences = self.text[self._checked_to:boundary]
+            self._checked_to = boundary
+            if sentences.strip() and math_output_classifier.classify(sentences).verdict == ESCALATE:
+                self._escalate(sentences)
+
+    async def finish(self):
+        """Check the unterminated tail and wait for outstanding LLM checks."""
+        tail = self.text[self._checked_to:]
+        if tail.strip() and math_output_classifier.classify(tail).verdict == ESCALATE:
+            self._escalate(tail)
+        if not self._escalated:
+            math_output_guardrail_stats.record("local", self._local_seconds)
+        if self._pending:
+            await asyncio.gather(*self._pending)
+        if self._tripped is not None:
+            self._trip(self._tripped, local=False)
+
+    def close(self):
+        for task in self._pending:
+            task.cancel()
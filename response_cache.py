@@ -0,0 +1,169 @@
+import math
+import os
+import re
+import time
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+# Set RESPONSE_CACHE=0 to bypass the cache for every session.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+# Cosine similarity a new message needs to reuse a cached answer. Rephrasings of
+# one question score 0.87 and up; different questions about the same thing
+# ("cancel my order" vs "track my order") score 0.7 and below.
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.8"))
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_VECTOR_SIZE = 4096
+# Words that change how a question is phrased but not what it asks.
+_FILLER = frozenset(
+    "a an the i me my we our you your do does did can could would will please is are was "
+    "to of for on in how what which where s".split()
+)
+# Order numbers, amounts, emails and the like, and capitalised words after a
+# sentence's first word, which are mostly names.
+_NUMBERISH = re.compile(r"\S*\d\S*|\S+@\S+")
+_NAME = re.compile(r"(?<![.!?]\s)(?<!^)\b[A-Z][a-z]+\b")
+
+
+def normalize(text: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace."""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+def identifiers(message: str) -> frozenset[str]:
+    """The parts of a message two similar questions must share for one answer to fit both."""
+    found = {_PUNCTUATION.sub("", token).lower() for token in _NUMBERISH.findall(message)}
+    found.update(name.lower() for name in _NAME.findall(message.strip()))
+    return frozenset(found)
+
+
+def embed(text: str) -> dict[int, float]:
+    """A local, dependency-free embedding: hashed word and in-word trigram counts, unit length.
+
+    Filler words are dropped, so "how do I get a refund?" and "How can I get a
+    refund" embed the same, which is all the cache needs.
+    """
+    words = [word for word in text.split() if word not in _FILLER] or text.split()
+    grams = list(words)
+    for word in words:
+        padded = f" {word} "
+        grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    counts = Counter(zlib.crc32(gram.encode()) % _VECTOR_SIZE for gram in grams)
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {k: c / norm for k, c in counts.items()}
+
+
+def similarity(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+@dataclass
+class CachedResponse:
+    text: str
+    handoff_target: str | None
+    """Agent that produced the answer, if the run handed off."""
+    run_seconds: float
+    """Latency of the run that produced the answer; a hit saves roughly this."""
+    vector: dict[int, float] = field(repr=False)
+    identifiers: frozenset[str] = frozenset()
+    created: float = field(default_factory=time.monotonic)
+
+
+class ResponseCache:
+    """Reuses answers to near-identical opening questions.
+
+    Entries are scoped by the agent the run started from and remember the
+    agent it handed off to, so a hit replays the same handoff. A lookup tries
+    the normalized text first and then the most similar entry in the same
+    scope that mentions the same numbers and names, so one customer's order
+    is never answered with another's. Entries expire after `ttl` seconds and
+    the least recently used are evicted beyond `maxsize`.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600.0, threshold: float = RESPONSE_CACHE_THRESHOLD):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: OrderedDict[tuple[str, str], CachedResponse] = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+        self.similar_hits = 0
+        self.latency_saved = 0.0
+        self.hits_by_target = Counter()
+
+    def _expired(self, entry: CachedResponse) -> bool:
+        return time.monotonic() - entry.created > self.ttl
+
+    def lookup(self, agent_name: str, message: str) -> CachedResponse | None:
+        self.lookups += 1
+        text = normalize(message)
+        key = (agent_name, text)
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry):
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            key, entry = self._most_similar(agent_name, message, text)
+            if entry is None:
+                return None
+            self.similar_hits += 1
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.hits_by_target[entry.handoff_target or agent_name] += 1
+        return entry
+
+    def _most_similar(self, agent_name: str, message: str, text: str):
+        vector = embed(text)
+        wanted = identifiers(message)
+        best, found = self.threshold, (None, None)
+        for key, candidate in list(self._entries.items()):
+            if key[0] != agent_name or candidate.identifiers != wanted:
+                continue
+            if self._expired(candidate):
+                del self._entries[key]
+                continue
+            score = similarity(vector, candidate.vector)
+            if score >= best:
+                best, found = score, (key, candidate)
+        return found
+
+    def record_hit(self, entry: CachedResponse, serve_seconds: float):
+        self.latency_saved += max(entry.run_seconds - serve_seconds, 0.0)
+
+    def store(self, agent_name: str, message: str, text: str, handoff_target: str | None, run_seconds: float):
+        normalized = normalize(message)
+        self._entries[(agent_name, normalized)] = CachedResponse(
+            text=text, handoff_target=handoff_target, run_seconds=run_seconds, vector=embed(normalized),
+            identifiers=identifiers(message),
+        )
+        self._entries.move_to_end((agent_name, normalized))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, agent_name: str | None = None):
+        """Drop entries started from, or handed off to, `agent_name` (everything if None)."""
+        if agent_name is None:
+            self._entries.clear()
+            return
+        for key in [k for k, e in self._entries.items() if agent_name in (k[0], e.handoff_target)]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "hit_ratio": self.hits / self.lookups if self.lookups else 0.0,
+            "latency_saved_s": self.latency_saved,
+            "hits_by_target": dict(self.hits_by_target),
+        }
+
+
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+)
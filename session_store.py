@@ -0,0 +1,264 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Dict, Any
+from history import (
+    SessionHeader, load_chat_history, load_recent_history, load_session_header, save_chat_history, save_session_header,
+)
+from metrics import metrics_processor
+
+if TYPE_CHECKING:
+    from context_window import Summary
+
+
+class WriteBehindSessionStore:
+    """Keeps chat histories in memory and persists them from a background task.
+
+    `put` returns immediately. If a session is written several times before the
+    flusher runs, those writes collapse into one append of the new items. A
+    failed write is retried with exponential backoff. Reads come from an LRU of
+    hot sessions and only go to the database on a miss.
+
+    `resume` loads only a session's header and its last `recent_items` items.
+    Such a session's cached history starts at seq `_offsets[session_id]`; the
+    older items are loaded by `hydrate` if the saved summary does not cover them.
+    """
+
+    def __init__(self, cache_size: int = 256, flush_interval: float = 0.5, max_retries: int = 5,
+                 recent_items: int = 50):
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.recent_items = recent_items
+        self._cache: OrderedDict[str, List[Dict[str, Any]]] = OrderedDict()
+        self._persisted: dict[str, int] = {}
+        self._offsets: dict[str, int] = {}
+        self._headers: dict[str, SessionHeader] = {}
+        self._summary_changed: set[str] = set()
+        self._pending: dict[str, List[Dict[str, Any]]] = {}
+        self._attempts: dict[str, int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.writes = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.hydrations = 0
+
+    def put(self, session_id: str, history: List[Dict[str, Any]], summary: "Summary | None" = None):
+        """Record the session's latest history and schedule it for persistence.
+
+        `summary` is the context window's summary of the leading items of `history`;
+        it is saved in the session header so a later resume can skip those items.
+        """
+        if summary is not None:
+            covered = summary.covered + self._offsets.get(session_id, 0)
+            header = self._headers.get(session_id)
+            if header is None or (header.summary, header.summary_covered) != (summary.text, covered):
+                self._headers[session_id] = SessionHeader(0, summary.text, covered)
+                self._summary_changed.add(session_id)
+        # A copy, so the caller appending to its list cannot change what is written.
+        history = list(history)
+        self._remember(session_id, history)
+        if session_id in self._pending:
+            self.coalesced += 1
+        self._pending[session_id] = history
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def get(self, session_id: str) -> List[Dict[str, Any]]:
+        """Return the session's whole history, loading it from the database on a cache miss."""
+        if session_id in self._cache or session_id in self._pending:
+            self.cache_hits += 1
+            if self._offsets.get(session_id):
+                return await self.hydrate(session_id)
+            if session_id in self._cache:
+                self._cache.move_to_end(session_id)
+                return self._cache[session_id]
+            return self._pending[session_id]
+        self.cache_misses += 1
+        started = time.perf_counter()
+        history = await load_chat_history(session_id)
+        metrics_processor.record_persistence("load", time.perf_counter() - started)
+        if history:
+            self._persisted[session_id] = len(history)
+            self._remember(session_id, history)
+        return history
+
+    async def resume(self, session_id: str) -> List[Dict[str, Any]]:
+        """Return the session's recent items, enough to greet a returning user.
+
+        On a cache miss the header and the last `recent_items` items are read in
+        parallel, so this takes the same time however long the conversation is.
+        """
+        if session_id in self._cache or session_id in self._pending:
+            self.cache_hits += 1
+            if session_id in self._cache:
+                self._cache.move_to_end(session_id)
+                return self._cache[session_id]
+            return self._pending[session_id]
+        self.cache_misses += 1
+        started = time.perf_counter()
+        (items, offset), header = await asyncio.gather(
+            load_recent_history(session_id, self.recent_items), load_session_header(session_id)
+        )
+        metrics_processor.record_persistence("resume", time.perf_counter() - started)
+        if items:
+            self._persisted[session_id] = offset + len(items)
+            if offset:
+                self._offsets[session_id] = offset
+            if header is not None:
+                self._headers[session_id] = header
+            self._remember(session_id, items)
+        return items
+
+    def saved_summary(self, session_id: str) -> "Summary | None":
+        """The header's summary, if it covers every item before the cached history.
+
+        `covered` is relative to the cached history, as the context window expects.
+        """
+        from context_window import Summary
+
+        header = self._headers.get(session_id)
+        offset = self._offsets.get(session_id, 0)
+        if header is None or header.summary is None or header.summary_covered < offset:
+            return None
+        return Summary(text=header.summary, covered=header.summary_covered - offset)
+
+    def needs_older(self, session_id: str) -> bool:
+        """Whether the cached history lacks older items that no saved summary stands in for."""
+        return bool(self._offsets.get(session_id)) and self.saved_summary(session_id) is None
+
+    async def hydrate(self, session_id: str) -> List[Dict[str, Any]]:
+        """Load the items before the cached history and return the whole history.
+
+        If they cannot all be loaded, the cached recent items are returned instead.
+        """
+        offset = self._offsets.get(session_id, 0)
+        if not offset:
+            return self._pending.get(session_id) or self._cache.get(session_id) or await self.get(session_id)
+        started = time.perf_counter()
+        older = await load_chat_history(session_id, before_seq=offset)
+        metrics_processor.record_persistence("load", time.perf_counter() - started)
+        if self._offsets.get(session_id) != offset:
+            # Another caller hydrated it while we waited.
+            return await self.hydrate(session_id)
+        if len(older) != offset:
+            # A failed load comes back empty or short. Carry on with the recent items;
+            # the offset stays, so the next turn tries again.
+            print(f"Could not load the {offset} older items of session {session_id} "
+                  f"(got {len(older)}); continuing with the recent ones")
+            return self._pending.get(session_id) or self._cache.get(session_id) or []
+        history = older + (self._pending.get(session_id) or self._cache.get(session_id) or [])
+        del self._offsets[session_id]
+        if session_id in self._pending:
+            self._pending[session_id] = history
+        self._remember(session_id, history)
+        self.hydrations += 1
+        return history
+
+    def _remember(self, session_id: str, history: List[Dict[str, Any]]):
+        self._cache[session_id] = history
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            if evicted not in self._pending:
+                self._persisted.pop(evicted, None)
+                self._offsets.pop(evicted, None)
+                self._headers.pop(evicted, None)
+                self._summary_changed.discard(evicted)
+
+    async def _flush_loop(self):
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Write every pending session once, retrying failures on a later pass."""
+        async with self._flush_lock:
+            await self._flush_pending()
+
+    async def _flush_pending(self):
+        batch, self._pending = self._pending, {}
+        # Taken now: a hydration finishing before a write starts changes the offset.
+        offsets = {sid: self._offsets.get(sid, 0) for sid in batch}
+        results = await asyncio.gather(*(self._write(sid, history, offsets[sid]) for sid, history in batch.items()))
+        backoff = 0.0
+        for (session_id, history), ok in zip(batch.items(), results):
+            if ok:
+                self._attempts.pop(session_id, None)
+                continue
+            attempts = self._attempts.get(session_id, 0) + 1
+            if attempts > self.max_retries:
+                self.failures += 1
+                self._attempts.pop(session_id, None)
+                print(f"Giving up on saving chat history for {session_id} after {self.max_retries} retries")
+                continue
+            self.retries += 1
+            self._attempts[session_id] = attempts
+            # A newer snapshot queued meanwhile already contains these items. The
+            # cached history is requeued rather than `history` in case it was hydrated.
+            self._pending.setdefault(session_id, self._cache.get(session_id, history))
+            backoff = max(backoff, min(self.flush_interval * 2 ** attempts, 30.0))
+        if backoff:
+            await asyncio.sleep(backoff)
+
+    async def _write(self, session_id: str, history: List[Dict[str, Any]], offset: int = 0) -> bool:
+        start_seq = self._persisted.get(session_id, offset)
+        # Taken before the await: only the items up to here are written.
+        end_seq = offset + len(history)
+        header = self._headers.get(session_id)
+        summary_changed = session_id in self._summary_changed
+        self._summary_changed.discard(session_id)
+        # The header only carries the summary when it changed; otherwise the stored one is kept.
+        new_header = SessionHeader(
+            end_seq,
+            header.summary if header and summary_changed else None,
+            header.summary_covered if header and summary_changed else 0,
+        )
+        started = time.perf_counter()
+        saved, header_saved = await asyncio.gather(
+            save_chat_history(session_id, history, start_seq=start_seq, offset=offset),
+            save_session_header(session_id, new_header),
+        )
+        metrics_processor.record_persistence("save", time.perf_counter() - started)
+        # A lost header write only costs a slower resume; the summary is resent next time.
+        if summary_changed and not header_saved:
+            self._summary_changed.add(session_id)
+        if not saved:
+            return False
+        self._persisted[session_id] = max(start_seq, end_seq)
+        self.writes += 1
+        return True
+
+    async def drain(self):
+        """Flush everything still pending; call on shutdown."""
+        while self._pending or self._flush_lock.locked():
+            await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "cached_sessions": len(self._cache),
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failures": self.failures,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "partial_sessions": len(self._offsets),
+            "hydrations": self.hydrations,
+        }
+
+
+session_store = WriteBehindSessionStore(
+    cache_size=int(os.getenv("SESSION_CACHE_SIZE", "256")),
+    flush_interval=float(os.getenv("SESSION_FLUSH_INTERVAL", "0.5")),
+    recent_items=int(os.getenv("SESSION_RESUME_ITEMS", "50")),
+)
@@ -1,30 +1,240 @@
+import functools
 import os
+from collections import deque
+from typing import Callable
 from dotenv import load_dotenv
-from agents import AsyncOpenAI, OpenAIChatCompletionsModel, RunConfig
+import httpx
+from openai import DefaultAsyncHttpxClient
+import dataclasses
+from agents import AsyncOpenAI, Model, ModelSettings, OpenAIChatCompletionsModel, RunConfig
+from model_router import Backend, RoutingModel
 
-# Load the environment variables from the .env file
+# Load the environment variables from the .env file. This only sets defaults for
+# the settings read below; no client is created and no key is checked on import.
 load_dotenv()
 
-gemini_api_key = os.getenv("GEMINI_API_KEY")
 
-# Check if the API key is present; if not, raise an error
-if not gemini_api_key:
-    raise ValueError("GEMINI_API_KEY is not set. Please ensure it is defined in your .env file.")
+@functools.cache
+def gemini_api_key() -> str:
+    """GEMINI_API_KEY, checked the first time a Gemini client is needed."""
+    key = os.getenv("GEMINI_API_KEY")
+    # Check if the API key is present; if not, raise an error
+    if not key:
+        raise ValueError("GEMINI_API_KEY is not set. Please ensure it is defined in your .env file.")
+    return key
 
 
 #Reference: https://ai.google.dev/gemini-api/docs/openai
-external_client = AsyncOpenAI(
-    api_key=gemini_api_key,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-)
-
-model = OpenAIChatCompletionsModel(
-    model="gemini-2.0-flash",
-    openai_client=external_client
-)
-
-google_gemini_config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
-)
\ No newline at end of file
+# BASE_URL points every model at another OpenAI-compatible server instead, such
+# as the benchmarks' stub (see benchmarks/suite.py).
+GEMINI_BASE_URL = os.getenv("BASE_URL", "https://generativelanguage.googleapis.com/v1beta/openai/")
+
+# Connection pool limits for the shared model HTTP client.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Extra OpenAI-compatible backends the model router can fail over or hedge to, as
+# comma-separated "base_url|model|API_KEY_ENV_VAR" entries, e.g.
+# "https://api.openai.com/v1/|gpt-4o-mini|OPENAI_API_KEY".
+MODEL_FALLBACKS = os.getenv("MODEL_FALLBACKS", "")
+MODEL_HEDGING = os.getenv("MODEL_HEDGING", "1") != "0"
+# Hedge deadline used until a backend has enough latency samples for its own p95.
+MODEL_HEDGE_AFTER = float(os.getenv("MODEL_HEDGE_AFTER", "2.0"))
+MODEL_FAILURE_THRESHOLD = int(os.getenv("MODEL_FAILURE_THRESHOLD", "5"))
+MODEL_BREAKER_COOLDOWN = float(os.getenv("MODEL_BREAKER_COOLDOWN", "30"))
+
+# Model tiers: tier -> (model name, max_tokens cap). Agents that only classify,
+# such as the guardrails, run on the "classifier" tier: a classifier only needs a
+# small, fast model and a few output tokens.
+MODEL_TIERS = {
+    "default": (os.getenv("DEFAULT_MODEL", "gemini-2.0-flash"), None),
+    "classifier": (
+        os.getenv("CLASSIFIER_MODEL", "gemini-2.0-flash-lite"),
+        int(os.getenv("CLASSIFIER_MAX_TOKENS", "128")) or None,
+    ),
+}
+# Whether the LLM guardrails explain their verdict in a reasoning field. A capped
+# classifier tier can cut that field short, leaving invalid JSON, so it is off by
+# default when CLASSIFIER_MAX_TOKENS is set (set CLASSIFIER_MAX_TOKENS=0 for no cap).
+GUARDRAIL_REASONING = os.getenv(
+    "GUARDRAIL_REASONING", "0" if MODEL_TIERS["classifier"][1] else "1"
+) != "0"
+
+
+def parse_fallbacks(spec: str) -> list[tuple[str, str, str]]:
+    """Parse MODEL_FALLBACKS into (base_url, model, api_key) tuples."""
+    fallbacks = []
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        base_url, name, key_var = entry.split("|")
+        fallbacks.append((base_url, name, os.getenv(key_var, "")))
+    return fallbacks
+
+
+class ProviderMetrics:
+    """Counters for HTTP connection reuse and chat session start-up time."""
+
+    def __init__(self, samples: int = 1000):
+        self.requests = 0
+        self.connections_opened = 0
+        self.session_start_seconds = deque(maxlen=samples)
+
+    @property
+    def connections_reused(self) -> int:
+        return max(self.requests - self.connections_opened, 0)
+
+    def snapshot(self) -> dict:
+        starts = sorted(self.session_start_seconds)
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+            "connection_reuse_ratio": self.connections_reused / self.requests if self.requests else 0.0,
+            "session_starts": len(starts),
+            "session_start_p50_ms": starts[len(starts) // 2] * 1000 if starts else 0.0,
+            "session_start_max_ms": starts[-1] * 1000 if starts else 0.0,
+        }
+
+
+class LazyModel(Model):
+    """A Model that is built by `factory` on its first request.
+
+    Lets agents and run configs be defined at import time without creating
+    HTTP clients or requiring API keys until a model is actually called.
+    """
+
+    def __init__(self, factory: Callable[[], Model]):
+        self._factory = factory
+        self._model: Model | None = None
+
+    @property
+    def model(self) -> Model:
+        if self._model is None:
+            self._model = self._factory()
+        return self._model
+
+    async def get_response(self, *args, **kwargs):
+        return await self.model.get_response(*args, **kwargs)
+
+    def stream_response(self, *args, **kwargs):
+        return self.model.stream_response(*args, **kwargs)
+
+
+class ProviderRegistry:
+    """Process-wide cache of model clients, models and run configs.
+
+    Every client shares one pooled httpx transport, so sessions reuse warm
+    keep-alive connections instead of opening a new one per chat. Run configs
+    and `lazy_model` hold LazyModels, so nothing is connected until first use.
+    """
+
+    def __init__(self, limits: httpx.Limits | None = None):
+        self.limits = limits or httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        self.metrics = ProviderMetrics()
+        self._http_client: httpx.AsyncClient | None = None
+        self._clients: dict[tuple[str, str], AsyncOpenAI] = {}
+        self._models: dict[tuple[str, str], OpenAIChatCompletionsModel] = {}
+        self._routers: dict[tuple[str, str], RoutingModel] = {}
+        self._lazy_models: dict[tuple[str, str], LazyModel] = {}
+        self._configs: dict[tuple[str, str], RunConfig] = {}
+        self._tier_configs: dict[str, RunConfig] = {}
+
+    async def _on_request(self, request: httpx.Request):
+        self.metrics.requests += 1
+        request.extensions["trace"] = self._on_connection_event
+
+    async def _on_connection_event(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.metrics.connections_opened += 1
+
+    def http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None:
+            self._http_client = DefaultAsyncHttpxClient(
+                limits=self.limits,
+                event_hooks={"request": [self._on_request]},
+            )
+        return self._http_client
+
+    def client(self, base_url: str = GEMINI_BASE_URL, api_key: str | None = None) -> AsyncOpenAI:
+        key = (base_url, api_key or gemini_api_key())
+        if key not in self._clients:
+            self._clients[key] = AsyncOpenAI(
+                api_key=key[1],
+                base_url=base_url,
+                http_client=self.http_client(),
+            )
+        return self._clients[key]
+
+    def model(self, name: str = "gemini-2.0-flash", base_url: str = GEMINI_BASE_URL, api_key: str | None = None) -> OpenAIChatCompletionsModel:
+        key = (base_url, name)
+        if key not in self._models:
+            self._models[key] = OpenAIChatCompletionsModel(
+                model=name,
+                openai_client=self.client(base_url, api_key)
+            )
+        return self._models[key]
+
+    def router(self, name: str = "gemini-2.0-flash", base_url: str = GEMINI_BASE_URL, api_key: str | None = None,
+               fallbacks: list[tuple[str, str, str]] | None = None) -> RoutingModel:
+        """The given model first, then the MODEL_FALLBACKS backends, behind one RoutingModel."""
+        key = (base_url, name)
+        if key not in self._routers:
+            if fallbacks is None:
+                fallbacks = parse_fallbacks(MODEL_FALLBACKS)
+            backends = [
+                Backend(f"{url}#{model_name}", self.model(model_name, url, key_value),
+                        failure_threshold=MODEL_FAILURE_THRESHOLD, cooldown=MODEL_BREAKER_COOLDOWN)
+                for url, model_name, key_value in [(base_url, name, api_key)] + fallbacks
+            ]
+            self._routers[key] = RoutingModel(backends, hedge=MODEL_HEDGING, hedge_after=MODEL_HEDGE_AFTER)
+        return self._routers[key]
+
+    def lazy_model(self, name: str = "gemini-2.0-flash", base_url: str = GEMINI_BASE_URL, api_key: str | None = None) -> LazyModel:
+        """`router(name, ...)`, built on the first request instead of now."""
+        key = (base_url, name)
+        if key not in self._lazy_models:
+            self._lazy_models[key] = LazyModel(lambda: self.router(name, base_url, api_key))
+        return self._lazy_models[key]
+
+    def run_config(self, name: str = "gemini-2.0-flash", base_url: str = GEMINI_BASE_URL, api_key: str | None = None) -> RunConfig:
+        key = (base_url, name)
+        if key not in self._configs:
+            # No model_provider: it is only consulted for agents whose model is a
+            # name, and the model set here takes precedence over those.
+            # Spans feed metrics.MetricsProcessor; message content is not needed for that.
+            self._configs[key] = RunConfig(
+                model=self.lazy_model(name, base_url, api_key),
+                trace_include_sensitive_data=False,
+            )
+        return self._configs[key]
+
+    def tier_config(self, tier: str = "default") -> RunConfig:
+        """Run config for a MODEL_TIERS tier, with the tier's max_tokens cap applied."""
+        if tier not in self._tier_configs:
+            name, max_tokens = MODEL_TIERS[tier]
+            config = self.run_config(name)
+            if max_tokens is not None:
+                config = dataclasses.replace(config, model_settings=ModelSettings(max_tokens=max_tokens))
+            self._tier_configs[tier] = config
+        return self._tier_configs[tier]
+
+    def record_session_start(self, seconds: float):
+        self.metrics.session_start_seconds.append(seconds)
+
+
+provider_registry = ProviderRegistry()
+
+model = provider_registry.lazy_model()
+
+google_gemini_config = provider_registry.run_config()
+
+
+def __getattr__(name: str):
+    # `external_client` is a real client, so it is only created when asked for.
+    if name == "external_client":
+        return provider_registry.client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,176 @@
+import asyncio
+import dataclasses
+import time
+from typing import TYPE_CHECKING
+from agents import Agent, InputGuardrailTripwireTriggered, Runner, guardrail_span
+from agents.result import RunResultStreaming
+from agents.run import RunConfig, RunContextWrapper
+import concurrency
+
+if TYPE_CHECKING:
+    import chainlit as cl
+
+# Chainlit itself is imported where a message or step is created: it takes
+# seconds to import, and callers that pass their own message never need it.
+
+# How input guardrails are scheduled relative to the agent run:
+#   "sdk"      - leave them to the SDK (tokens may stream before the verdict is in)
+#   "serial"   - run the guardrails to completion, then start the agent
+#   "parallel" - start both together, hold output until the verdict, cancel on a trip
+GUARDRAIL_MODES = ("sdk", "serial", "parallel")
+
+
+async def send_handoff_notice(target: str):
+    import chainlit as cl
+
+    await cl.Message(
+        content=f"🔄 **Handing off to {target}...**\n\nI'm transferring your request to our {target.lower()} who will be able to better assist you.",
+        author="System"
+    ).send()
+
+
+async def check_input_guardrails(agent: Agent, input, run_config: RunConfig | None = None, context=None):
+    """Run the agent's input guardrails concurrently, raising on the first tripwire."""
+    guardrails = agent.input_guardrails + ((run_config and run_config.input_guardrails) or [])
+    context_wrapper = RunContextWrapper(context=context)
+
+    async def run_guardrail(guardrail):
+        # The SDK only records guardrail spans for guardrails it runs itself.
+        with guardrail_span(guardrail.get_name()) as span:
+            guardrail_result = await guardrail.run(agent, input, context_wrapper)
+            span.span_data.triggered = guardrail_result.output.tripwire_triggered
+            return guardrail_result
+
+    pending = [asyncio.create_task(run_guardrail(g)) for g in guardrails]
+    try:
+        for next_done in asyncio.as_completed(pending):
+            guardrail_result = await next_done
+            if guardrail_result.output.tripwire_triggered:
+                raise InputGuardrailTripwireTriggered(guardrail_result)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def stream_agent_response(
+    agent: Agent, input, run_config, msg: "cl.Message", *, guardrail_mode: str = "sdk", output_check=None, **kwargs
+) -> tuple[RunResultStreaming, float | None]:
+    """Stream an agent run into `msg` token by token.
+
+    Handoffs are posted as system messages and tool calls as inline steps while the
+    run is in progress. Returns the finished run and its time-to-first-token in
+    seconds (None if the run produced no text).
+
+    `output_check`, if given, replaces the output guardrails: each chunk is passed
+    to its `feed` before it is shown and `finish` is awaited once the run ends.
+    A tripwire raised by either stops generation.
+    """
+    if guardrail_mode not in GUARDRAIL_MODES:
+        raise ValueError(f"Unknown guardrail mode: {guardrail_mode}")
+
+    started = time.perf_counter()
+    time_to_first_token = None
+    tool_steps: dict[str, "cl.Step"] = {}
+    held_tokens: list[str] = []
+    released = True
+    output_lock = asyncio.Lock()
+
+    async def emit(token: str):
+        nonlocal time_to_first_token
+        first = time_to_first_token is None
+        if first:
+            time_to_first_token = time.perf_counter() - started
+        # The first token replaces the "Thinking..." placeholder.
+        await msg.stream_token(token, is_sequence=first)
+
+    async def release():
+        nonlocal released
+        async with output_lock:
+            released = True
+            for token in held_tokens:
+                await emit(token)
+            held_tokens.clear()
+
+    async def render(run_agent: Agent, run_config) -> RunResultStreaming:
+        # Started here so the run's trace context belongs to the task that streams it.
+        result = Runner.run_streamed(run_agent, input, run_config=run_config, **kwargs)
+        try:
+            async for event in result.stream_events():
+                if event.type == "raw_response_event":
+                    if event.data.type == "response.output_text.delta" and event.data.delta:
+                        if output_check is not None:
+                            await output_check.feed(event.data.delta)
+                        async with output_lock:
+                            if released:
+                                await emit(event.data.delta)
+                            else:
+                                held_tokens.append(event.data.delta)
+                elif event.type == "run_item_stream_event":
+                    if event.name == "handoff_occured":
+                        await send_handoff_notice(event.item.target_agent.name)
+                    elif event.name == "tool_called":
+                        import chainlit as cl
+
+                        raw = event.item.raw_item
+                        step = cl.Step(name=getattr(raw, "name", "tool"), type="tool")
+                        step.input = getattr(raw, "arguments", "")
+                        await step.send()
+                        tool_steps[getattr(raw, "call_id", "")] = step
+                    elif event.name == "tool_output":
+                        raw = event.item.raw_item
+                        call_id = raw.get("call_id", "") if isinstance(raw, dict) else getattr(raw, "call_id", "")
+                        step = tool_steps.pop(call_id, None)
+                        if step:
+                            step.output = str(event.item.output)
+                            await step.update()
+        finally:
+            # Stops the background model/tool tasks if we are cancelled mid-stream.
+            result._cleanup_tasks()
+        return result
+
+    if output_check is not None:
+        agent = agent.clone(output_guardrails=[])
+        if run_config:
+            run_config = dataclasses.replace(run_config, output_guardrails=None)
+
+    try:
+        async with concurrency.run_limiter:
+            if guardrail_mode == "serial":
+                await check_input_guardrails(agent, input, run_config, kwargs.get("context"))
+            if guardrail_mode == "sdk":
+                result = await render(agent, run_config)
+            else:
+                unguarded_agent = agent.clone(input_guardrails=[])
+                unguarded_config = dataclasses.replace(run_config, input_guardrails=None) if run_config else None
+                if guardrail_mode == "serial":
+                    result = await render(unguarded_agent, unguarded_config)
+                else:
+                    released = False
+                    verdict = asyncio.create_task(
+                        check_input_guardrails(agent, input, run_config, kwargs.get("context"))
+                    )
+                    rendering = asyncio.create_task(render(unguarded_agent, unguarded_config))
+                    try:
+                        # Raises InputGuardrailTripwireTriggered if the classifier trips,
+                        # otherwise blocks until it clears the held output.
+                        await verdict
+                        await release()
+                        result = await rendering
+                    finally:
+                        verdict.cancel()
+                        rendering.cancel()
+                        await asyncio.gather(verdict, rendering, return_exceptions=True)
+            if output_check is not None:
+                await output_check.finish()
+    finally:
+        # Cancels LLM checks still running if the stream ended early.
+        if output_check is not None:
+            output_check.close()
+
+    if time_to_first_token is None:
+        msg.content = str(result.final_output)
+    await msg.update()
+
+    if time_to_first_token is not None:
+        print(f"Time to first token: {time_to_first_token:.3f}s")
+    return result, time_to_first_token
@@ -6,4 +6,271 @@ CREATE TABLE chat_histories (
   updated_at TIMESTAMP WITH TIME ZONE NOT NULL
 );
 
-CREATE INDEX idx_chat_histories_session_id ON chat_histories(session_id);
\ No newline at end of file
+CREATE INDEX idx_chat_histories_session_id ON chat_histories(session_id);
+
+-- One row per conversation item. Each turn appends only its new items.
+CREATE TABLE chat_messages (
+  session_id UUID NOT NULL,
+  seq INTEGER NOT NULL,
+  item JSONB NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  PRIMARY KEY (session_id, seq)
+);
+
+-- Migrate existing chat_histories blobs into chat_messages. Safe to re-run.
+-- Older rows hold the history as a JSON string inside the JSONB column.
+INSERT INTO chat_messages (session_id, seq, item, created_at)
+SELECT h.session_id, e.ordinality - 1, e.value, h.updated_at
+FROM chat_histories h
+CROSS JOIN LATERAL jsonb_array_elements(
+  CASE WHEN jsonb_typeof(h.history) = 'string' THEN (h.history #>> '{}')::jsonb ELSE h.history END
+) WITH ORDINALITY AS e(value, ordinality)
+ON CONFLICT (session_id, seq) DO NOTHING;
+
+-- One small row per session, read on resume together with the last few
+-- chat_messages rows. The summary (of the first summary_covered items) lets the
+-- model continue a long conversation without loading the older items.
+CREATE TABLE chat_sessions (
+  session_id UUID PRIMARY KEY,
+  item_count INTEGER NOT NULL,
+  summary TEXT,
+  summary_covered INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+INSERT INTO chat_sessions (session_id, item_count, updated_at)
+SELECT session_id, max(seq) + 1, max(created_at)
+FROM chat_messages
+GROUP BY session_id
+ON CONFLICT (session_id) DO NOTHING;
+
+-- Tracing: one row per trace and per span, written in batches by tracing.py.
+-- Both tables are partitioned by day on start_time, so time-range queries only
+-- touch the days they cover and old days are dropped rather than deleted.
+
+-- Tables created before this schema were plain tables with text columns. Move
+-- them aside; their rows are copied into the partitioned tables further down.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'traces' AND relkind = 'r'
+             AND relnamespace = 'public'::regnamespace) THEN
+    ALTER TABLE traces RENAME TO traces_legacy;
+  END IF;
+  IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'spans' AND relkind = 'r'
+             AND relnamespace = 'public'::regnamespace) THEN
+    ALTER TABLE spans RENAME TO spans_legacy;
+  END IF;
+END;
+$$;
+
+CREATE TABLE IF NOT EXISTS traces (
+  trace_id TEXT NOT NULL,
+  name TEXT,
+  start_time TIMESTAMP WITH TIME ZONE NOT NULL,
+  end_time TIMESTAMP WITH TIME ZONE,
+  duration_ms DOUBLE PRECISION GENERATED ALWAYS AS ((EXTRACT(EPOCH FROM end_time - start_time) * 1000)::double precision) STORED,
+  metadata JSONB NOT NULL DEFAULT '{}',
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  PRIMARY KEY (trace_id, start_time)
+) PARTITION BY RANGE (start_time);
+
+CREATE TABLE IF NOT EXISTS spans (
+  span_id TEXT NOT NULL,
+  trace_id TEXT NOT NULL,
+  parent_span_id TEXT,
+  -- agent, function (a tool call), generation or response (a model call), handoff, guardrail, custom.
+  span_type TEXT,
+  -- Agent or tool name, or the model for model calls.
+  name TEXT,
+  start_time TIMESTAMP WITH TIME ZONE NOT NULL,
+  end_time TIMESTAMP WITH TIME ZONE,
+  duration_ms DOUBLE PRECISION GENERATED ALWAYS AS ((EXTRACT(EPOCH FROM end_time - start_time) * 1000)::double precision) STORED,
+  error JSONB,
+  metadata JSONB NOT NULL DEFAULT '{}',
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  PRIMARY KEY (span_id, start_time)
+) PARTITION BY RANGE (start_time);
+
+-- Catches rows outside every daily partition so an insert never fails.
+CREATE TABLE IF NOT EXISTS traces_default PARTITION OF traces DEFAULT;
+CREATE TABLE IF NOT EXISTS spans_default PARTITION OF spans DEFAULT;
+
+-- Indexes on the parent are created on every partition, present and future.
+CREATE INDEX IF NOT EXISTS idx_traces_start_time ON traces (start_time);
+CREATE INDEX IF NOT EXISTS idx_spans_trace_id ON spans (trace_id);
+CREATE INDEX IF NOT EXISTS idx_spans_parent_span_id ON spans (parent_span_id) WHERE parent_span_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_spans_start_time ON spans (start_time);
+CREATE INDEX IF NOT EXISTS idx_spans_name_start_time ON spans (span_type, name, start_time);
+
+-- Create daily partitions of traces and spans for `days` days from `first_day`.
+-- Existing partitions are left alone. Schedule it daily to stay ahead, e.g. with
+-- pg_cron: SELECT cron.schedule('trace-partitions', '0 0 * * *', 'SELECT create_trace_partitions()');
+CREATE OR REPLACE FUNCTION create_trace_partitions(first_day DATE DEFAULT current_date, days INTEGER DEFAULT 7)
+RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+  d DATE;
+  parent TEXT;
+  created INTEGER := 0;
+BEGIN
+  FOR i IN 0 .. days - 1 LOOP
+    d := first_day + i;
+    FOREACH parent IN ARRAY ARRAY['traces', 'spans'] LOOP
+      IF to_regclass(format('%I', parent || '_p' || to_char(d, 'YYYYMMDD'))) IS NULL THEN
+        BEGIN
+          EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            parent || '_p' || to_char(d, 'YYYYMMDD'), parent, d::timestamptz, (d + 1)::timestamptz
+          );
+          created := created + 1;
+        EXCEPTION WHEN check_violation THEN
+          -- The default partition already holds rows for this day.
+          RAISE NOTICE 'Skipped %_p%: rows for that day are in %_default', parent, to_char(d, 'YYYYMMDD'), parent;
+        END;
+      END IF;
+    END LOOP;
+  END LOOP;
+  RETURN created;
+END;
+$$;
+
+-- Drop the daily partitions of days before `older_than`. Rollups are kept.
+CREATE OR REPLACE FUNCTION drop_trace_partitions(older_than DATE)
+RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+  part RECORD;
+  dropped INTEGER := 0;
+BEGIN
+  FOR part IN
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname IN ('traces', 'spans')
+      AND c.relname ~ '_p\d{8}$'
+      AND to_date(right(c.relname, 8), 'YYYYMMDD') < older_than
+  LOOP
+    EXECUTE format('DROP TABLE %I', part.relname);
+    dropped := dropped + 1;
+  END LOOP;
+  RETURN dropped;
+END;
+$$;
+
+-- Copy rows from tables moved aside above. Older rows hold metadata as a JSON
+-- string and timestamps as text. Safe to re-run.
+DO $$
+DECLARE
+  first_day DATE;
+BEGIN
+  IF to_regclass('traces_legacy') IS NOT NULL THEN
+    SELECT min(coalesce(start_time::text, created_at::text)::timestamptz)::date INTO first_day FROM traces_legacy;
+    IF first_day IS NOT NULL THEN
+      PERFORM create_trace_partitions(first_day, current_date - first_day + 1);
+    END IF;
+    INSERT INTO traces (trace_id, name, start_time, end_time, metadata, created_at)
+    SELECT t.trace_id, t.name,
+      coalesce(t.start_time::text, t.end_time::text, t.created_at::text)::timestamptz,
+      t.end_time::text::timestamptz,
+      CASE WHEN jsonb_typeof(m.value) = 'string' THEN (m.value #>> '{}')::jsonb ELSE coalesce(m.value, '{}') END,
+      coalesce(t.created_at::text::timestamptz, now())
+    FROM traces_legacy t
+    CROSS JOIN LATERAL (SELECT t.metadata::text::jsonb AS value) m
+    WHERE t.trace_id IS NOT NULL
+    ON CONFLICT DO NOTHING;
+  END IF;
+
+  IF to_regclass('spans_legacy') IS NOT NULL THEN
+    SELECT min(coalesce(start_time::text, created_at::text)::timestamptz)::date INTO first_day FROM spans_legacy;
+    IF first_day IS NOT NULL THEN
+      PERFORM create_trace_partitions(first_day, current_date - first_day + 1);
+    END IF;
+    INSERT INTO spans (span_id, trace_id, parent_span_id, span_type, name, start_time, end_time, metadata, created_at)
+    SELECT s.span_id, s.trace_id, s.parent_span_id, m.value ->> 'type', s.name,
+      coalesce(s.start_time::text, s.created_at::text)::timestamptz,
+      s.end_time::text::timestamptz,
+      m.value,
+      coalesce(s.created_at::text::timestamptz, now())
+    FROM spans_legacy s
+    CROSS JOIN LATERAL (
+      SELECT CASE WHEN jsonb_typeof(raw.value) = 'string' THEN (raw.value #>> '{}')::jsonb
+                  ELSE coalesce(raw.value, '{}') END AS value
+      FROM (SELECT s.metadata::text::jsonb AS value) raw
+    ) m
+    WHERE s.span_id IS NOT NULL AND s.trace_id IS NOT NULL
+    ON CONFLICT DO NOTHING;
+  END IF;
+END;
+$$;
+
+SELECT create_trace_partitions(current_date - 1, 8);
+
+-- Span latency by hour and span name. Dashboards read these rows instead of
+-- computing percentiles over the spans themselves.
+CREATE TABLE IF NOT EXISTS span_latency_rollups (
+  bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+  span_type TEXT NOT NULL,
+  name TEXT NOT NULL,
+  calls INTEGER NOT NULL,
+  errors INTEGER NOT NULL,
+  total_ms DOUBLE PRECISION NOT NULL,
+  p50_ms DOUBLE PRECISION NOT NULL,
+  p95_ms DOUBLE PRECISION NOT NULL,
+  p99_ms DOUBLE PRECISION NOT NULL,
+  max_ms DOUBLE PRECISION NOT NULL,
+  PRIMARY KEY (bucket, span_type, name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_span_latency_rollups_name ON span_latency_rollups (span_type, name, bucket);
+
+-- Recompute the hourly rollups for the hours from `from_time` to `to_time`.
+-- Reads only those hours of spans, through idx_spans_start_time. Returns the
+-- number of rollup rows written. Schedule it shortly after each hour, e.g.
+-- SELECT cron.schedule('span-rollups', '5 * * * *', $cron$SELECT rollup_span_latency(now() - interval '2 hours')$cron$);
+CREATE OR REPLACE FUNCTION rollup_span_latency(from_time TIMESTAMP WITH TIME ZONE, to_time TIMESTAMP WITH TIME ZONE DEFAULT now())
+RETURNS INTEGER LANGUAGE sql AS $$
+  WITH written AS (
+    INSERT INTO span_latency_rollups AS r (bucket, span_type, name, calls, errors, total_ms, p50_ms, p95_ms, p99_ms, max_ms)
+    SELECT
+      date_trunc('hour', start_time),
+      coalesce(span_type, 'unknown'),
+      coalesce(name, 'unknown'),
+      count(*),
+      count(*) FILTER (WHERE error IS NOT NULL),
+      sum(duration_ms),
+      percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms),
+      percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms),
+      percentile_cont(0.99) WITHIN GROUP (ORDER BY duration_ms),
+      max(duration_ms)
+    FROM spans
+    WHERE start_time >= date_trunc('hour', from_time)
+      AND start_time < to_time
+      AND end_time IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (bucket, span_type, name) DO UPDATE SET
+      calls = excluded.calls,
+      errors = excluded.errors,
+      total_ms = excluded.total_ms,
+      p50_ms = excluded.p50_ms,
+      p95_ms = excluded.p95_ms,
+      p99_ms = excluded.p99_ms,
+      max_ms = excluded.max_ms
+    RETURNING 1
+  )
+  SELECT count(*)::integer FROM written;
+$$;
+
+-- Last 24 hours per agent, tool and model. Percentiles are not additive, so the
+-- worst hourly p95/p99 stands in for the day's.
+CREATE OR REPLACE VIEW span_latency_last_day AS
+SELECT
+  span_type,
+  name,
+  sum(calls) AS calls,
+  sum(errors) AS errors,
+  sum(total_ms) / sum(calls) AS mean_ms,
+  max(p95_ms) AS worst_hour_p95_ms,
+  max(p99_ms) AS worst_hour_p99_ms,
+  max(max_ms) AS max_ms
+FROM span_latency_rollups
+WHERE bucket >= now() - interval '24 hours'
+GROUP BY span_type, name;
@@ -0,0 +1,19 @@
+import functools
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+
+@functools.cache
+def supabase_client() -> "Client":
+    """The process-wide Supabase client, created on first use.
+
+    supabase-py is imported here rather than at module level: it takes about
+    half a second to import and most importers of history.py and tracing.py
+    never touch the database.
+    """
+    from supabase import create_client
+
+    return create_client(os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY"))
@@ -0,0 +1,51 @@
+import asyncio
+import session_store as session_store_module
+from session_store import WriteBehindSessionStore
+
+
+def test_message_sent_during_a_flush_is_not_lost(monkeypatch):
+    stored = {}
+
+    async def slow_save(session_id, history, start_seq=0, offset=0):
+        # Like the real one: the rows are built before the network round trip.
+        rows = {start_seq + i: item for i, item in enumerate(history[start_seq - offset:])}
+        await asyncio.sleep(0.2)
+        stored.update(rows)
+        return True
+
+    async def save_header(session_id, header):
+        return True
+
+    monkeypatch.setattr(session_store_module, "save_chat_history", slow_save)
+    monkeypatch.setattr(session_store_module, "save_session_header", save_header)
+
+    async def run():
+        store = WriteBehindSessionStore(flush_interval=0.01)
+        history = [{"role": "user", "content": "first"}, {"role": "assistant", "content": "one"}]
+        store.put("s", history)
+        await asyncio.sleep(0.05)  # the flush is now waiting on the save
+        history.append({"role": "user", "content": "second"})
+        history = history + [{"role": "assistant", "content": "two"}]
+        store.put("s", history)
+        await store.drain()
+
+    asyncio.run(run())
+    assert sorted(stored) == [0, 1, 2, 3]
+    assert stored[2]["content"] == "second"
+
+
+def test_failed_hydration_falls_back_to_recent_items(monkeypatch):
+    async def failed_load(session_id, limit=None, before_seq=None):
+        return []  # what load_chat_history returns when Supabase fails
+
+    monkeypatch.setattr(session_store_module, "load_chat_history", failed_load)
+
+    async def run():
+        store = WriteBehindSessionStore()
+        recent = [{"role": "user", "content": "latest"}]
+        store._offsets["s"] = 40
+        store._remember("s", recent)
+        assert await store.hydrate("s") == recent
+        assert store.needs_older("s")
+
+    asyncio.run(run())
@@ -1,111 +1,272 @@
+import functools
 import os
+from typing import TYPE_CHECKING
 from openai import AsyncOpenAI
 from agents import Agent, Runner, trace, set_default_openai_api, set_default_openai_client, set_trace_processors
 from agents.tracing.processor_interface import TracingProcessor
 from pprint import pprint
 from dotenv import load_dotenv
 import json
-from datetime import datetime
-from supabase import create_client, Client
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from metrics import metrics_processor
+from setup import provider_registry
+from supabase_client import supabase_client
 
-load_dotenv()
+if TYPE_CHECKING:
+    from supabase import Client
 
 
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+def _span_name(data: dict) -> str | None:
+    """Agent and function spans carry a name, model calls their model; others are named by their type."""
+    return data.get("name") or data.get("model") or data.get("type")
+
+
+# JSONB columns. The callbacks snapshot them as JSON text, which is cheap and
+# safe to hold; the exporter thread decodes them so they are stored as objects.
+_JSON_COLUMNS = ("metadata", "error")
+
+
+class LiveSpan:
+    """A span that has started but not yet ended."""
+
+    __slots__ = ("span_id", "trace_id", "started")
+
+    def __init__(self, span_id: str, trace_id: str, started: float):
+        self.span_id = span_id
+        self.trace_id = trace_id
+        self.started = started
+
+
+class SpanSummary:
+    """Compact record of a finished span, kept in the recent-spans ring buffer."""
+
+    __slots__ = ("span_id", "trace_id", "name", "duration_ms", "error")
+
+    def __init__(self, span_id: str, trace_id: str, name: str | None, duration_ms: float, error: bool):
+        self.span_id = span_id
+        self.trace_id = trace_id
+        self.name = name
+        self.duration_ms = duration_ms
+        self.error = error
+
+    def __repr__(self):
+        return f"SpanSummary({self.name!r}, {self.duration_ms:.1f}ms, span_id={self.span_id!r})"
 
 
 class SupabaseTraceProcessor(TracingProcessor):
-    def __init__(self):
-        self.traces = []
-        self.spans = []
+    """Exports finished traces and spans to Supabase from a background thread.
+
+    The tracing callbacks only enqueue a row. The worker thread drains the queue in
+    batches of up to `max_batch_size` rows, or every `schedule_delay` seconds,
+    with one bulk insert per table. When the queue is full, rows are dropped and
+    counted unless `block_on_full` is set, in which case the caller waits.
+
+    Only traces and spans that are still running are held in memory. Once a span
+    ends, its row goes to the exporter and only a small summary is kept in a ring
+    buffer of the last `recent_size` spans, for debugging.
+    """
+
+    def __init__(
+        self,
+        client: "Client | None" = None,
+        max_queue_size: int = 8192,
+        max_batch_size: int = 256,
+        schedule_delay: float = 2.0,
+        block_on_full: bool = False,
+        recent_size: int = 256,
+    ):
+        self.live_traces: dict[str, str] = {}
+        self.live_spans: dict[str, LiveSpan] = {}
+        self.recent_spans: deque[SpanSummary] = deque(maxlen=recent_size)
+        self.client = client or supabase_client()
+        self.max_batch_size = max_batch_size
+        self.schedule_delay = schedule_delay
+        self.block_on_full = block_on_full
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._shutdown = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="supabase-trace-exporter", daemon=True)
+        self._worker.start()
 
     def on_trace_start(self, trace):
-        self.traces.append(trace)
+        self.live_traces[trace.trace_id] = datetime.now(timezone.utc).isoformat()
         print(f"Trace started: {trace.trace_id}")
 
     def on_trace_end(self, trace):
-        trace_data = trace.export()
+        trace_data = trace.export() or {}
         print(f"Trace ended: {trace.trace_id}")
-        
-        
-        try:
-           
-            trace_json = {
-                "trace_id": trace_data.get("trace_id"),
-                "name": trace_data.get("name"),
-                "start_time": trace_data.get("start_time"),
-                "end_time": trace_data.get("end_time"),
-                "metadata": json.dumps(trace_data.get("metadata", {})),
-                "created_at": datetime.now().isoformat()
-            }
-            
-            # Insert into Supabase
-            supabase.table("traces").insert(trace_json).execute()
-            print(f"Trace {trace.trace_id} saved to Supabase")
-        except Exception as e:
-            print(f"Error saving trace to Supabase: {e}")
+
+        # The SDK's trace export carries no timestamps, so we record our own.
+        # start_time is the partition key and may not be null.
+        now = datetime.now(timezone.utc).isoformat()
+        self._enqueue("traces", {
+            "trace_id": trace_data.get("id"),
+            "name": trace_data.get("workflow_name"),
+            "start_time": self.live_traces.pop(trace.trace_id, None) or now,
+            "end_time": now,
+            "metadata": json.dumps(trace_data.get("metadata") or {}, default=str),
+            "created_at": now
+        })
 
     def on_span_start(self, span):
-        self.spans.append(span)
-        print(f"Span started: {span.span_id}")
+        self.live_spans[span.span_id] = LiveSpan(span.span_id, span.trace_id, time.perf_counter())
 
     def on_span_end(self, span):
-        span_data = span.export()
-        print(f"Span ended: {span.span_id}")
-        
-      
+        span_data = span.export() or {}
+        data = span_data.get("span_data") or {}
+        name = _span_name(data)
+
+        live = self.live_spans.pop(span.span_id, None)
+        duration_ms = (time.perf_counter() - live.started) * 1000 if live else 0.0
+        self.recent_spans.append(
+            SpanSummary(span.span_id, span.trace_id, name, duration_ms, span_data.get("error") is not None)
+        )
+
+        now = datetime.now(timezone.utc).isoformat()
+        self._enqueue("spans", {
+            "span_id": span_data.get("id"),
+            "trace_id": span_data.get("trace_id"),
+            "span_type": data.get("type"),
+            "name": name,
+            "start_time": span_data.get("started_at") or now,
+            "end_time": span_data.get("ended_at"),
+            "error": json.dumps(span_data["error"], default=str) if span_data.get("error") else None,
+            "metadata": json.dumps(data, default=str),
+            "parent_span_id": span_data.get("parent_id"),
+            "created_at": now
+        })
+
+    def _enqueue(self, table: str, row: dict):
+        if self._shutdown.is_set():
+            self.dropped += 1
+            return
         try:
-            
-            span_json = {
-                "span_id": span_data.get("span_id"),
-                "trace_id": span_data.get("trace_id"),
-                "name": span_data.get("name"),
-                "start_time": span_data.get("start_time"),
-                "end_time": span_data.get("end_time"),
-                "metadata": json.dumps(span_data.get("metadata", {})),
-                "parent_span_id": span_data.get("parent_span_id"),
-                "created_at": datetime.now().isoformat()
-            }
-            
-            # Insert into Supabase
-            supabase.table("spans").insert(span_json).execute()
-            print(f"Span {span.span_id} saved to Supabase")
-        except Exception as e:
-            print(f"Error saving span to Supabase: {e}")
-
-    def force_flush(self):
-        print("Forcing flush of trace data")
-
-    def shutdown(self):
-        print("=======Shutting down trace processor========")
-       
+            if self.block_on_full:
+                self._queue.put((table, row))
+            else:
+                self._queue.put_nowait((table, row))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while not self._shutdown.is_set():
+            self._export_batch(self._next_batch(self.schedule_delay))
+        # Drain whatever is left once shutdown is requested.
+        while not self._queue.empty():
+            self._export_batch(self._next_batch(0))
+
+    def _next_batch(self, wait: float) -> list:
+        batch = []
+        deadline = time.monotonic() + wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if isinstance(item, threading.Event):
+                break
+        return batch
 
-BASE_URL = os.getenv("BASE_URL" ,"https://generativelanguage.googleapis.com/v1beta/openai/" )
-API_KEY = os.getenv("GEMINI_API_KEY") 
-MODEL_NAME = os.getenv("MODEL_NAME" , "gemini-2.0-flash")
+    def _export_batch(self, batch: list):
+        from postgrest.types import ReturnMethod
+
+        rows_by_table: dict[str, list] = {}
+        flush_markers = []
+        for item in batch:
+            if isinstance(item, threading.Event):
+                flush_markers.append(item)
+            else:
+                table, row = item
+                for column in _JSON_COLUMNS:
+                    if row.get(column) is not None:
+                        row[column] = json.loads(row[column])
+                rows_by_table.setdefault(table, []).append(row)
+
+        # Traces first so spans never reference a trace that is not stored yet.
+        for table in sorted(rows_by_table, key=lambda t: t != "traces"):
+            rows = rows_by_table[table]
+            try:
+                self.client.table(table).insert(rows, returning=ReturnMethod.minimal).execute()
+                self.exported += len(rows)
+                self.batches += 1
+            except Exception as e:
+                self.failed += len(rows)
+                print(f"Error saving {len(rows)} {table} rows to Supabase: {e}")
+
+        for marker in flush_markers:
+            marker.set()
+
+    def stats(self) -> dict:
+        return {
+            "live_traces": len(self.live_traces),
+            "live_spans": len(self.live_spans),
+            "queued": self._queue.qsize(),
+            "exported": self.exported,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def force_flush(self, timeout: float | None = None):
+        """Block until everything queued before this call has been exported."""
+        if self._shutdown.is_set():
+            return
+        marker = threading.Event()
+        self._queue.put(marker)
+        marker.wait(timeout)
+
+    def shutdown(self, timeout: float | None = None):
+        print("=======Shutting down trace processor========")
+        self._shutdown.set()
+        self._worker.join(timeout)
+        print(f"Trace export stats: {self.stats()}")
 
 
-if not BASE_URL or not API_KEY or not MODEL_NAME:
-    raise ValueError("Please set BASE_URL, GEMINI_API_KEY, MODEL_NAME via env var or code.")
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+DEFAULT_MODEL_NAME = "gemini-2.0-flash"
 
 
-client = AsyncOpenAI(
-    base_url=BASE_URL,
-    api_key=API_KEY,
-)
+@functools.cache
+def configure_tracing() -> SupabaseTraceProcessor:
+    """Export this process's traces to Supabase. Runs once; later calls return the same processor.
 
-set_default_openai_client(client=client, use_for_tracing=True)
-set_default_openai_api("chat_completions")
+    Nothing here happens at import time, so importing this module neither needs
+    the environment to be set nor starts the exporter thread.
+    """
+    load_dotenv()
+    base_url = os.getenv("BASE_URL", DEFAULT_BASE_URL)
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not base_url or not api_key:
+        raise ValueError("Please set BASE_URL, GEMINI_API_KEY, MODEL_NAME via env var or code.")
 
+    client = AsyncOpenAI(base_url=base_url, api_key=api_key)
+    set_default_openai_client(client=client, use_for_tracing=True)
+    set_default_openai_api("chat_completions")
 
-supabase_processor = SupabaseTraceProcessor()
-set_trace_processors([supabase_processor])
+    # The metrics are fed from the same span hooks as the Supabase export.
+    processor = SupabaseTraceProcessor()
+    set_trace_processors([processor, metrics_processor])
+    return processor
 
 
 async def main():
-    agent = Agent(name="Tracing Agent", instructions="Perform example tasks.", model=MODEL_NAME)
+    configure_tracing()
+    agent = Agent(
+        name="Tracing Agent",
+        instructions="Perform example tasks.",
+        model=provider_registry.router(
+            os.getenv("MODEL_NAME", DEFAULT_MODEL_NAME), os.getenv("BASE_URL", DEFAULT_BASE_URL), os.getenv("GEMINI_API_KEY")
+        ),
+    )
     
     with trace("Tracing workflow"):
         first_result = await Runner.run(agent, "Start the task")
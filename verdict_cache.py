@@ -0,0 +1,123 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from agents import GuardrailFunctionOutput
+
+
+class VerdictCache:
+    """LRU + TTL cache of guardrail verdicts keyed by a hash of the checked content.
+
+    With `db_path` set, entries are also written to SQLite so they survive a restart;
+    in-memory misses fall back to the database before the guardrail runs.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, db_path: str | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, bool, dict]] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS guardrail_verdicts ("
+                "key TEXT PRIMARY KEY, tripwire INTEGER NOT NULL, output_info TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM guardrail_verdicts WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def key(namespace: str, content) -> str:
+        payload = json.dumps(content, sort_keys=True, default=str)
+        return hashlib.sha256(f"{namespace}\0{payload}".encode()).hexdigest()
+
+    def get(self, key: str) -> tuple[bool, dict] | None:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, tripwire, output_info = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return tripwire, output_info
+            del self._entries[key]
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT tripwire, output_info, expires_at FROM guardrail_verdicts WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row:
+                tripwire, output_info, expires_at = bool(row[0]), json.loads(row[1]), row[2]
+                self._remember(key, expires_at, tripwire, output_info)
+                self.disk_hits += 1
+                return tripwire, output_info
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, tripwire: bool, output_info: dict):
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, tripwire, output_info)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO guardrail_verdicts (key, tripwire, output_info, expires_at) VALUES (?, ?, ?, ?)",
+                (key, int(tripwire), json.dumps(output_info), expires_at),
+            )
+            self._db.commit()
+
+    def _remember(self, key, expires_at, tripwire, output_info):
+        self._entries[key] = (expires_at, tripwire, output_info)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+def cached_verdict(cache: VerdictCache, output_type):
+    """Memoize a guardrail function's verdict. Apply beneath @input_guardrail/@output_guardrail.
+
+    `output_type` is the pydantic model of the guardrail's output_info, used to
+    rebuild cached verdicts.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(ctx, agent, content):
+            key = cache.key(func.__name__, content)
+            cached = cache.get(key)
+            if cached is not None:
+                tripwire, output_info = cached
+                return GuardrailFunctionOutput(
+                    output_info=output_type.model_validate(output_info),
+                    tripwire_triggered=tripwire,
+                )
+            result = await func(ctx, agent, content)
+            cache.set(key, result.tripwire_triggered, result.output_info.model_dump())
+            return result
+        return wrapper
+    return decorate
+
+
+verdict_cache = VerdictCache(
+    maxsize=int(os.getenv("VERDICT_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("VERDICT_CACHE_TTL", "3600")),
+    db_path=os.getenv("VERDICT_CACHE_DB") or None,
+)